@@ -6,17 +6,47 @@
 
 import json
 import logging
+import os
+import re
 import subprocess
+from collections import deque
 from pathlib import Path
 from types import TracebackType
-from typing import Any, Dict, List, NamedTuple, Optional
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from typing_extensions import TypedDict
 
+from ..client import json_rpc, resources
+from ..client.find_directories import (
+    CONFIGURATION_FILE,
+    LOCAL_CONFIGURATION_FILE,
+    find_global_and_local_root,
+)
+from ..client.socket_connection import SocketConnection, SocketException
+
 
 LOG: logging.Logger = logging.getLogger(__name__)
 
 
+# Number of queries sent to the server before reading their responses. Each of
+# them holds a connection open until its response is read.
+PIPELINE_DEPTH = 64
+
+# Paths in queries are rewritten by `pyre query` to the analysis directory, so
+# these queries don't go through the socket.
+QUERY_PATH_PATTERN: "re.Pattern[str]" = re.compile(r"'[a-zA-Z_\-\.\/0-9]+\.py'")
+
+
 # We use NamedTuple instead of dataclasses for Python3.5/6 support.
 class PyreCheckResult(NamedTuple):
     exit_code: int
@@ -33,10 +63,19 @@ class PyreQueryError(Exception):
 
 
 class PyreConnection:
-    def __init__(self, pyre_directory: Optional[Path] = None) -> None:
+    """Queries are sent over the socket of the server, which answers a single
+    request per connection. Queries that can't be answered over the socket fall
+    back to running `pyre query`."""
+
+    def __init__(
+        self,
+        pyre_directory: Optional[Path] = None,
+        log_directory: Optional[Path] = None,
+    ) -> None:
         self.pyre_directory: Path = (
             pyre_directory if pyre_directory is not None else Path.cwd()
         )
+        self.log_directory: Optional[Path] = log_directory
         self.server_initialized = False
 
     def __enter__(self) -> "PyreConnection":
@@ -88,6 +127,10 @@ class PyreConnection:
             response = json.loads(response)
         except json.decoder.JSONDecodeError as decode_error:
             raise PyreQueryError(f"`{response} is not valid JSON.") from decode_error
+        return PyreConnection._validate_query_result(response)
+
+    @staticmethod
+    def _validate_query_result(response: Any) -> PyreQueryResult:
         if "error" in response:
             raise PyreQueryError(response["error"])
         if "response" not in response:
@@ -97,9 +140,55 @@ class PyreConnection:
             )
         return response
 
-    def query_server(self, query: str) -> PyreQueryResult:
-        if not self.server_initialized:
-            self.start_server()
+    def _server_log_directory(self) -> Path:
+        log_directory = self.log_directory
+        if log_directory is None:
+            found_root = find_global_and_local_root(self.pyre_directory)
+            if found_root is None:
+                log_directory = self.pyre_directory / resources.LOG_DIRECTORY
+            else:
+                local_root = found_root.local_root
+                log_directory = resources.log_directory(
+                    str(found_root.global_root),
+                    str(local_root) if local_root is not None else None,
+                )
+            self.log_directory = log_directory
+        return log_directory
+
+    def _server_version_hash(self) -> str:
+        """The version of the server as the `pyre` client that started it sees it,
+        from the configurations of the project."""
+        overriding_version_hash = os.getenv("PYRE_VERSION_HASH")
+        if overriding_version_hash:
+            return overriding_version_hash
+        found_root = find_global_and_local_root(self.pyre_directory)
+        if found_root is None:
+            return "unversioned"
+        # The local configuration takes precedence over the global one.
+        configurations = [found_root.global_root / CONFIGURATION_FILE]
+        if found_root.local_root is not None:
+            configurations.insert(0, found_root.local_root / LOCAL_CONFIGURATION_FILE)
+        for configuration in configurations:
+            try:
+                version_hash = json.loads(configuration.read_text()).get("version")
+            except (OSError, ValueError, AttributeError):
+                continue
+            if version_hash:
+                return version_hash
+        return "unversioned"
+
+    def _connect(self) -> Optional[SocketConnection]:
+        socket_connection = SocketConnection(str(self._server_log_directory()))
+        try:
+            socket_connection.connect()
+            socket_connection.perform_handshake(self._server_version_hash())
+        except SocketException as error:
+            LOG.debug(f"Could not connect to the server: {error}")
+            socket_connection.close()
+            return None
+        return socket_connection
+
+    def _query_server_with_subprocess(self, query: str) -> PyreQueryResult:
         LOG.debug(f"Running query: `pyre query '{query}'`")
         result = subprocess.run(
             ["pyre", "--noninteractive", "query", query],
@@ -112,6 +201,95 @@ class PyreConnection:
             )
         return self._validate_query_response(result.stdout.decode())
 
+    def _query_server_with_socket(
+        self, queries: Sequence[str]
+    ) -> List[Optional[PyreQueryResult]]:
+        """Returns the result of each query, or None for the queries that could
+        not be answered over the socket."""
+        LOG.debug(f"Sending {len(queries)} queries to the server.")
+        responses = _send_pipelined(
+            self._connect,
+            [
+                json_rpc.Request(method="typeQuery", parameters={"query": query})
+                for query in queries
+            ],
+        )
+
+        results: List[Optional[PyreQueryResult]] = []
+        for response in responses:
+            if response is None:
+                results.append(None)
+                continue
+            if response.error is not None:
+                raise PyreQueryError(
+                    f"Error while running query: {json.dumps(response.error)}"
+                )
+            results.append(self._validate_query_result(response.result))
+        return results
+
+    def query_server(self, query: str) -> PyreQueryResult:
+        return self.query_server_batch([query])[0]
+
+    def query_server_batch(self, queries: Sequence[str]) -> List[PyreQueryResult]:
+        """Run the queries and return their results in order. Queries are sent
+        over the socket without waiting for the previous responses."""
+        if not self.server_initialized:
+            self.start_server()
+
+        results: List[Optional[PyreQueryResult]] = [None] * len(queries)
+        socket_indices = [
+            index
+            for index, query in enumerate(queries)
+            if not QUERY_PATH_PATTERN.search(query)
+        ]
+        socket_results = self._query_server_with_socket(
+            [queries[index] for index in socket_indices]
+        )
+        for index, result in zip(socket_indices, socket_results):
+            results[index] = result
+        for index, query in enumerate(queries):
+            if results[index] is None:
+                results[index] = self._query_server_with_subprocess(query)
+        # pyre-fixme[7]: Every result was filled in above.
+        return results
+
+
+def _send_pipelined(
+    connect: Callable[[], Optional[SocketConnection]],
+    requests: Sequence[json_rpc.Request],
+) -> List[Optional[json_rpc.Response]]:
+    """Send each request over a connection of its own, since the server closes
+    a connection once it has answered it, and read their responses, keeping at
+    most `PIPELINE_DEPTH` requests in flight. Requests stop being sent once the
+    server can't be reached. The requests that have no response are None."""
+    responses: List[Optional[json_rpc.Response]] = [None] * len(requests)
+    in_flight: Deque[Tuple[int, SocketConnection]] = deque()
+
+    def read_response() -> None:
+        index, socket_connection = in_flight.popleft()
+        try:
+            responses[index] = socket_connection.read()
+        except json_rpc.JSONRPCException as error:
+            LOG.debug(f"Could not read the response of the server: {error}")
+        finally:
+            socket_connection.close()
+
+    for index, request in enumerate(requests):
+        socket_connection = connect()
+        if socket_connection is None:
+            break
+        try:
+            socket_connection.send(request)
+        except SocketException:
+            socket_connection.close()
+            break
+        in_flight.append((index, socket_connection))
+        if len(in_flight) >= PIPELINE_DEPTH:
+            read_response()
+    while in_flight:
+        read_response()
+    return responses
+
 
 def _parse_check_output(
     completed_process: "subprocess.CompletedProcess[bytes]",
@@ -4,14 +4,98 @@
 # LICENSE file in the root directory of this source tree.
 
 
+import json
+import os
+import socket
 import subprocess
+import tempfile
+import threading
 import unittest
+from contextlib import contextmanager
 from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, List
 from unittest.mock import MagicMock, call, patch
 
+from ...client.json_rpc import Request, read_request
+from .. import connection
 from ..connection import PyreConnection, PyreQueryError
 
 
+def _write_response(outfile: BinaryIO, query: str) -> None:
+    # Like the server, responses to queries have no id.
+    payload = json.dumps(
+        {
+            "jsonrpc": "2.0",
+            "result": {"response": query},
+            "error": {"message": "Failed"} if query == "fail" else None,
+        }
+    ).encode("utf-8")
+    outfile.write(b"Content-Length: %d\r\n\r\n" % len(payload))
+    outfile.write(payload)
+    outfile.flush()
+
+
+# Writes the response to a query, if any.
+QueryHandler = Callable[[BinaryIO, str], None]
+
+
+@contextmanager
+def _fake_server(
+    root: str, handle_query: QueryHandler = _write_response
+) -> Iterator[List[str]]:
+    """Serves the server socket of the log directory `root` from a thread, and
+    yields the queries it received. Like the server, every connection is closed
+    after the first query on it is answered."""
+    socket_path = os.path.join(root, "server", "json_server.sock")
+    os.makedirs(os.path.dirname(socket_path))
+    server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server_socket.bind(socket_path)
+    server_socket.listen(connection.PIPELINE_DEPTH)
+    queries: List[str] = []
+    stopped = threading.Event()
+
+    def serve_connection(client_socket: socket.socket) -> None:
+        outfile = client_socket.makefile(mode="wb")
+        infile = client_socket.makefile(mode="rb")
+        try:
+            Request(method="handshake/server", parameters={"version": "123"}).write(
+                outfile
+            )
+            request = read_request(infile)
+            if not request or request.method != "handshake/client":
+                return
+            Request(method="handshake/socket_added").write(outfile)
+            request = read_request(infile)
+            if request and request.method == "typeQuery" and request.parameters:
+                query = request.parameters["query"]
+                queries.append(query)
+                handle_query(outfile, query)
+        finally:
+            outfile.close()
+            infile.close()
+            client_socket.close()
+
+    def serve() -> None:
+        while True:
+            client_socket, _ = server_socket.accept()
+            if stopped.is_set():
+                client_socket.close()
+                return
+            serve_connection(client_socket)
+
+    server_thread = threading.Thread(target=serve)
+    server_thread.start()
+    try:
+        yield queries
+    finally:
+        # Unblocks the server waiting for the next connection.
+        stopped.set()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client_socket:
+            client_socket.connect(socket_path)
+        server_thread.join()
+        server_socket.close()
+
+
 class ConnectionApiTest(unittest.TestCase):
     # pyre-ignore[56]
     @patch.object(
@@ -134,3 +218,91 @@ class ConnectionApiTest(unittest.TestCase):
                 pass
             start_server.assert_called_once_with()
             stop_server.assert_called_once_with()
+
+    def _connection(self, root: str) -> PyreConnection:
+        Path(root, ".pyre_configuration").write_text('{"version": "123"}')
+        pyre_connection = PyreConnection(Path(root), log_directory=Path(root))
+        pyre_connection.server_initialized = True
+        return pyre_connection
+
+    @patch.object(connection, "PIPELINE_DEPTH", 2)
+    def test_query_server_batch(self) -> None:
+        with tempfile.TemporaryDirectory() as root:
+            pyre_connection = self._connection(root)
+            with _fake_server(root) as queries, patch("subprocess.run") as run:
+                run.return_value = MagicMock(
+                    returncode=0, stdout=b'{"response": "path"}'
+                )
+                self.assertEqual(
+                    pyre_connection.query_server_batch(
+                        ["a", "b", "types('a.py')", "c", "d"]
+                    ),
+                    [
+                        {"response": "a"},
+                        {"response": "b"},
+                        {"response": "path"},
+                        {"response": "c"},
+                        {"response": "d"},
+                    ],
+                )
+                # Queries with paths go through `pyre query`.
+                run.assert_called_once_with(
+                    ["pyre", "--noninteractive", "query", "types('a.py')"],
+                    stdout=subprocess.PIPE,
+                    cwd=root,
+                )
+                self.assertEqual(pyre_connection.query_server("e"), {"response": "e"})
+                with self.assertRaisesRegex(PyreQueryError, "Failed"):
+                    pyre_connection.query_server("fail")
+                self.assertEqual(pyre_connection.query_server("f"), {"response": "f"})
+            self.assertEqual(queries, ["a", "b", "c", "d", "e", "fail", "f"])
+
+    @patch("subprocess.run")
+    def test_query_server_batch__no_socket(self, run: MagicMock) -> None:
+        run.return_value = MagicMock(returncode=0, stdout=b'{"response": "a"}')
+        with tempfile.TemporaryDirectory() as root:
+            pyre_connection = self._connection(root)
+            self.assertEqual(
+                pyre_connection.query_server_batch(["a", "a"]),
+                [{"response": "a"}, {"response": "a"}],
+            )
+            self.assertEqual(run.call_count, 2)
+            run.assert_called_with(
+                ["pyre", "--noninteractive", "query", "a"],
+                stdout=subprocess.PIPE,
+                cwd=root,
+            )
+
+    @patch("subprocess.run")
+    def test_query_server_batch__version_mismatch(self, run: MagicMock) -> None:
+        run.return_value = MagicMock(returncode=0, stdout=b'{"response": "a"}')
+        with tempfile.TemporaryDirectory() as root:
+            pyre_connection = self._connection(root)
+            Path(root, ".pyre_configuration").write_text('{"version": "456"}')
+            with _fake_server(root) as queries:
+                self.assertEqual(pyre_connection.query_server("a"), {"response": "a"})
+            run.assert_called_once()
+            self.assertEqual(queries, [])
+
+    @patch.object(connection, "PIPELINE_DEPTH", 2)
+    @patch("subprocess.run")
+    def test_query_server_batch__socket_failure(self, run: MagicMock) -> None:
+        def close_on_b(outfile: BinaryIO, query: str) -> None:
+            if query != "b":
+                _write_response(outfile, query)
+
+        run.return_value = MagicMock(returncode=0, stdout=b'{"response": "b"}')
+        with tempfile.TemporaryDirectory() as root:
+            pyre_connection = self._connection(root)
+            with _fake_server(root, close_on_b) as queries:
+                # The query without a response falls back to `pyre query`.
+                self.assertEqual(
+                    pyre_connection.query_server_batch(["a", "b", "c"]),
+                    [{"response": "a"}, {"response": "b"}, {"response": "c"}],
+                )
+            run.assert_called_once_with(
+                ["pyre", "--noninteractive", "query", "b"],
+                stdout=subprocess.PIPE,
+                cwd=root,
+            )
+            self.assertEqual(queries, ["a", "b", "c"])
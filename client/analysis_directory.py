@@ -5,12 +5,15 @@
 
 import enum
 import functools
+import json
 import logging
 import os
 import shutil
+import stat
 import subprocess
 import tempfile
 import textwrap
+from concurrent.futures import ThreadPoolExecutor
 from itertools import chain
 from pathlib import Path
 from time import time
@@ -21,6 +24,7 @@ from .buck import BuckBuilder, find_buck_root
 from .configuration import Configuration
 from .exceptions import EnvironmentException
 from .filesystem import (
+    DirectoryIndex,
     _compute_symbolic_link_mapping,
     _delete_symbolic_link,
     acquire_lock,
@@ -28,7 +32,6 @@ from .filesystem import (
     add_symbolic_link,
     do_nothing,
     find_python_paths,
-    is_empty,
     is_parent,
     remove_if_exists,
     translate_path,
@@ -63,6 +66,17 @@ READER_WRITER_LOCK = "analysis_directory_reader_writer.lock"
 
 TEMPORARY_DIRECTORY_PREFIX = "pyre_tmp_"
 
+# The links of a shared analysis directory are recorded in this manifest, so that
+# preparing the directory again only changes the links that differ.
+LINK_TREE_MANIFEST = ".pyre_link_tree_manifest.json"
+LINK_TREE_MANIFEST_VERSION = 1
+
+# Cache of the buck queries for the locations of new files.
+BUCK_QUERY_CACHE = ".pyre_buck_query_cache.json"
+
+# Maximum number of source directories walked at the same time.
+LINK_TREE_WALK_WORKERS = 8
+
 
 class NotWithinLocalConfigurationException(Exception):
     pass
@@ -95,6 +109,16 @@ def _resolve_filter_paths(
     return translate_paths(filter_paths, original_directory)
 
 
+class LinkTreeEntry(NamedTuple):
+    actual_path: str
+    # Modification time of the actual file when it was linked, if known.
+    modified_time: Optional[float]
+
+
+# Mapping from paths relative to the analysis directory to the files they link to.
+LinkTree = Dict[str, LinkTreeEntry]
+
+
 class UpdatedPaths(NamedTuple):
     updated_paths: List[str]
     deleted_paths: List[str]
@@ -146,10 +170,11 @@ class AnalysisDirectory:
         should be tracking.
         """
         deleted_paths = [path for path in paths if not os.path.isfile(path)]
+        deleted_path_set = set(deleted_paths)
         tracked_paths = [
             path
             for path in paths
-            if self._is_tracked(path) and path not in deleted_paths
+            if path not in deleted_path_set and self._is_tracked(path)
         ]
         tracked_paths.extend(deleted_paths)
         return UpdatedPaths(updated_paths=tracked_paths, deleted_paths=deleted_paths)
@@ -166,15 +191,21 @@ class AnalysisDirectory:
     def _tracked_directories(self) -> List[str]:
         return [os.path.abspath(self.get_root()), *self._search_path_directories]
 
+    @property
+    @functools.lru_cache(1)
+    def _tracked_directory_index(self) -> DirectoryIndex:
+        return DirectoryIndex(self._tracked_directories)
+
+    @property
+    @functools.lru_cache(1)
+    def _search_path_directory_index(self) -> DirectoryIndex:
+        return DirectoryIndex(self._search_path_directories)
+
     def _is_tracked(self, path: str) -> bool:
-        return any(
-            is_parent(directory, path) for directory in self._tracked_directories
-        )
+        return self._tracked_directory_index.contains(path)
 
     def _is_in_search_path(self, path: str) -> bool:
-        return any(
-            is_parent(directory, path) for directory in self._search_path_directories
-        )
+        return self._search_path_directory_index.contains(path)
 
     def acquire_shared_reader_lock(self) -> ContextManager[Optional[int]]:
         return do_nothing()
@@ -216,6 +247,8 @@ class SharedAnalysisDirectory(AnalysisDirectory):
         # Mapping from source files in the project root to symbolic links in the
         # analysis directory.
         self._symbolic_links: Dict[str, str] = {}
+        # The links created by the last build, along with the links of new files.
+        self._link_tree: Optional[LinkTree] = None
 
         self._configuration = configuration
         self._last_singly_deleted_path_and_link: Optional[Tuple[str, str]] = None
@@ -325,9 +358,14 @@ class SharedAnalysisDirectory(AnalysisDirectory):
 
         lock = os.path.join(root, ".pyre.lock")
         with acquire_lock_if_needed(lock, blocking=True, needed=not self._isolate):
-            self._clear()
-            self._merge()
-        self._symbolic_links.update(self.compute_symbolic_links())
+            link_tree = self._read_link_tree_manifest()
+            if link_tree is None:
+                self._clear()
+                self._merge()
+            else:
+                self._update(link_tree)
+            self._write_link_tree_manifest()
+        self._symbolic_links.update(self._symbolic_links_from_link_tree())
 
         runtime = time() - start
         LOG.log(log.PERFORMANCE, "Merged analysis directories in %fs", runtime)
@@ -349,17 +387,19 @@ class SharedAnalysisDirectory(AnalysisDirectory):
         with acquire_lock_if_needed(
             os.path.join(root, ".pyre.lock"), blocking=True, needed=not self._isolate
         ):
-            all_paths = {}
-            for source_directory in self._source_directories:
-                self._merge_into_paths(source_directory, all_paths)
-            for relative_path, project_path in all_paths.items():
-                scratch_path = os.path.join(root, relative_path)
-                if os.path.realpath(scratch_path) != project_path:
-                    add_symbolic_link(scratch_path, project_path)
-            for scratch_path in self._symbolic_links.values():
-                if not os.path.exists(scratch_path):
-                    os.remove(scratch_path)
-        self._symbolic_links = self.compute_symbolic_links()
+            link_tree = self._link_tree
+            if link_tree is None:
+                link_tree = self._read_link_tree_manifest()
+            if link_tree is None:
+                link_tree = {
+                    os.path.relpath(scratch_path, root): LinkTreeEntry(
+                        actual_path, None
+                    )
+                    for actual_path, scratch_path in self._symbolic_links.items()
+                }
+            self._update(link_tree)
+            self._write_link_tree_manifest()
+        self._symbolic_links = self._symbolic_links_from_link_tree()
 
     def compute_symbolic_links(self) -> Dict[str, str]:
         return _compute_symbolic_link_mapping(self.get_root(), self._extensions)
@@ -502,10 +542,21 @@ class SharedAnalysisDirectory(AnalysisDirectory):
         # Using the modified time instead of a Watchman `since` query because
         # these files will be in the buck builder cache or in /tmp, and Watchman
         # doesn't track those.
+        modified_times = {
+            entry.actual_path: entry.modified_time
+            for entry in (self._link_tree or {}).values()
+        }
+
+        def modified_time(shared_analysis_path: str, original_path: str) -> float:
+            modified_time = modified_times.get(shared_analysis_path)
+            if modified_time is None:
+                return os.path.getmtime(original_path)
+            return modified_time
+
         updated_paths = [
             shared_analysis_path
             for shared_analysis_path, original_path in self._symbolic_links.items()
-            if os.path.getmtime(original_path) > rebuild_start_time
+            if modified_time(shared_analysis_path, original_path) > rebuild_start_time
         ]
         tracked_paths.extend(updated_paths)
 
@@ -540,7 +591,9 @@ class SharedAnalysisDirectory(AnalysisDirectory):
             relative_link_map = {}
             try:
                 relative_link_map = buck.query_buck_relative_paths(
-                    new_paths, self._targets
+                    new_paths,
+                    self._targets,
+                    cache_path=os.path.join(self.get_root(), BUCK_QUERY_CACHE),
                 )
             except buck.BuckException as error:
                 LOG.error("Exception occurred when querying buck: %s", error)
@@ -555,6 +608,9 @@ class SharedAnalysisDirectory(AnalysisDirectory):
             try:
                 add_symbolic_link(absolute_link, path)
                 self._symbolic_links[path] = absolute_link
+                if self._link_tree is not None:
+                    relative_link = os.path.relpath(absolute_link, self.get_root())
+                    self._link_tree[relative_link] = LinkTreeEntry(path, None)
             except OSError:
                 LOG.warning("Failed to add link at %s.", absolute_link)
 
@@ -580,32 +636,30 @@ class SharedAnalysisDirectory(AnalysisDirectory):
                     _delete_symbolic_link(link)
                 except OSError:
                     LOG.warning("Failed to delete link at `%s`.", link)
+                if self._link_tree is not None:
+                    relative_link = os.path.relpath(link, self.get_root())
+                    self._link_tree.pop(relative_link, None)
         return deleted_paths, deleted_scratch_paths
 
     def _get_new_deleted_and_tracked_paths(
         self, paths: List[str]
     ) -> Tuple[List[str], List[str], List[str]]:
-        deleted_paths = [
-            path
-            for path in paths
-            if not os.path.isfile(path)
-            and (path in self._symbolic_links or self._is_tracked(path))
-        ]
-        new_paths = [
-            path
-            for path in paths
-            if path not in self._symbolic_links
-            and not self._is_in_search_path(path)
-            and os.path.isfile(path)
-            and is_parent(self._project_root, path)
-        ]
-        tracked_paths = [
-            path
-            for path in paths
-            if path not in new_paths
-            and path not in deleted_paths
-            and (path in self._symbolic_links or self._is_tracked(path))
-        ]
+        new_paths = []
+        deleted_paths = []
+        tracked_paths = []
+        for path in paths:
+            is_linked = path in self._symbolic_links
+            if os.path.isfile(path):
+                if (
+                    not is_linked
+                    and not self._is_in_search_path(path)
+                    and is_parent(self._project_root, path)
+                ):
+                    new_paths.append(path)
+                elif is_linked or self._is_tracked(path):
+                    tracked_paths.append(path)
+            elif is_linked or self._is_tracked(path):
+                deleted_paths.append(path)
         return new_paths, deleted_paths, tracked_paths
 
     def _process_updated_files(self, paths: List[str]) -> UpdatedPaths:
@@ -625,6 +679,7 @@ class SharedAnalysisDirectory(AnalysisDirectory):
                 tracked_paths, new_paths, deleted_paths
             )
         elif new_paths or deleted_paths:
+            self._invalidate_link_tree_manifest()
             if new_paths:
                 LOG.info("Detected new paths: %s.", ",".join(new_paths))
                 tracked_paths = self._process_new_paths(
@@ -693,17 +748,102 @@ class SharedAnalysisDirectory(AnalysisDirectory):
     def _merge(self) -> None:
         root = self.get_root()
 
-        all_paths = {}
-        for source_directory in self._source_directories:
-            self._merge_into_paths(source_directory, all_paths)
-        for relative, original in all_paths.items():
+        link_tree = self._compute_link_tree()
+        for relative, entry in link_tree.items():
             merged = os.path.join(root, relative)
-            add_symbolic_link(merged, original)
+            add_symbolic_link(merged, entry.actual_path)
+        self._link_tree = link_tree
+
+    def _update(self, old_link_tree: LinkTree) -> None:
+        """Change the links of the analysis directory from the old link tree to
+        the one of the source directories, leaving unchanged links alone. Links
+        that the old link tree lists but that were deleted or replaced on disk
+        since are created again."""
+        root = self.get_root()
+
+        link_tree = self._compute_link_tree()
+        for relative in old_link_tree.keys() - link_tree.keys():
+            try:
+                _delete_symbolic_link(os.path.join(root, relative))
+            except OSError:
+                pass  # Already deleted.
+        for relative, entry in link_tree.items():
+            link_path = os.path.join(root, relative)
+            old_entry = old_link_tree.get(relative)
+            if (
+                old_entry is None
+                or old_entry.actual_path != entry.actual_path
+                or not _is_link_to(link_path, entry.actual_path)
+            ):
+                add_symbolic_link(link_path, entry.actual_path)
+        self._link_tree = link_tree
+
+    def _compute_link_tree(self) -> LinkTree:
+        """Walk the source directories in parallel. As when merging them one
+        after the other, the first source directory with a path wins."""
+        source_directories = list(self._source_directories)
+
+        def walk(source_directory: str) -> LinkTree:
+            paths: LinkTree = {}
+            self._merge_into_paths(source_directory, paths)
+            return paths
+
+        link_tree: LinkTree = {}
+        workers = max(min(len(source_directories), LINK_TREE_WALK_WORKERS), 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for paths in executor.map(walk, source_directories):
+                for relative, entry in paths.items():
+                    link_tree.setdefault(relative, entry)
+        return link_tree
+
+    def _symbolic_links_from_link_tree(self) -> Dict[str, str]:
+        root = self.get_root()
+        return {
+            entry.actual_path: os.path.join(root, relative)
+            for relative, entry in (self._link_tree or {}).items()
+        }
+
+    def _link_tree_manifest_path(self) -> str:
+        return os.path.join(self.get_root(), LINK_TREE_MANIFEST)
+
+    def _read_link_tree_manifest(self) -> Optional[LinkTree]:
+        try:
+            with open(self._link_tree_manifest_path()) as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest["version"] != LINK_TREE_MANIFEST_VERSION:
+                return None
+            return {
+                relative: LinkTreeEntry(actual_path, modified_time)
+                for relative, (actual_path, modified_time) in manifest["links"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_link_tree_manifest(self) -> None:
+        link_tree = self._link_tree
+        if link_tree is None:
+            return
+        path = self._link_tree_manifest_path()
+        try:
+            with open(path + ".tmp", "w") as manifest_file:
+                json.dump(
+                    {"version": LINK_TREE_MANIFEST_VERSION, "links": link_tree},
+                    manifest_file,
+                )
+            os.replace(path + ".tmp", path)
+        except OSError as error:
+            LOG.warning("Could not write the link tree manifest: %s", error)
+
+    def _invalidate_link_tree_manifest(self) -> None:
+        """The links were changed for new or deleted files, which the manifest
+        doesn't know about until the next rebuild."""
+        try:
+            os.remove(self._link_tree_manifest_path())
+        except OSError:
+            pass
 
     # Exposed for testing.
-    def _merge_into_paths(
-        self, source_directory: str, all_paths: Dict[str, str]
-    ) -> None:
+    def _merge_into_paths(self, source_directory: str, all_paths: LinkTree) -> None:
         paths = find_python_paths(root=source_directory)
         for path in paths:
             relative = os.path.relpath(path, source_directory)
@@ -714,15 +854,16 @@ class SharedAnalysisDirectory(AnalysisDirectory):
                 continue
             try:
                 absolute = os.path.realpath(path)
-                # Don't merge symlinked directories.
-                if not os.path.isfile(absolute):
-                    continue
-                if relative.endswith("__init__.py") and is_empty(absolute):
-                    # Don't let empty __init__.py files override legitimate files.
-                    continue
-                all_paths[relative] = absolute
-            except FileNotFoundError:
+                status = os.stat(absolute)
+            except OSError:
+                continue
+            # Don't merge symlinked directories.
+            if not stat.S_ISREG(status.st_mode):
                 continue
+            if relative.endswith("__init__.py") and status.st_size == 0:
+                # Don't let empty __init__.py files override legitimate files.
+                continue
+            all_paths[relative] = LinkTreeEntry(absolute, status.st_mtime)
 
     def _reader_writer_lock_path(self) -> str:
         return os.path.join(self.get_root(), READER_WRITER_LOCK)
@@ -738,6 +879,13 @@ class SharedAnalysisDirectory(AnalysisDirectory):
         )
 
 
+def _is_link_to(link_path: str, actual_path: str) -> bool:
+    try:
+        return os.readlink(link_path) == actual_path
+    except OSError:
+        return False
+
+
 def _get_project_name(
     isolate_per_process: bool, relative_local_root: Optional[str]
 ) -> Optional[str]:
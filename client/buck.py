@@ -14,9 +14,10 @@ import threading
 from json.decoder import JSONDecodeError
 from logging import Logger
 from pathlib import Path
-from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 
 from . import source_database_buck_builder
+from .filesystem import is_parent
 from .find_directories import find_parent_directory_containing_file
 
 
@@ -383,12 +384,148 @@ def clear_buck_query_cache() -> None:
     _buck_query.cache_clear()
 
 
+# Files that define the targets of a buck package.
+BUILD_FILE_NAMES: Tuple[str, ...] = ("TARGETS", "BUCK")
+
+BUCK_QUERY_CACHE_VERSION = 2
+
+
+class BuildFile(NamedTuple):
+    path: Optional[str]
+    modified_time: Optional[float]
+
+
+class BuckQueryCacheEntry(NamedTuple):
+    relative_path: str
+    build_file: BuildFile
+
+
+def _build_file_in(directory: str) -> Optional[BuildFile]:
+    for name in BUILD_FILE_NAMES:
+        path = os.path.join(directory, name)
+        try:
+            return BuildFile(path, os.stat(path).st_mtime)
+        except OSError:
+            continue
+    return None
+
+
+def _find_build_file(
+    project_path: str, buck_root: str, build_files: Dict[str, BuildFile]
+) -> BuildFile:
+    """Return the build file of the package owning the path. Lookups are
+    memoized per directory in `build_files`."""
+    build_file = BuildFile(None, None)
+    visited = []
+    directory = os.path.dirname(project_path)
+    while directory == buck_root or is_parent(buck_root, directory):
+        if directory in build_files:
+            build_file = build_files[directory]
+            break
+        visited.append(directory)
+        found = _build_file_in(directory)
+        parent = os.path.dirname(directory)
+        if found is not None or parent == directory:
+            build_file = found or build_file
+            break
+        directory = parent
+    for directory in visited:
+        build_files[directory] = build_file
+    return build_file
+
+
+def _load_buck_query_cache(
+    cache_path: str, targets: Tuple[str, ...]
+) -> Dict[str, BuckQueryCacheEntry]:
+    try:
+        with open(cache_path) as cache_file:
+            cache = json.load(cache_file)
+        if cache["version"] != BUCK_QUERY_CACHE_VERSION or cache["targets"] != sorted(
+            targets
+        ):
+            return {}
+        return {
+            project_path: BuckQueryCacheEntry(relative_path, BuildFile(*build_file))
+            for project_path, (relative_path, build_file) in cache["paths"].items()
+        }
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def _save_buck_query_cache(
+    cache_path: str,
+    targets: Tuple[str, ...],
+    entries: Dict[str, BuckQueryCacheEntry],
+) -> None:
+    try:
+        with open(cache_path + ".tmp", "w") as cache_file:
+            json.dump(
+                {
+                    "version": BUCK_QUERY_CACHE_VERSION,
+                    "targets": sorted(targets),
+                    "paths": entries,
+                },
+                cache_file,
+            )
+        os.replace(cache_path + ".tmp", cache_path)
+    except OSError as error:
+        LOG.warning("Could not write the buck query cache: %s", error)
+
+
+def _resolve_relative_paths(
+    project_paths: Iterable[str], owner_output: Dict[str, Any], buck_root: str
+) -> Dict[str, str]:
+    # Owner targets by the absolute path of their package, in query order.
+    targets_by_base_path: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    for index, target_data in enumerate(owner_output.values()):
+        base_path = os.path.join(buck_root, target_data["buck.base_path"])
+        targets_by_base_path.setdefault(base_path.rstrip(os.sep), []).append(
+            (index, target_data)
+        )
+
+    results = {}
+    for project_path in project_paths:
+        owners = []
+        directory = os.path.dirname(project_path)
+        while directory == buck_root or is_parent(buck_root, directory):
+            for index, target_data in targets_by_base_path.get(directory, []):
+                suffix = project_path[len(directory) + 1 :]
+                if suffix in target_data["srcs"]:
+                    owners.append((index, suffix, target_data))
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+        if not owners:
+            continue
+
+        # Pick the first owner returned by the query, since there might be
+        # multiple matches.
+        _, suffix, target_data = min(owners, key=lambda owner: owner[0])
+        if "buck.base_module" in target_data:
+            base_path = os.path.join(*target_data["buck.base_module"].split("."))
+        elif "base_module" in target_data:
+            base_path = os.path.join(*target_data["base_module"].split("."))
+        else:
+            base_path = target_data["buck.base_path"]
+        results[project_path] = os.path.join(base_path, target_data["srcs"][suffix])
+    return results
+
+
 def query_buck_relative_paths(
-    project_paths: Iterable[str], targets: Iterable[str]
+    project_paths: Iterable[str],
+    targets: Iterable[str],
+    cache_path: Optional[str] = None,
 ) -> Dict[str, str]:
     """Return a mapping from each absolute project path to its relative location
     in the buck output directory.
-    This queries buck and only returns paths that are covered by `targets`."""
+    This queries buck and only returns paths that are covered by `targets`.
+
+    With a `cache_path`, the locations are kept on disk and reused as long as
+    the build file owning each path is unchanged. Only the other paths are
+    queried, in a single query. Paths that aren't covered are always queried,
+    since a path becomes covered when a dependency is added to any of the
+    targets, in other build files."""
     buck_root = find_buck_root(os.getcwd())
     if buck_root is None:
         LOG.error(
@@ -398,8 +535,31 @@ def query_buck_relative_paths(
 
     project_paths = tuple(project_paths)
     targets = tuple(targets)
+
+    results = {}
+    queried_paths = list(project_paths)
+    cache: Dict[str, BuckQueryCacheEntry] = {}
+    build_files: Dict[str, BuildFile] = {}
+    if cache_path is not None:
+        cache = _load_buck_query_cache(cache_path, targets)
+        queried_paths = []
+        for project_path in project_paths:
+            build_file = _find_build_file(project_path, buck_root, build_files)
+            entry = cache.get(project_path)
+            if entry is None or entry.build_file != build_file:
+                queried_paths.append(project_path)
+            else:
+                results[project_path] = entry.relative_path
+        if not queried_paths:
+            return results
+        LOG.debug(
+            "Buck query cache: %d hits, %d misses.",
+            len(project_paths) - len(queried_paths),
+            len(queried_paths),
+        )
+
     try:
-        owner_output = json.loads(_buck_query(project_paths, targets))
+        owner_output = json.loads(_buck_query(tuple(queried_paths), targets))
     except (
         subprocess.TimeoutExpired,
         subprocess.CalledProcessError,
@@ -407,23 +567,20 @@ def query_buck_relative_paths(
     ) as error:
         raise BuckException("Querying buck for relative paths failed: {}".format(error))
 
-    results = {}
-    for project_path in project_paths:
-        for target_data in owner_output.values():
-            prefix = os.path.join(buck_root, target_data["buck.base_path"]) + os.sep
-            suffix = project_path[len(prefix) :]
-            if not project_path.startswith(prefix) or suffix not in target_data["srcs"]:
-                continue
-
-            if "buck.base_module" in target_data:
-                base_path = os.path.join(*target_data["buck.base_module"].split("."))
-            elif "base_module" in target_data:
-                base_path = os.path.join(*target_data["base_module"].split("."))
+    queried_results = _resolve_relative_paths(queried_paths, owner_output, buck_root)
+    results.update(queried_results)
+
+    if cache_path is not None:
+        for project_path in queried_paths:
+            relative_path = queried_results.get(project_path)
+            if relative_path is None:
+                cache.pop(project_path, None)
             else:
-                base_path = target_data["buck.base_path"]
-            results[project_path] = os.path.join(base_path, target_data["srcs"][suffix])
-            # Break after the first one because there might be multiple matches.
-            break
+                cache[project_path] = BuckQueryCacheEntry(
+                    relative_path,
+                    _find_build_file(project_path, buck_root, build_files),
+                )
+        _save_buck_query_cache(cache_path, targets, cache)
     return results
 
 
@@ -99,6 +99,28 @@ def is_parent(parent: str, child: str) -> bool:
     return child.startswith(parent.rstrip(os.sep) + os.sep)
 
 
+class DirectoryIndex:
+    """Answers `is_parent` for a set of directories at once, by looking up each
+    ancestor of a path instead of comparing it against every directory."""
+
+    def __init__(self, directories: Iterable[str]) -> None:
+        self._directories: Set[str] = {
+            directory.rstrip(os.sep) or os.sep for directory in directories
+        }
+
+    def contains(self, path: str) -> bool:
+        """Whether the path is within any of the directories."""
+        directory = os.path.dirname(path)
+        while directory:
+            if directory in self._directories:
+                return True
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return False
+            directory = parent
+        return False
+
+
 def find_paths_with_extensions(root: str, extensions: Iterable[str]) -> List[str]:
     root = os.path.abspath(root)  # Return absolute paths.
     extension_filter = []
@@ -136,10 +158,28 @@ def find_paths_with_extensions(root: str, extensions: Iterable[str]) -> List[str
     return output.split("\n") if output else []
 
 
+def scan_paths_with_extensions(root: str, extensions: Iterable[str]) -> List[str]:
+    """Like `find_paths_with_extensions`, but walks the directory with `os.scandir`
+    instead of running `find`. Symbolic links to directories are not followed."""
+    suffixes = tuple(".{}".format(extension) for extension in extensions)
+    paths = []
+    directories = [os.path.abspath(root)]
+    while directories:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.name.endswith(suffixes) and (
+                    entry.is_file(follow_symlinks=False) or entry.is_symlink()
+                ):
+                    paths.append(entry.path)
+    return paths
+
+
 def find_python_paths(root: str) -> List[str]:
     try:
-        return find_paths_with_extensions(root, ["py", "pyi"])
-    except subprocess.CalledProcessError:
+        return scan_paths_with_extensions(root, ["py", "pyi"])
+    except OSError:
         raise EnvironmentException(
             "Pyre was unable to locate an analysis directory. "
             "Ensure that your project is built and re-run pyre."
@@ -6,8 +6,9 @@
 
 import functools
 import os
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Sequence, Set
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set
 
 from . import json_rpc, watchman
 from .analysis_directory import AnalysisDirectory
@@ -21,10 +22,24 @@ from .socket_connection import SocketConnection
 from .watchman import LOG, Subscriber, Subscription
 
 
+# Watchman updates are batched until no update was received for this long ...
+COALESCING_WINDOW_IN_SECONDS: float = 0.1
+# ... or until the first update of the batch is this old ...
+MAXIMUM_BATCH_LATENCY_IN_SECONDS: float = 1.0
+# ... or until the batch has this many paths.
+MAXIMUM_BATCH_SIZE: int = 10000
+
+
 class MonitorException(Exception):
     pass
 
 
+class PendingPath(NamedTuple):
+    # Whether the file was created during the batch.
+    created: bool
+    exists: bool
+
+
 def _log_paths(message: str, paths: Sequence[str]) -> None:
     path_count = len(paths)
     log_threshold = 30
@@ -50,12 +65,24 @@ class ProjectFilesMonitor(Subscriber):
         configuration: Configuration,
         project_root: str,
         analysis_directory: AnalysisDirectory,
+        coalescing_window: float = COALESCING_WINDOW_IN_SECONDS,
+        maximum_batch_latency: float = MAXIMUM_BATCH_LATENCY_IN_SECONDS,
+        maximum_batch_size: int = MAXIMUM_BATCH_SIZE,
     ) -> None:
         super(ProjectFilesMonitor, self).__init__(
             self.base_path(configuration), configuration
         )
         self._analysis_directory = analysis_directory
 
+        self._coalescing_window = coalescing_window
+        self._maximum_batch_latency = maximum_batch_latency
+        self._maximum_batch_size = maximum_batch_size
+        # Paths updated since the last batch was processed, in the order in which
+        # they were first updated.
+        self._pending_paths: Dict[str, PendingPath] = {}
+        self._batch_start_time: float = 0.0
+        self._last_update_time: float = 0.0
+
         self._extensions: Set[str] = set(
             ["py", "pyi", "thrift"]
             + [extension[1:] for extension in configuration.get_valid_extensions()]
@@ -87,7 +114,7 @@ class ProjectFilesMonitor(Subscriber):
                     ["match", "TARGETS"],
                 ],
             ],
-            "fields": ["name"],
+            "fields": ["name", "new", "exists"],
         }
         return [
             Subscription(
@@ -101,9 +128,69 @@ class ProjectFilesMonitor(Subscriber):
 
     def _handle_response(self, response: Dict[str, Any]) -> None:
         try:
-            absolute_paths = [
-                os.path.join(response["root"], path) for path in response["files"]
+            files = [
+                (os.path.join(response["root"], file["name"]), file)
+                for file in response["files"]
             ]
+        except KeyError:
+            return
+
+        now = time.monotonic()
+        if not self._pending_paths:
+            self._batch_start_time = now
+        self._last_update_time = now
+        for path, file in files:
+            pending_path = self._pending_paths.get(path)
+            created = (
+                pending_path.created
+                if pending_path is not None
+                else file.get("new", False)
+            )
+            self._pending_paths[path] = PendingPath(
+                created=created, exists=file.get("exists", True)
+            )
+
+        if (
+            self._coalescing_window <= 0
+            or len(self._pending_paths) >= self._maximum_batch_size
+            or now - self._batch_start_time >= self._maximum_batch_latency
+        ):
+            self._process_pending_paths()
+
+    def _receive_timeout(self) -> Optional[float]:
+        if not self._pending_paths:
+            return None
+        deadline = min(
+            self._last_update_time + self._coalescing_window,
+            self._batch_start_time + self._maximum_batch_latency,
+        )
+        return deadline - time.monotonic()
+
+    def _handle_timeout(self) -> None:
+        self._process_pending_paths()
+
+    def _process_pending_paths(self) -> None:
+        pending_paths = self._pending_paths
+        self._pending_paths = {}
+        if not pending_paths:
+            return
+
+        # Files that were created and deleted again during the batch never
+        # concern the server.
+        absolute_paths = [
+            path
+            for path, pending_path in pending_paths.items()
+            if pending_path.exists or not pending_path.created
+        ]
+        if len(absolute_paths) < len(pending_paths):
+            LOG.info(
+                "Ignoring %d files created and deleted within the batch.",
+                len(pending_paths) - len(absolute_paths),
+            )
+        if not absolute_paths:
+            return
+
+        try:
             _log_paths("Received Watchman update for files", absolute_paths)
 
             updated_paths = self._analysis_directory.process_updated_files(
@@ -131,9 +218,6 @@ class ProjectFilesMonitor(Subscriber):
                 self._alive = False  # terminate daemon
                 self.socket_connection.close()
 
-        except KeyError:
-            pass
-
         except BuckException as exception:
             LOG.info(f"Unable to build project because of exception: `{exception}`.")
 
@@ -164,5 +248,11 @@ class ProjectFilesMonitor(Subscriber):
         return is_alive
 
     def cleanup(self) -> None:
+        if self._pending_paths:
+            LOG.info("Processing pending updates before exiting.")
+            try:
+                self._process_pending_paths()
+            except Exception as exception:
+                LOG.info(f"Unable to process pending updates: {exception}")
         LOG.info("Cleaning up the analysis directory.")
         self._analysis_directory.cleanup(delete_long_lasting_files=True)
@@ -9,14 +9,15 @@ import subprocess
 import tempfile
 import unittest
 from pathlib import Path
-from typing import Dict
 from unittest.mock import MagicMock, call, patch
 
 from .. import analysis_directory, buck, filesystem
 from ..analysis_directory import (
+    LINK_TREE_MANIFEST,
     REBUILD_THRESHOLD_FOR_NEW_OR_DELETED_PATHS,
     REBUILD_THRESHOLD_FOR_UPDATED_PATHS,
     AnalysisDirectory,
+    LinkTree,
     SharedAnalysisDirectory,
     UpdatedPaths,
     __name__ as analysis_directory_name,
@@ -1005,10 +1006,10 @@ class SharedAnalysisDirectoryTest(unittest.TestCase):
         shared_analysis_directory = SharedAnalysisDirectory(
             [root], [], project_root=root
         )
-        all_paths: Dict[str, str] = {}
+        all_paths: LinkTree = {}
         shared_analysis_directory._merge_into_paths(root, all_paths)
         self.assertEqual(
-            all_paths,
+            {relative: entry.actual_path for relative, entry in all_paths.items()},
             {
                 "a.py": os.path.join(root, "a.py"),
                 "b.pyi": os.path.join(root, "b.pyi"),
@@ -1206,6 +1207,91 @@ class SharedAnalysisDirectoryTest(unittest.TestCase):
                 shared_analysis_directory._symbolic_links,
             )
 
+    def test_prepare__link_tree_manifest(self) -> None:
+        source_directory = os.path.realpath(tempfile.mkdtemp("_source"))
+        scratch_directory = os.path.realpath(tempfile.mkdtemp("_scratch"))
+
+        with patch.object(
+            SharedAnalysisDirectory, "get_root", return_value=scratch_directory
+        ):
+            Path(source_directory, "existing.py").touch()
+            Path(source_directory, "to_be_deleted.py").touch()
+            SharedAnalysisDirectory(
+                [source_directory], [], project_root=source_directory
+            ).prepare()
+            self.assertTrue(
+                os.path.isfile(os.path.join(scratch_directory, LINK_TREE_MANIFEST))
+            )
+
+            # Only the links that changed are updated on the next start.
+            Path(source_directory, "new_file.py").touch()
+            os.remove(os.path.join(source_directory, "to_be_deleted.py"))
+            shared_analysis_directory = SharedAnalysisDirectory(
+                [source_directory], [], project_root=source_directory
+            )
+            with patch.object(SharedAnalysisDirectory, "_clear") as clear, patch.object(
+                analysis_directory,
+                "add_symbolic_link",
+                wraps=filesystem.add_symbolic_link,
+            ) as add_symbolic_link:
+                shared_analysis_directory.prepare()
+            clear.assert_not_called()
+            add_symbolic_link.assert_called_once_with(
+                os.path.join(scratch_directory, "new_file.py"),
+                os.path.join(source_directory, "new_file.py"),
+            )
+
+            self.assertFileIsLinkedBothWays(
+                "existing.py",
+                shared_analysis_directory,
+                scratch_directory,
+                source_directory,
+            )
+            self.assertFileIsLinkedBothWays(
+                "new_file.py",
+                shared_analysis_directory,
+                scratch_directory,
+                source_directory,
+            )
+            self.assertFalse(
+                os.path.lexists(os.path.join(scratch_directory, "to_be_deleted.py"))
+            )
+
+            # Links deleted or replaced since the manifest was written are
+            # created again.
+            os.remove(os.path.join(scratch_directory, "existing.py"))
+            os.remove(os.path.join(scratch_directory, "new_file.py"))
+            Path(scratch_directory, "new_file.py").touch()
+            shared_analysis_directory = SharedAnalysisDirectory(
+                [source_directory], [], project_root=source_directory
+            )
+            with patch.object(SharedAnalysisDirectory, "_clear") as clear:
+                shared_analysis_directory.prepare()
+            clear.assert_not_called()
+            for relative in ["existing.py", "new_file.py"]:
+                self.assertFileIsLinkedBothWays(
+                    relative,
+                    shared_analysis_directory,
+                    scratch_directory,
+                    source_directory,
+                )
+
+            # New files linked outside of a rebuild invalidate the manifest.
+            with patch.object(
+                buck,
+                "query_buck_relative_paths",
+                return_value={
+                    os.path.join(source_directory, "queried.py"): "queried.py"
+                },
+            ):
+                Path(source_directory, "queried.py").touch()
+                shared_analysis_directory.process_updated_files(
+                    [os.path.join(source_directory, "queried.py")]
+                )
+            self.assertFalse(
+                os.path.exists(os.path.join(scratch_directory, LINK_TREE_MANIFEST))
+            )
+
     # pyre-fixme[56]: Argument `tools.pyre.client.analysis_directory` to decorator
     #  factory `unittest.mock.patch.object` could not be resolved in a global scope.
     @patch.object(analysis_directory, "SocketConnection")
@@ -7,9 +7,12 @@
 
 import glob
 import json
+import os
 import subprocess
+import tempfile
 import unittest
 from collections import namedtuple
+from pathlib import Path
 from unittest.mock import MagicMock, call, mock_open, patch
 
 from .. import buck, source_database_buck_builder
@@ -274,6 +277,66 @@ class BuckTest(unittest.TestCase):
                 {"/BUCK_ROOT/src/python/package.py": "package.py"},
             )
 
+    def test_query_buck_relative_paths_cache(self) -> None:
+        buck_root = os.path.realpath(tempfile.mkdtemp())
+        os.makedirs(os.path.join(buck_root, "src/python"))
+        os.makedirs(os.path.join(buck_root, "src/other"))
+        Path(buck_root, "src/python/TARGETS").touch()
+        Path(buck_root, "src/other/TARGETS").touch()
+        cache_path = os.path.join(buck_root, "cache.json")
+
+        def query(command, timeout, stderr) -> bytes:
+            srcs = {
+                os.path.relpath(path, os.path.join(buck_root, "src/python")): "x.py"
+                for path in command[6:]
+                if path.startswith(os.path.join(buck_root, "src/python"))
+            }
+            return json.dumps(
+                {"targetA": {"buck.base_path": "src/python", "srcs": srcs}}
+            ).encode("utf-8")
+
+        a = os.path.join(buck_root, "src/python/a.py")
+        b = os.path.join(buck_root, "src/python/b.py")
+        other = os.path.join(buck_root, "src/other/c.py")
+        with patch.object(buck, "find_buck_root", return_value=buck_root), patch.object(
+            subprocess, "check_output", side_effect=query
+        ) as check_output:
+            self.assertEqual(
+                buck.query_buck_relative_paths(
+                    [a, other], ["targetA"], cache_path=cache_path
+                ),
+                {a: "src/python/x.py"},
+            )
+            self.assertEqual(check_output.call_count, 1)
+
+            # Covered paths are not queried again.
+            self.assertEqual(
+                buck.query_buck_relative_paths([a], ["targetA"], cache_path=cache_path),
+                {a: "src/python/x.py"},
+            )
+            self.assertEqual(check_output.call_count, 1)
+
+            # Only the paths that are not cached are queried. Paths that
+            # weren't covered are queried again.
+            self.assertEqual(
+                buck.query_buck_relative_paths(
+                    [a, b, other], ["targetA"], cache_path=cache_path
+                ),
+                {a: "src/python/x.py", b: "src/python/x.py"},
+            )
+            self.assertEqual(check_output.call_count, 2)
+            self.assertEqual(check_output.call_args[0][0][6:], [b, other])
+
+            # Changing a build file invalidates the paths it owns.
+            os.utime(os.path.join(buck_root, "src/python/TARGETS"), (0, 0))
+            buck.query_buck_relative_paths([a, b], ["targetA"], cache_path=cache_path)
+            self.assertEqual(check_output.call_count, 3)
+            self.assertEqual(check_output.call_args[0][0][6:], [a, b])
+
+            # The cache is specific to the queried targets.
+            buck.query_buck_relative_paths([a], ["targetB"], cache_path=cache_path)
+            self.assertEqual(check_output.call_count, 4)
+
     # pyre-fixme[56]: Pyre was not able to infer the type of argument
     #  `tools.pyre.client.source_database_buck_builder` to decorator factory
     #  `unittest.mock.patch.object`.
@@ -23,6 +23,7 @@ from ..analysis_directory import (
 )
 from ..commands.command import __name__ as command_name
 from ..filesystem import (
+    DirectoryIndex,
     Filesystem,
     MercurialBackedFilesystem,
     __name__ as filesystem_name,
@@ -32,6 +33,7 @@ from ..filesystem import (
     add_symbolic_link,
     expand_relative_path,
     find_python_paths,
+    is_parent,
     remove_if_exists,
 )
 from ..find_directories import FoundRoot
@@ -85,6 +87,30 @@ class FilesystemTest(unittest.TestCase):
             ],
         )
 
+    def test_directory_index(self) -> None:
+        directories = ["/root/project", "/root/typeshed/", "/scratch/baz/hello"]
+        index = DirectoryIndex(directories)
+        for path in [
+            "/root/project/a.py",
+            "/root/project/foo/b.py",
+            "/root/project",
+            "/root/project-other/a.py",
+            "/root/typeshed/stdlib/os.pyi",
+            "/root/a.py",
+            "/scratch/baz/hello/world.py",
+            "/scratch/baz/c.py",
+            "relative/a.py",
+        ]:
+            self.assertEqual(
+                index.contains(path),
+                any(is_parent(directory, path) for directory in directories),
+                path,
+            )
+
+        self.assertTrue(DirectoryIndex(["/"]).contains("/a.py"))
+        self.assertFalse(DirectoryIndex([]).contains("/a.py"))
+        self.assertTrue(DirectoryIndex(["project"]).contains("project/foo/a.py"))
+
     def test_remove_if_exists(self) -> None:
         # File removal.
         with patch("os.remove") as os_remove, patch("shutil.rmtree") as shutil_rmtree:
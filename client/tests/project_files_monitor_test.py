@@ -45,7 +45,7 @@ class MonitorTest(unittest.TestCase):
         subscription = monitor._subscriptions[0]
         self.assertEqual(subscription.root, "/ROOT")
         self.assertEqual(subscription.name, "pyre_file_change_subscription")
-        self.assertEqual(subscription.subscription["fields"], ["name"])
+        self.assertEqual(subscription.subscription["fields"], ["name", "new", "exists"])
         self.assertEqual(
             subscription.subscription["expression"][0:2], ["allof", ["type", "f"]]
         )
@@ -67,7 +67,7 @@ class MonitorTest(unittest.TestCase):
         subscription = monitor._subscriptions[0]
         self.assertEqual(subscription.root, "/ROOT")
         self.assertEqual(subscription.name, "pyre_file_change_subscription")
-        self.assertEqual(subscription.subscription["fields"], ["name"])
+        self.assertEqual(subscription.subscription["fields"], ["name", "new", "exists"])
         self.assertEqual(
             subscription.subscription["expression"][0:2], ["allof", ["type", "f"]]
         )
@@ -159,9 +159,17 @@ class MonitorTest(unittest.TestCase):
 
             # only create the monitor once the socket is open
             with socket_created_lock:
-                monitor = ProjectFilesMonitor(configuration, ".", analysis_directory)
+                monitor = ProjectFilesMonitor(
+                    configuration, ".", analysis_directory, coalescing_window=0.0
+                )
                 monitor._handle_response(
-                    {"root": "/ROOT", "files": ["a.py", "subdir/b.py"]}
+                    {
+                        "root": "/ROOT",
+                        "files": [
+                            {"name": "a.py", "new": False, "exists": True},
+                            {"name": "subdir/b.py", "new": False, "exists": True},
+                        ],
+                    }
                 )
                 analysis_directory.process_updated_files.assert_called_once_with(
                     ["/ROOT/a.py", "/ROOT/subdir/b.py"]
@@ -171,6 +179,86 @@ class MonitorTest(unittest.TestCase):
 
         self.assertEqual(errors, [])
 
+    @patch.object(SocketConnection, "connect")
+    @patch.object(json_rpc, "perform_handshake")
+    @patch.object(ProjectFilesMonitor, "_find_watchman_path")
+    def test_coalescing(
+        self, _find_watchman_path, perform_handshake, _socket_connection
+    ) -> None:
+        configuration = mock_configuration()
+        configuration.extensions = []
+        analysis_directory = MagicMock()
+        analysis_directory.process_updated_files.return_value = UpdatedPaths(
+            updated_paths=[], deleted_paths=[]
+        )
+        monitor = ProjectFilesMonitor(
+            configuration,
+            ".",
+            analysis_directory,
+            coalescing_window=0.1,
+            maximum_batch_latency=1.0,
+            maximum_batch_size=4,
+        )
+
+        def update(now: float, *files) -> None:
+            with patch.object(
+                project_files_monitor.time, "monotonic", return_value=now
+            ):
+                monitor._handle_response(
+                    {
+                        "root": "/ROOT",
+                        "files": [
+                            {"name": name, "new": new, "exists": exists}
+                            for name, new, exists in files
+                        ],
+                    }
+                )
+
+        # Updates are merged and deduplicated until the window passes. Files
+        # created and deleted within the batch are dropped, and files deleted and
+        # created again are updated.
+        update(0.0, ("a.py", False, True), ("temporary.py", True, True))
+        update(0.05, ("a.py", False, True), ("b.py", False, False))
+        update(0.08, ("temporary.py", False, False), ("b.py", True, True))
+        analysis_directory.process_updated_files.assert_not_called()
+        with patch.object(project_files_monitor.time, "monotonic", return_value=0.1):
+            self.assertAlmostEqual(monitor._receive_timeout(), 0.08)
+        monitor._handle_timeout()
+        analysis_directory.process_updated_files.assert_called_once_with(
+            ["/ROOT/a.py", "/ROOT/b.py"]
+        )
+        self.assertIsNone(monitor._receive_timeout())
+
+        # Large batches are processed right away.
+        analysis_directory.process_updated_files.reset_mock()
+        update(
+            1.0,
+            ("a.py", False, True),
+            ("b.py", False, True),
+            ("c.py", True, True),
+            ("d.py", True, True),
+        )
+        analysis_directory.process_updated_files.assert_called_once_with(
+            ["/ROOT/a.py", "/ROOT/b.py", "/ROOT/c.py", "/ROOT/d.py"]
+        )
+
+        # A continuous stream of updates is processed after the maximum latency.
+        analysis_directory.process_updated_files.reset_mock()
+        for index in range(10):
+            update(2.0 + index * 0.05, ("a.py", False, True))
+        analysis_directory.process_updated_files.assert_not_called()
+        update(3.0, ("a.py", False, True))
+        analysis_directory.process_updated_files.assert_called_once_with(["/ROOT/a.py"])
+
+        # Past the deadline, the timeout is not positive. Pending updates are
+        # processed before exiting.
+        analysis_directory.process_updated_files.reset_mock()
+        update(4.0, ("a.py", False, True))
+        with patch.object(project_files_monitor.time, "monotonic", return_value=5.0):
+            self.assertLess(monitor._receive_timeout(), 0.0)
+        monitor.cleanup()
+        analysis_directory.process_updated_files.assert_called_once_with(["/ROOT/a.py"])
+
     @patch.object(SocketConnection, "connect")
     # pyre-fixme[56]: Argument `tools.pyre.client.json_rpc` to decorator factory
     #  `unittest.mock.patch.object` could not be resolved in a global scope.
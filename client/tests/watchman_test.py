@@ -5,10 +5,11 @@
 
 import os
 import signal
+import tempfile
 import unittest
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Generator, Optional
+from typing import Any, Dict, Generator, List, Optional
 from unittest.mock import MagicMock, patch
 
 from .. import watchman
@@ -70,6 +71,60 @@ class SubscriberTest(unittest.TestCase):
             os.path.join(".pyre", "test", "foo_subscriber.lock")
         )
 
+    def test_receive_timeout(self) -> None:
+        connection = MagicMock()
+        timeouts: List[Optional[float]] = [-0.1, 0.0, 0.5, 0.5]
+        received: List[Optional[Dict[str, Any]]] = [None, {"files": []}]
+
+        class TimeoutSubscriber(Subscriber):
+            def __init__(self, base_path: str) -> None:
+                super().__init__(base_path, Configuration("foo", Path("bar")))
+                self.timeouts_handled = 0
+
+            @staticmethod
+            def is_alive(configuration: Configuration) -> bool:
+                return True
+
+            @property
+            def _name(self) -> str:
+                return "timeout_subscriber"
+
+            @property
+            def _subscriptions(self) -> List[watchman.Subscription]:
+                return []
+
+            @property
+            def _watchman_client(self) -> MagicMock:
+                return MagicMock(recvConn=connection)
+
+            def _receive_timeout(self) -> Optional[float]:
+                return timeouts.pop(0)
+
+            def _handle_timeout(self) -> None:
+                self.timeouts_handled += 1
+
+            def _handle_response(self, response: Dict[str, Any]) -> None:
+                self._alive = False
+
+        handlers = list(watchman.LOG.handlers)
+        with tempfile.TemporaryDirectory() as root, patch.object(
+            TimeoutSubscriber, "_receive_with_timeout", side_effect=received
+        ) as receive_with_timeout:
+            subscriber = TimeoutSubscriber(os.path.join(root, "subscriber"))
+            try:
+                subscriber._run()
+            finally:
+                for handler in list(watchman.LOG.handlers):
+                    if handler not in handlers:
+                        watchman.LOG.removeHandler(handler)
+                        handler.close()
+
+        # Timeouts that are not positive don't wait for messages.
+        self.assertEqual(subscriber.timeouts_handled, 3)
+        self.assertEqual(receive_with_timeout.call_count, 2)
+        receive_with_timeout.assert_called_with(connection, 0.5)
+        connection.receive.assert_not_called()
+
     # pyre-fixme[56]: Argument `os` to decorator factory
     #  `unittest.mock.patch.object` could not be resolved in a global scope.
     @patch.object(os, "kill")
@@ -13,7 +13,7 @@ import sys
 import time
 from abc import abstractstaticmethod
 from pathlib import Path
-from typing import Any, Dict, List, NamedTuple
+from typing import Any, Dict, List, NamedTuple, Optional
 
 from .configuration import Configuration
 from .filesystem import acquire_lock, remove_if_exists
@@ -69,6 +69,20 @@ class Subscriber(object):
         """
         raise NotImplementedError
 
+    def _receive_timeout(self) -> Optional[float]:
+        """
+        Seconds to wait for the next message before invoking `_handle_timeout`,
+        or None to wait indefinitely. `_handle_timeout` is invoked right away
+        when the timeout is not positive.
+        """
+        return None
+
+    def _handle_timeout(self) -> None:
+        """
+        Callback invoked when no message was received within `_receive_timeout`
+        """
+        pass
+
     @staticmethod
     @abstractstaticmethod
     def is_alive(configuration: Configuration) -> bool:
@@ -99,6 +113,19 @@ class Subscriber(object):
             "subscribe", subscription.root, subscription.name, subscription.subscription
         )
 
+    def _receive_with_timeout(
+        self, connection: Any, timeout: float
+    ) -> Optional[Dict[str, Any]]:
+        import pywatchman  # noqa
+
+        self._watchman_client.setTimeout(timeout)
+        try:
+            return connection.receive()
+        except pywatchman.SocketTimeout:
+            return None
+        finally:
+            self._watchman_client.setTimeout(None)
+
     def _run(self) -> None:
         try:
             os.makedirs(self._base_path)
@@ -145,8 +172,20 @@ class Subscriber(object):
                     sys.exit(1)
 
                 while self._alive:
-                    # This call is blocking, which prevents this loop from burning CPU.
-                    response = connection.receive()
+                    timeout = self._receive_timeout()
+                    if timeout is None:
+                        # This call is blocking, which prevents this loop from
+                        # burning CPU.
+                        response = connection.receive()
+                    elif timeout <= 0:
+                        # A zero timeout would make the socket non-blocking.
+                        self._handle_timeout()
+                        continue
+                    else:
+                        response = self._receive_with_timeout(connection, timeout)
+                        if response is None:
+                            self._handle_timeout()
+                            continue
                     if response.get("is_fresh_instance", False):
                         if not self._ready:
                             root = response.get("root", "<no-root-found>")
@@ -0,0 +1,145 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Saving parts of a trace graph while the rest is still being generated
+"""
+
+import logging
+import threading
+from queue import Queue
+from typing import Any, List, Optional
+
+from .bulk_saver import BulkSaver
+from .db import DB, DBType
+from .merge_cache import MergeCache
+from .models import PrimaryKeyGenerator, Run, SharedText, TraceFrame
+from .trace_graph import TraceGraph
+
+
+log: logging.Logger = logging.getLogger("sapp")
+
+
+class BackgroundWriter:
+    """Saves the shared texts and trace frames of a TraceGraph while it is
+    being generated, so that writing to the database overlaps with generating
+    the rest of the graph.
+
+    Shared texts and trace frames don't change once they are added to the
+    graph, so each `flush` saves the ones added since the previous flush, as
+    recorded by the graph. Assocs are left to the DatabaseSaver, because which
+    ones are saved depends on the complete graph. Saved items have resolved ids,
+    which is how `discard_saved` tells them apart.
+
+    Nothing else may use the database between `start` and `finish`. In memory
+    databases can't be shared between threads, so with those items are saved
+    synchronously by `flush`.
+    """
+
+    SAVED_CLASSES = [SharedText, TraceFrame]
+
+    def __init__(
+        self,
+        database: DB,
+        primary_key_generator: Optional[PrimaryKeyGenerator] = None,
+        max_pending: int = 4,
+        merge_cache: Optional[MergeCache] = None,
+    ) -> None:
+        self.database = database
+        self.primary_key_generator: PrimaryKeyGenerator = (
+            primary_key_generator or PrimaryKeyGenerator()
+        )
+        self.merge_cache = merge_cache
+        self.save_items = True
+        self._threaded: bool = database.dbtype != DBType.MEMORY
+        if database.dbtype == DBType.SQLITE:
+            # SQLite connections can't be used from other threads than the one
+            # they were created in, so the writer needs its own engine.
+            self._writer_database: DB = DB(
+                database.dbtype, database.dbname, debug=database.debug
+            )
+        else:
+            self._writer_database = database
+        self._queue: "Queue[Optional[List[Any]]]" = Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def start(self, run: Run, graph: TraceGraph, save_items: bool = True) -> None:
+        """Reserves the id of the run up front, so trace frames referencing it
+        can be saved before the run is. Nothing is saved early unless
+        `save_items`, e.g. when the graph is going to be trimmed, since the
+        items may then be dropped."""
+        with self.database.make_session() as session:
+            pk_gen = self.primary_key_generator.reserve(session, [Run])
+        run.id.resolve(id=pk_gen.get(Run), is_new=True)
+
+        self.save_items = save_items
+        if not save_items:
+            return
+        graph.track_new_items()
+        if self._threaded:
+            self._thread = threading.Thread(
+                target=self._write, name="sapp-background-writer", daemon=True
+            )
+            self._thread.start()
+
+    def flush(self, graph: TraceGraph) -> None:
+        """Queues the items added to the graph since the last flush for saving.
+        Blocks if too many are pending already."""
+        self._raise_error()
+        if not self.save_items:
+            return
+
+        # Trace frames are taken first, so that the shared texts they reference
+        # are included in the shared texts taken below.
+        trace_frames = graph.take_new_trace_frames()
+        shared_texts = graph.take_new_shared_texts()
+
+        self._put(shared_texts)
+        self._put(trace_frames)
+
+    def finish(self) -> None:
+        """Waits for all queued items to be saved."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
+
+    def discard_saved(self, bulk_saver: BulkSaver) -> None:
+        """Drops the items saved by this writer from the bulk saver."""
+        for cls in self.SAVED_CLASSES:
+            bulk_saver.discard_saved(cls)
+
+    def _put(self, items: List[Any]) -> None:
+        if not items:
+            return
+        if self._threaded:
+            self._queue.put(items)
+        else:
+            self._save(items)
+
+    def _write(self) -> None:
+        while True:
+            items = self._queue.get()
+            if items is None:
+                return
+            if self._error is not None:
+                # Keep draining the queue so flush doesn't block.
+                continue
+            try:
+                self._save(items)
+            except BaseException as error:
+                self._error = error
+
+    def _save(self, items: List[Any]) -> None:
+        log.info("Saving %d %s in the background", len(items), items[0].model.__name__)
+        bulk_saver = BulkSaver(self.primary_key_generator, merge_cache=self.merge_cache)
+        bulk_saver.add_all(items)
+        bulk_saver.save_all(self._writer_database)
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
@@ -0,0 +1,391 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Benchmark of the ingest pipeline on synthetic Pysa output
+
+The analysis output is generated with a given number of issues and models,
+trace depth, fan-out and shards, and ingested into a fresh SQLite database.
+The report has the wall time, peak RSS and rows per second of each step.
+
+The output is streamed to disk and ingested in a separate process, so that the
+peak RSS of the steps doesn't include the generator's. Where the kernel allows
+resetting the peak RSS of a process (Linux), it is reset before each step.
+"""
+
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import click
+
+from .analysis_output import AnalysisOutput
+from .db import DB, DBType
+from .models import PrimaryKeyGenerator
+from .pipeline import Pipeline, PipelineStep, Summary
+from .pipeline.create_database import CreateDatabase
+from .pipeline.database_saver import DatabaseSaver
+from .pipeline.model_generator import ModelGenerator
+from .pipeline.pysa_taint_parser import Parser
+from .pipeline.trim_trace_graph import TrimTraceGraph
+from .pipeline.warning_code_filter import WarningCodeFilter
+from .trace_graph import TraceGraph
+
+
+class BenchmarkConfig(NamedTuple):
+    issues: int = 1000
+    models: int = 10000
+    trace_depth: int = 5
+    fan_out: int = 2
+    shards: int = 1
+    codes: int = 10
+    files: int = 100
+    # Only these codes are ingested, all of them if None.
+    codes_to_keep: Optional[Set[int]] = None
+    # Trim the trace graph to these files, don't trim if None.
+    affected_files: Optional[List[str]] = None
+    seed: int = 0
+
+
+class StepReport(NamedTuple):
+    name: str
+    wall_time: float
+    peak_rss_kb: int
+    rows: int
+    rows_per_second: float
+
+
+def _position(filename: str, line: int) -> Dict[str, Any]:
+    return {"filename": filename, "line": line, "start": 1, "end": 2}
+
+
+def _call(filename: str, line: int, callee: str) -> Dict[str, Any]:
+    return {
+        "position": _position(filename, line),
+        "resolves_to": [callee],
+        "port": "formal(x)",
+        "length": 1,
+    }
+
+
+class _SyntheticOutput:
+    """Generates the entries of the analysis output. Sink models are laid out in
+    trace_depth levels, and each issue and model calls fan_out models of the
+    next level, so that every trace is trace_depth frames long."""
+
+    def __init__(self, config: BenchmarkConfig) -> None:
+        self.config = config
+        self.random = random.Random(config.seed)
+        depth = max(config.trace_depth, 1)
+        per_level = max(config.models // depth, 1)
+        self.levels: List[List[str]] = [
+            [f"module{j % config.files}.sink_{level}_{j}" for j in range(per_level)]
+            for level in range(depth)
+        ]
+
+    def _filename(self, callable: str) -> str:
+        return callable.split(".")[0] + ".py"
+
+    def _calls(self, filename: str, level: int) -> List[Dict[str, Any]]:
+        callees = self.random.sample(
+            self.levels[level], min(self.config.fan_out, len(self.levels[level]))
+        )
+        return [
+            {
+                "call": _call(filename, line, callee),
+                "leaves": [{"kind": "RCE", "name": "eval"}],
+            }
+            for line, callee in enumerate(callees, start=1)
+        ]
+
+    def model(self, level: int, callable: str) -> Dict[str, Any]:
+        filename = self._filename(callable)
+        if level + 1 < len(self.levels):
+            taint = self._calls(filename, level + 1)
+        else:
+            taint = [
+                {
+                    "root": _position(filename, 1),
+                    "leaves": [{"kind": "RCE", "name": "eval"}],
+                }
+            ]
+        return {
+            "kind": "model",
+            "data": {
+                "callable": callable,
+                "sources": [],
+                "sinks": [{"port": "formal(x)", "taint": taint}],
+            },
+        }
+
+    def issue(self, index: int) -> Dict[str, Any]:
+        callable = f"module{index % self.config.files}.issue_{index}"
+        filename = self._filename(callable)
+        return {
+            "kind": "issue",
+            "data": {
+                "callable": callable,
+                "callable_line": 1,
+                "code": 5000 + index % self.config.codes,
+                "line": 2,
+                "start": 3,
+                "end": 4,
+                "filename": filename,
+                "message": "[UserControlled] to [RCE]",
+                "traces": [
+                    {
+                        "name": "forward",
+                        "roots": [
+                            {
+                                "root": _position(filename, 2),
+                                "leaves": [
+                                    {"kind": "UserControlled", "name": "source"}
+                                ],
+                            }
+                        ],
+                    },
+                    {"name": "backward", "roots": self._calls(filename, 0)},
+                ],
+                "features": [{"always-via": "benchmark"}],
+            },
+        }
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.config.issues):
+            yield self.issue(index)
+        for level, callables in enumerate(self.levels):
+            for callable in callables:
+                yield self.model(level, callable)
+
+
+def generate_output(config: BenchmarkConfig, directory: str) -> AnalysisOutput:
+    """Writes synthetic Pysa output (jsonlines, file version 2) to the directory,
+    in config.shards shards. Entries are written as they are generated."""
+    header = json.dumps({"file_version": 2, "config": {"repo": directory}})
+    if config.shards == 1:
+        file_names = [os.path.join(directory, "taint-output.json")]
+        spec = file_names[0]
+    else:
+        file_names = [
+            os.path.join(
+                directory, f"taint-output@{shard:05d}-of-{config.shards:05d}.json"
+            )
+            for shard in range(config.shards)
+        ]
+        spec = os.path.join(directory, f"taint-output@{config.shards}.json")
+    files = [open(file_name, "w") for file_name in file_names]
+    try:
+        for f in files:
+            f.write(header + "\n")
+        for index, entry in enumerate(_SyntheticOutput(config).entries()):
+            files[index % config.shards].write(json.dumps(entry) + "\n")
+    finally:
+        for f in files:
+            f.close()
+    return AnalysisOutput.from_file(spec)
+
+
+def _reset_peak_rss() -> bool:
+    """Resets the peak RSS of the process, which Linux allows since 4.0."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_kb() -> int:
+    """The peak RSS of the process since the last reset, if any."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _count_rows(value: Any) -> Optional[int]:
+    """The number of issues and conditions, or issue instances and trace frames,
+    in the output of a step."""
+    if isinstance(value, TraceGraph):
+        return len(list(value.get_issue_instances())) + len(
+            list(value.get_trace_frames())
+        )
+    if isinstance(value, dict) and "issues" in value:
+        rows = len(value["issues"]) if isinstance(value["issues"], list) else 0
+        for conditions in [value["preconditions"], value["postconditions"]]:
+            rows += sum(len(entries) for entries in conditions.values())
+        return rows
+    return None
+
+
+class MeasuredStep(PipelineStep[Any, Any]):
+    """Runs a step and records how long it took, the peak RSS of the process
+    during it (or up to its end, where the peak can't be reset), and the number
+    of rows it produced (or consumed, when its output can't be counted)."""
+
+    def __init__(self, step: PipelineStep[Any, Any], reports: List[StepReport]):
+        super().__init__()
+        self.step = step
+        self.reports = reports
+
+    def run(self, input: Any, summary: Summary) -> Tuple[Any, Summary]:
+        _reset_peak_rss()
+        start = time.perf_counter()
+        output, summary = self.step.run(input, summary)
+        wall_time = time.perf_counter() - start
+        rows = _count_rows(output)
+        if rows is None:
+            rows = _count_rows(input) or 0
+        self.reports.append(
+            StepReport(
+                name=self.step.__class__.__name__,
+                wall_time=wall_time,
+                peak_rss_kb=_peak_rss_kb(),
+                rows=rows,
+                rows_per_second=rows / wall_time if wall_time > 0 else 0.0,
+            )
+        )
+        return output, summary
+
+
+def _ingest(config: BenchmarkConfig, directory: str, spec: str) -> Dict[str, Any]:
+    """Ingests the output into a database in the directory, and returns the
+    reports of the steps. Runs in its own process."""
+    database = DB(DBType.SQLITE, os.path.join(directory, "sapp.db"))
+    codes_to_keep = config.codes_to_keep
+    if codes_to_keep is None:
+        codes_to_keep = {5000 + code for code in range(config.codes)}
+    summary: Summary = {
+        "run_kind": "benchmark",
+        "repository": directory,
+        "branch": "master",
+        "commit_hash": None,
+        "job_id": None,
+        "old_linemap_file": None,
+        "store_unused_models": False,
+        "codes_to_keep": config.codes_to_keep,
+        "affected_files": config.affected_files,
+    }
+    reports: List[StepReport] = []
+    steps: List[PipelineStep[Any, Any]] = [
+        Parser(),
+        WarningCodeFilter(codes_to_keep),
+        CreateDatabase(database),
+        ModelGenerator(),
+        TrimTraceGraph(),
+        DatabaseSaver(database, primary_key_generator=PrimaryKeyGenerator()),
+    ]
+    per_step_peak_rss = _reset_peak_rss()
+    Pipeline([MeasuredStep(step, reports) for step in steps]).run(
+        (AnalysisOutput.from_file(spec), None), summary
+    )
+    return {
+        "steps": [report._asdict() for report in reports],
+        "per_step_peak_rss": per_step_peak_rss,
+    }
+
+
+def run_benchmark(config: BenchmarkConfig, directory: str) -> Dict[str, Any]:
+    """Generates the output and ingests it, in the given directory, and returns
+    the report."""
+    start = time.perf_counter()
+    input = generate_output(config, directory)
+    generation_time = time.perf_counter() - start
+    generation_peak_rss_kb = _peak_rss_kb()
+
+    # A fresh interpreter, rather than a fork, doesn't start out with the memory
+    # of this process.
+    with multiprocessing.get_context("spawn").Pool(processes=1) as pool:
+        ingest = pool.apply(_ingest, (config, directory, input.filename_spec))
+
+    config_dict = config._asdict()
+    if config.codes_to_keep is not None:
+        config_dict["codes_to_keep"] = sorted(config.codes_to_keep)
+    steps = ingest["steps"]
+    return {
+        "config": config_dict,
+        "generation_time": generation_time,
+        "generation_peak_rss_kb": generation_peak_rss_kb,
+        "input_bytes": sum(os.path.getsize(name) for name in input.file_names()),
+        "steps": steps,
+        "per_step_peak_rss": ingest["per_step_peak_rss"],
+        "total_wall_time": sum(step["wall_time"] for step in steps),
+        "peak_rss_kb": max((step["peak_rss_kb"] for step in steps), default=0),
+    }
+
+
+@click.command()
+@click.option("--issues", type=int, default=BenchmarkConfig.issues)
+@click.option("--models", type=int, default=BenchmarkConfig.models)
+@click.option("--trace-depth", type=int, default=BenchmarkConfig.trace_depth)
+@click.option("--fan-out", type=int, default=BenchmarkConfig.fan_out)
+@click.option("--shards", type=int, default=BenchmarkConfig.shards)
+@click.option("--codes", type=int, default=BenchmarkConfig.codes)
+@click.option("--files", type=int, default=BenchmarkConfig.files)
+@click.option(
+    "--code",
+    "codes_to_keep",
+    type=int,
+    multiple=True,
+    help="only ingest issues with this code (can be repeated)",
+)
+@click.option(
+    "--affected-file",
+    "affected_files",
+    multiple=True,
+    help="trim the trace graph to this file prefix (can be repeated)",
+)
+@click.option("--seed", type=int, default=BenchmarkConfig.seed)
+@click.option(
+    "--report",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="file to write the json report to (default: stdout)",
+)
+def benchmark(
+    issues: int,
+    models: int,
+    trace_depth: int,
+    fan_out: int,
+    shards: int,
+    codes: int,
+    files: int,
+    codes_to_keep: Tuple[int, ...],
+    affected_files: Tuple[str, ...],
+    seed: int,
+    report: Optional[str],
+) -> None:
+    """Benchmark the ingest pipeline on synthetic analysis output"""
+    config = BenchmarkConfig(
+        issues=issues,
+        models=models,
+        trace_depth=trace_depth,
+        fan_out=fan_out,
+        shards=shards,
+        codes=codes,
+        files=files,
+        codes_to_keep=set(codes_to_keep) if codes_to_keep else None,
+        affected_files=list(affected_files) if affected_files else None,
+        seed=seed,
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        result = run_benchmark(config, directory)
+    output = json.dumps(result, indent=2, sort_keys=True)
+    if report is None:
+        print(output)
+    else:
+        with open(report, "w") as f:
+            f.write(output + "\n")
@@ -0,0 +1,129 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Loaders that write the rows prepared by BulkSaver to the database
+"""
+
+from collections import defaultdict
+from typing import Any, DefaultDict, Dict, Iterable, List, Tuple, Type
+
+from sqlalchemy import inspect
+
+from .db import DB, DBType
+from .iterutil import split_every
+
+Row = Dict[str, Any]
+
+
+class BulkLoader:
+    """Inserts the rows of one model class, as prepared by
+    PrepareMixin.prepare, into the database.
+
+    This is the dialect independent fallback, which inserts through the ORM
+    with a session per batch. Subclasses implement faster paths for specific
+    databases.
+    """
+
+    # Batches hold about this many values, so that batches of narrow tables
+    # (like assocs) are large, and batches of wide tables don't use too much
+    # memory.
+    BATCH_VALUES: int = 300000
+    MAX_BATCH_SIZE: int = 30000
+
+    def batch_size(self, width: int) -> int:
+        return max(1, min(self.MAX_BATCH_SIZE, self.BATCH_VALUES // max(width, 1)))
+
+    # pyre-fixme[2]: Parameter must be annotated.
+    def load(self, database: DB, cls, rows: List[Row]) -> None:
+        # We group rows by keys because bulk insert uses executemany, but it can
+        # only group together sequential items with the same keys. If we are
+        # scattered then it does far more executemany calls, and it kills
+        # performance.
+        for keys, group in self._group_by_keys(rows):
+            # bulk_insert_mappings should only be used for new objects.
+            # To update an existing object, just modify its attribute(s)
+            # and call session.commit()
+            for batch in split_every(self.batch_size(len(keys)), group):
+                with database.make_session() as session:
+                    session.bulk_insert_mappings(cls, batch, render_nulls=True)
+                    session.commit()
+
+    @staticmethod
+    def _group_by_keys(rows: List[Row]) -> Iterable[Tuple[Tuple[str, ...], List[Row]]]:
+        """Groups the rows by their keys, in the order of the rows, and empties
+        the list of rows."""
+        groups: DefaultDict[Tuple[str, ...], List[Row]] = defaultdict(list)
+        for row in rows:
+            groups[tuple(row.keys())].append(row)
+        rows.clear()
+        return groups.items()
+
+    # pyre-fixme[2]: Parameter must be annotated.
+    def _column_rows(self, cls, rows: List[Row]) -> Iterable[List[Row]]:
+        """Converts the rows, which are keyed on attribute names, to rows keyed
+        on column keys that can be passed to Core inserts. Yields a list of rows
+        with the same columns per batch.
+        """
+        columns = {prop.key: prop.columns[0].key for prop in inspect(cls).column_attrs}
+        for keys, group in self._group_by_keys(rows):
+            row_columns = [(key, columns[key]) for key in keys if key in columns]
+            for batch in split_every(self.batch_size(len(row_columns)), group):
+                yield [
+                    {column: row[key] for key, column in row_columns} for row in batch
+                ]
+
+
+class SQLiteBulkLoader(BulkLoader):
+    """Inserts all rows in a single transaction with executemany on one
+    prepared statement.
+
+    File databases are switched to WAL journaling, which persists, and
+    synchronous=NORMAL, which is safe in WAL mode and avoids syncing on every
+    commit.
+    """
+
+    BATCH_VALUES: int = 1000000
+    MAX_BATCH_SIZE: int = 100000
+
+    # pyre-fixme[2]: Parameter must be annotated.
+    def load(self, database: DB, cls, rows: List[Row]) -> None:
+        table = cls.__table__
+        with database.engine.connect() as connection:
+            # These can't be changed inside of a transaction.
+            if database.dbtype == DBType.SQLITE:
+                connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection.begin():
+                for batch in self._column_rows(cls, rows):
+                    connection.execute(table.insert(), batch)
+
+
+class MultiRowInsertBulkLoader(BulkLoader):
+    """Inserts rows with multi-row INSERT ... VALUES statements, for MySQL-like
+    databases. The number of rows per statement is limited by the number of
+    placeholders a statement can have.
+    """
+
+    BATCH_VALUES: int = 65535
+    MAX_BATCH_SIZE: int = 10000
+
+    # pyre-fixme[2]: Parameter must be annotated.
+    def load(self, database: DB, cls, rows: List[Row]) -> None:
+        table = cls.__table__
+        with database.engine.connect() as connection:
+            with connection.begin():
+                for batch in self._column_rows(cls, rows):
+                    connection.execute(table.insert().values(batch))
+
+
+LOADERS: Dict[DBType, Type[BulkLoader]] = {
+    DBType.SQLITE: SQLiteBulkLoader,
+    DBType.MEMORY: SQLiteBulkLoader,
+    DBType.XDB: MultiRowInsertBulkLoader,
+}
+
+
+def loader_for(database: DB) -> BulkLoader:
+    return LOADERS.get(database.dbtype, BulkLoader)()
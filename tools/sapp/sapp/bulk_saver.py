@@ -9,9 +9,11 @@
 import logging
 from typing import Any, Dict, Optional
 
+from .bulk_loader import BulkLoader, loader_for
 from .db import DB
+from .db_support import MERGE_CACHE
 from .decorators import log_time
-from .iterutil import split_every
+from .merge_cache import MergeCache
 from .models import (
     Issue,
     IssueInstance,
@@ -19,6 +21,7 @@ from .models import (
     IssueInstanceSharedTextAssoc,
     IssueInstanceTraceFrameAssoc,
     PrimaryKeyGenerator,
+    RunCallableHash,
     SharedText,
     TraceFrame,
     TraceFrameAnnotation,
@@ -46,14 +49,21 @@ class BulkSaver:
         TraceFrameAnnotation,
         TraceFrameLeafAssoc,
         TraceFrameAnnotationTraceFrameAssoc,
+        RunCallableHash,
     ]
 
-    BATCH_SIZE = 30000
-
     # pyre-fixme[3]: Return type must be annotated.
-    def __init__(self, primary_key_generator: Optional[PrimaryKeyGenerator] = None):
+    def __init__(
+        self,
+        primary_key_generator: Optional[PrimaryKeyGenerator] = None,
+        loader: Optional[BulkLoader] = None,
+        merge_cache: Optional[MergeCache] = None,
+    ):
         # pyre-fixme[4]: Attribute must be annotated.
         self.primary_key_generator = primary_key_generator or PrimaryKeyGenerator()
+        # Picked based on the database being saved to, if not given.
+        self.loader = loader
+        self.merge_cache = merge_cache
         self.saving: Dict[str, Any] = {}
         for cls in self.SAVING_CLASSES_ORDER:
             self.saving[cls.__name__] = []
@@ -80,6 +90,13 @@ class BulkSaver:
     def get_items_to_add(self, cls):
         return self.saving[cls.__name__]
 
+    # pyre-fixme[2]: Parameter must be annotated.
+    def discard_saved(self, cls) -> None:
+        """Drops the items of cls that were saved already, i.e. have an id."""
+        self.saving[cls.__name__] = [
+            item for item in self.saving[cls.__name__] if item.id.resolved() is None
+        ]
+
     # pyre-fixme[3]: Return type must be annotated.
     # pyre-fixme[2]: Parameter must be annotated.
     # pyre-fixme[2]: Parameter must be annotated.
@@ -99,30 +116,28 @@ class BulkSaver:
                 session, saving_classes, item_counts
             )
 
+        loader = self.loader or loader_for(database)
         for cls in saving_classes:
             log.info("Saving %s...", cls.__name__)
-            self._save(database, cls, pk_gen)
+            self._save(database, loader, cls, pk_gen)
 
     @log_time
     # pyre-fixme[3]: Return type must be annotated.
     # pyre-fixme[2]: Parameter must be annotated.
-    def _save(self, database: DB, cls, pk_gen: PrimaryKeyGenerator):
-        # We sort keys because bulk insert uses executemany, but it can only
-        # group together sequential items with the same keys. If we are scattered
-        # then it does far more executemany calls, and it kills performance.
+    def _save(self, database: DB, loader: BulkLoader, cls, pk_gen: PrimaryKeyGenerator):
         with database.make_session() as session:
-            items = sorted(
-                cls.prepare(session, pk_gen, consume(self.saving[cls.__name__])),
-                key=lambda k: list(k.keys()),
-            )
-
-        # bulk_insert_mappings should only be used for new objects.
-        # To update an existing object, just modify its attribute(s)
-        # and call session.commit()
-        for group in split_every(self.BATCH_SIZE, items):
-            with database.make_session() as session:
-                session.bulk_insert_mappings(cls, group, render_nulls=True)
-                session.commit()
+            if self.merge_cache is not None:
+                session.info[MERGE_CACHE] = self.merge_cache
+            try:
+                items = list(
+                    cls.prepare(session, pk_gen, consume(self.saving[cls.__name__]))
+                )
+            finally:
+                session.info.pop(MERGE_CACHE, None)
+
+        loader.load(database, cls, items)
+        if self.merge_cache is not None:
+            self.merge_cache.commit()
 
     # pyre-fixme[3]: Return type must be annotated.
     # pyre-fixme[2]: Parameter must be annotated.
@@ -8,6 +8,7 @@ import logging
 
 import click
 
+from .benchmark import benchmark
 from .cli_lib import commands, common_options
 from .context import Context
 from .db import DB, DBType
@@ -42,6 +43,7 @@ def cli(
 
 for command in commands:
     cli.add_command(command)
+cli.add_command(benchmark)
 cli.add_command(lint)
 
 if __name__ == "__main__":
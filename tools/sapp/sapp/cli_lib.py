@@ -6,7 +6,7 @@
 import logging
 import os
 from functools import wraps
-from typing import Optional
+from typing import Optional, Tuple
 
 import click
 import click_log
@@ -15,15 +15,19 @@ from click import Parameter, Path, argument, option
 from traitlets.config import Config
 
 from .analysis_output import AnalysisOutput
+from .background_writer import BackgroundWriter
 from .context import Context, pass_context
 from .db import DB
 from .extensions import prompt_extension
 from .filesystem import find_root
+from .merge_cache import MergeCache
 from .models import PrimaryKeyGenerator
 from .pipeline import Pipeline
 from .pipeline.create_database import CreateDatabase
 from .pipeline.database_saver import DatabaseSaver
+from .pipeline.incremental import FindParentRun
 from .pipeline.model_generator import ModelGenerator
+from .pipeline.parallel_parser import ParallelParser
 from .pipeline.trim_trace_graph import TrimTraceGraph
 from .ui.interactive import Interactive
 from .ui.server import start_server
@@ -155,6 +159,57 @@ def explore(ctx: Context, ipython_args):
     is_flag=True,
     help="store pre/post conditions unrelated to an issue",
 )
+@option(
+    "--streaming",
+    is_flag=True,
+    help=(
+        "generate issues as they are parsed instead of loading them all first "
+        "(implies --offset-index); this bounds the memory used for parsing, "
+        "not the trace graph"
+    ),
+)
+@option(
+    "--offset-index",
+    "use_offset_index",
+    is_flag=True,
+    help="read pre/post conditions on demand through an index of the input",
+)
+@option(
+    "--compact-trace-graph",
+    is_flag=True,
+    help="keep the trace graph in compact indices to reduce memory usage",
+)
+@option(
+    "--pipelined-writes",
+    is_flag=True,
+    help="save shared texts and trace frames while the rest is being generated",
+)
+@option(
+    "--incremental",
+    is_flag=True,
+    help=(
+        "hash callables, and copy the ones unchanged since the previous run of "
+        "the same kind instead of generating them again"
+    ),
+)
+@option(
+    "--merge-cache",
+    type=Path(dir_okay=False),
+    help="local file caching the ids of shared texts and issues across runs",
+)
+@option(
+    "--parse-workers",
+    type=int,
+    default=None,
+    help="number of processes to parse the input with (default: parse serially)",
+)
+@option(
+    "--code",
+    "codes",
+    type=int,
+    multiple=True,
+    help="only ingest issues with this code (can be repeated)",
+)
 @argument("input_file", type=Path(exists=True))
 # pyre-fixme[3]: Return type must be annotated.
 def analyze(
@@ -178,6 +233,18 @@ def analyze(
     # pyre-fixme[2]: Parameter must be annotated.
     store_unused_models,
     # pyre-fixme[2]: Parameter must be annotated.
+    streaming,
+    # pyre-fixme[2]: Parameter must be annotated.
+    use_offset_index,
+    # pyre-fixme[2]: Parameter must be annotated.
+    compact_trace_graph,
+    # pyre-fixme[2]: Parameter must be annotated.
+    pipelined_writes,
+    incremental: bool,
+    merge_cache: Optional[str],
+    parse_workers: Optional[int],
+    codes: Tuple[int, ...],
+    # pyre-fixme[2]: Parameter must be annotated.
     input_file,
 ):
     # Store all options in the right places
@@ -188,6 +255,12 @@ def analyze(
         "commit_hash": commit_hash,
         "old_linemap_file": linemap,
         "store_unused_models": store_unused_models,
+        "streaming": streaming,
+        # Streaming issues doesn't bound memory if every condition is loaded.
+        "use_offset_index": use_offset_index or streaming,
+        "compact_trace_graph": compact_trace_graph,
+        "incremental": incremental,
+        "codes_to_keep": set(codes) if codes else None,
     }
 
     if job_id is None and differential_id is not None:
@@ -201,11 +274,26 @@ def analyze(
     elif previous_input:
         previous_input = AnalysisOutput.from_file(previous_input)
 
+    if merge_cache:
+        summary_blob["merge_cache"] = MergeCache(merge_cache)
+
+    if pipelined_writes:
+        summary_blob["background_writer"] = BackgroundWriter(
+            ctx.database,
+            PrimaryKeyGenerator(),
+            merge_cache=summary_blob.get("merge_cache"),
+        )
+
     # Construct pipeline
     input_files = (AnalysisOutput.from_file(input_file), previous_input)
+    if parse_workers:
+        parser = ParallelParser(ctx.parser_class, processes=parse_workers)
+    else:
+        parser = ctx.parser_class()
     pipeline_steps = [
-        ctx.parser_class(),
+        parser,
         CreateDatabase(ctx.database),
+        FindParentRun(ctx.database),
         ModelGenerator(),
         TrimTraceGraph(),
         # pyre-fixme[6]: Expected `bool` for 2nd param but got `PrimaryKeyGenerator`.
@@ -232,12 +320,22 @@ def analyze(
 @option(
     "--source-directory", default=os.getcwd(), help="Directory to look for source code"
 )
+@option(
+    "--workers",
+    type=int,
+    default=1,
+    help="Number of requests to serve concurrently, each on its own connection",
+)
 @pass_context
 # pyre-fixme[3]: Return type must be annotated.
 def server(
-    ctx: Context, debug: bool, static_resources: Optional[str], source_directory: str
+    ctx: Context,
+    debug: bool,
+    static_resources: Optional[str],
+    source_directory: str,
+    workers: int,
 ):
-    start_server(ctx.database, debug, static_resources, source_directory)
+    start_server(ctx.database, debug, static_resources, source_directory, workers)
 
 
 # pyre-fixme[5]: Global expression must be annotated.
@@ -0,0 +1,283 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+# pyre-strict
+
+import sys
+from array import array
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .models import (
+    DBID,
+    IssueInstance,
+    SharedText,
+    TraceFrame,
+    TraceFrameAnnotation,
+    TraceKind,
+)
+from .trace_graph import TraceGraph
+
+
+# A single id is stored as is, more ids in an array of signed 64 bit ints.
+_Ids = Union[int, "array[int]"]
+
+_EMPTY: FrozenSet[int] = frozenset()
+
+# Ports are packed into the low bits of the keys of FrameIndex.
+_PORT_BITS = 32
+
+
+class IntSetMap:
+    """A read-mostly replacement for DefaultDict[int, Set[int]].
+
+    Sets of ids are stored as arrays, and a single id (the common case) as a
+    plain int, which is a fraction of the size of a set. Reading a key returns a
+    frozenset, and reading a missing key returns an empty one without adding
+    it. Values are only added through `add`.
+    """
+
+    def __init__(self) -> None:
+        self._ids: Dict[int, _Ids] = {}
+
+    def add(self, key: int, value: int) -> None:
+        ids = self._ids.get(key)
+        if ids is None:
+            self._ids[key] = value
+        elif isinstance(ids, int):
+            if ids != value:
+                self._ids[key] = array("q", (ids, value))
+        else:
+            # Duplicates are dropped when read, scanning large arrays here
+            # would make adding quadratic.
+            ids.append(value)
+
+    def __getitem__(self, key: int) -> FrozenSet[int]:
+        ids = self._ids.get(key)
+        if ids is None:
+            return _EMPTY
+        if isinstance(ids, int):
+            return frozenset((ids,))
+        return frozenset(ids)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._ids
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def keys(self) -> Iterable[int]:
+        return self._ids.keys()
+
+    def items(self) -> Iterable[Tuple[int, FrozenSet[int]]]:
+        for key in self._ids:
+            yield key, self[key]
+
+
+class FrameIndex:
+    """A replacement for DefaultDict[Tuple[int, str], Set[int]] mapping
+    (callable id, port) to trace frame ids. Ports are interned to small ints
+    and packed together with the callable id into a single int key.
+    """
+
+    def __init__(self, ports: Dict[str, int]) -> None:
+        self._ports = ports
+        self._frames = IntSetMap()
+
+    def _key(self, key: Tuple[int, str]) -> int:
+        callable_id, port = key
+        return (callable_id << _PORT_BITS) | self._ports[port]
+
+    def add(self, key: Tuple[int, str], trace_frame_id: int) -> None:
+        port = key[1]
+        if port not in self._ports:
+            self._ports[port] = len(self._ports)
+        self._frames.add(self._key(key), trace_frame_id)
+
+    def __getitem__(self, key: Tuple[int, str]) -> FrozenSet[int]:
+        if key[1] not in self._ports:
+            return _EMPTY
+        return self._frames[self._key(key)]
+
+    def __contains__(self, key: Tuple[int, str]) -> bool:
+        return key[1] in self._ports and self._key(key) in self._frames
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+
+class LeafAssoc:
+    """A replacement for DefaultDict[int, Set[Tuple[int, int]]] mapping trace
+    frame ids to (leaf id, depth) pairs, which are stored flattened in one
+    array per trace frame.
+
+    The leaves of a trace frame are usually added one after the other, so the
+    pairs of the last trace frame that leaves were added to are also kept in a
+    set, to check for duplicates without scanning its array.
+    """
+
+    def __init__(self) -> None:
+        self._leaves: Dict[int, "array[int]"] = {}
+        self._last_trace_frame_id: Optional[int] = None
+        self._last_pairs: Set[Tuple[int, int]] = set()
+
+    def add(self, trace_frame_id: int, leaf_depth: Tuple[int, int]) -> None:
+        leaves = self._leaves.get(trace_frame_id)
+        if leaves is None:
+            leaves = self._leaves[trace_frame_id] = array("q")
+        if trace_frame_id != self._last_trace_frame_id:
+            self._last_trace_frame_id = trace_frame_id
+            self._last_pairs = set(self._pairs(leaves))
+        if leaf_depth not in self._last_pairs:
+            self._last_pairs.add(leaf_depth)
+            leaves.extend(leaf_depth)
+
+    @staticmethod
+    def _pairs(leaves: "array[int]") -> Iterator[Tuple[int, int]]:
+        return zip(leaves[::2], leaves[1::2])
+
+    def __getitem__(self, trace_frame_id: int) -> FrozenSet[Tuple[int, int]]:
+        leaves = self._leaves.get(trace_frame_id)
+        if leaves is None:
+            return frozenset()
+        return frozenset(self._pairs(leaves))
+
+    def __contains__(self, trace_frame_id: int) -> bool:
+        return trace_frame_id in self._leaves
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._leaves)
+
+    def __len__(self) -> int:
+        return len(self._leaves)
+
+    def items(self) -> Iterable[Tuple[int, FrozenSet[Tuple[int, int]]]]:
+        for trace_frame_id in self._leaves:
+            yield trace_frame_id, self[trace_frame_id]
+
+
+class CompactTraceGraph(TraceGraph):
+    """A TraceGraph with the same API that keeps its edges in compact, array
+    backed indices instead of nested dicts of sets. Ports of trace frames are
+    interned, so the copies held by each frame are shared.
+
+    Sets returned by the getters are frozen: the graph is only changed through
+    its add_* methods.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._ports: Dict[str, int] = {}
+        # pyre-fixme[8]: The indices only implement the parts of the
+        # DefaultDict interface that TraceGraph and TrimmedTraceGraph use.
+        self._trace_frames_map = {kind: FrameIndex(self._ports) for kind in TraceKind}
+        # pyre-fixme[8]
+        self._trace_frames_rev_map = {
+            kind: FrameIndex(self._ports) for kind in TraceKind
+        }
+        # pyre-fixme[8]
+        self._trace_frame_leaf_assoc = LeafAssoc()
+        # pyre-fixme[8]
+        self._trace_frame_issue_instance_assoc = IntSetMap()
+        # pyre-fixme[8]
+        self._issue_instance_trace_frame_assoc = IntSetMap()
+        # pyre-fixme[8]
+        self._trace_frame_annotation_trace_frame_assoc = IntSetMap()
+        # pyre-fixme[8]
+        self._trace_frame_trace_frame_annotation_assoc = IntSetMap()
+        # pyre-fixme[8]
+        self._issue_instance_shared_text_assoc = IntSetMap()
+        # pyre-fixme[8]
+        self._shared_text_issue_instance_assoc = IntSetMap()
+
+    def has_trace_frames_with_caller(
+        self, kind: TraceKind, caller_id: DBID, caller_port: str
+    ) -> bool:
+        return (caller_id.local_id, caller_port) in self._trace_frames_map[kind]
+
+    def add_trace_frame(self, trace_frame: TraceFrame) -> None:
+        # pyre-fixme[16]: `TraceFrame` records are namedtuples.
+        trace_frame = trace_frame._replace(
+            caller_port=sys.intern(trace_frame.caller_port),
+            callee_port=sys.intern(trace_frame.callee_port),
+        )
+        key = (trace_frame.caller_id.local_id, trace_frame.caller_port)
+        rev_key = (trace_frame.callee_id.local_id, trace_frame.callee_port)
+        # pyre-fixme[6]: Expected `TraceKind` for 1st param but got `str`.
+        self._trace_frames_map[trace_frame.kind].add(key, trace_frame.id.local_id)
+        # pyre-fixme[6]: Expected `TraceKind` for 1st param but got `str`.
+        self._trace_frames_rev_map[trace_frame.kind].add(
+            rev_key, trace_frame.id.local_id
+        )
+        self._trace_frames[trace_frame.id.local_id] = trace_frame
+        if self._new_trace_frame_ids is not None:
+            self._new_trace_frame_ids.append(trace_frame.id.local_id)
+
+    def get_trace_frames_from_caller(
+        self, kind: TraceKind, caller_id: DBID, caller_port: str
+    ) -> List[TraceFrame]:
+        return [
+            self._trace_frames[trace_frame_id]
+            for trace_frame_id in self._trace_frames_map[kind][
+                (caller_id.local_id, caller_port)
+            ]
+        ]
+
+    def add_trace_frame_leaf_assoc(
+        self, trace_frame: TraceFrame, leaf: SharedText, depth: int
+    ) -> None:
+        self.add_trace_frame_leaf_by_local_id_assoc(
+            trace_frame, leaf.id.local_id, depth
+        )
+
+    def add_trace_frame_leaf_by_local_id_assoc(
+        self, trace_frame: TraceFrame, leaf_id: int, depth: int
+    ) -> None:
+        # pyre-fixme[16]: `DefaultDict` has no attribute `add`.
+        self._trace_frame_leaf_assoc.add(trace_frame.id.local_id, (leaf_id, depth))
+
+    def add_issue_instance_trace_frame_assoc(
+        self, instance: IssueInstance, trace_frame: TraceFrame
+    ) -> None:
+        # pyre-fixme[16]: `DefaultDict` has no attribute `add`.
+        self._issue_instance_trace_frame_assoc.add(
+            instance.id.local_id, trace_frame.id.local_id
+        )
+        # pyre-fixme[16]: `DefaultDict` has no attribute `add`.
+        self._trace_frame_issue_instance_assoc.add(
+            trace_frame.id.local_id, instance.id.local_id
+        )
+
+    def add_trace_frame_annotation_trace_frame_assoc(
+        self, annotation: TraceFrameAnnotation, trace_frame: TraceFrame
+    ) -> None:
+        # pyre-fixme[16]: `DefaultDict` has no attribute `add`.
+        self._trace_frame_annotation_trace_frame_assoc.add(
+            annotation.id.local_id, trace_frame.id.local_id
+        )
+        # pyre-fixme[16]: `DefaultDict` has no attribute `add`.
+        self._trace_frame_trace_frame_annotation_assoc.add(
+            trace_frame.id.local_id, annotation.id.local_id
+        )
+
+    def add_issue_instance_shared_text_assoc_id(
+        self, instance: IssueInstance, shared_text_id: int
+    ) -> None:
+        # pyre-fixme[16]: `DefaultDict` has no attribute `add`.
+        self._issue_instance_shared_text_assoc.add(instance.id.local_id, shared_text_id)
+        # pyre-fixme[16]: `DefaultDict` has no attribute `add`.
+        self._shared_text_issue_instance_assoc.add(shared_text_id, instance.id.local_id)
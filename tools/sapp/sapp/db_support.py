@@ -11,7 +11,17 @@ from itertools import tee
 from typing import Dict, List, Optional, Set, Tuple, Type
 
 from munch import Munch
-from sqlalchemy import Column, String, and_, exc, inspect, or_, types
+from sqlalchemy import (
+    Column,
+    MetaData,
+    String,
+    Table,
+    and_,
+    exc,
+    inspect,
+    or_,
+    types,
+)
 from sqlalchemy.dialects import mysql
 from sqlalchemy.dialects.mysql import BIGINT
 from sqlalchemy.orm import Session
@@ -25,6 +35,12 @@ log: logging.Logger = logging.getLogger("sapp")
 """Number of variables that can safely be set on a single DB call"""
 BATCH_SIZE = 450
 
+"""Number of rows inserted into a temporary table per executemany"""
+TEMPORARY_TABLE_BATCH_SIZE = 10000
+
+"""Key of the MergeCache in Session.info, if merges should go through one"""
+MERGE_CACHE = "sapp_merge_cache"
+
 
 # The following three DBID classes require some explanation. Normally models
 # will reference each other by their id. But we do bulk insertion at the end
@@ -202,6 +218,10 @@ class PrepareMixin(object):
                object's key.
 
         Returns the next item (in items) that is not already in the DB.
+
+        If the session's info has a MergeCache under MERGE_CACHE, keys are
+        looked up in the cache before the DB, and the ids of the merged items
+        are added to it.
         """
         # Note: items is an iterator, not an iterable, 'tee' is a must.
         items_iter1, items_iter2 = tee(items)
@@ -217,30 +237,21 @@ class PrepareMixin(object):
             item_hash = hash_item(i)
             keys[item_hash] = {attr.key: getattr(i, attr.key) for attr in attrs}
 
-        # Find existing items.
         existing_ids = {}  # map of item_hash -> existing ID
-        cls_attrs = [getattr(cls, attr.key) for attr in attrs]
-        for fetch_keys in split_every(BATCH_SIZE, keys.values()):
-            filters = []
-            for fetch_key in fetch_keys:
-                # Sub-filters for checking if item with fetch_key is in the DB
-                # Example: [
-                #   SharedText.kind.__eq__("feature"),
-                #   SharedText.contents.__eq__("via tito"),
-                # ]
-                subfilter = [
-                    getattr(cls, attr).__eq__(val) for attr, val in fetch_key.items()
-                ]
-                filters.append(and_(*subfilter))
-            existing_items = (
-                # pyre-fixme[16]: `PrepareMixin` has no attribute `id`.
-                session.query(cls.id, *cls_attrs)
-                .filter(or_(*(filters)))
-                .all()
+        merge_cache = session.info.get(MERGE_CACHE)
+        if merge_cache is not None:
+            existing_ids.update(
+                merge_cache.lookup(session, cls, hash_item, attrs, keys.keys())
             )
-            for existing_item in existing_items:
-                item_hash = hash_item(existing_item)
-                existing_ids[item_hash] = existing_item.id
+        cached_hashes = set(existing_ids)
+
+        # Find existing items.
+        fetch_keys = [
+            key for item_hash, key in keys.items() if item_hash not in existing_ids
+        ]
+        for existing_item in cls._find_existing(session, fetch_keys, attrs):
+            item_hash = hash_item(existing_item)
+            existing_ids[item_hash] = existing_item.id
 
         # Now see if we can merge
         new_items = {}
@@ -255,8 +266,82 @@ class PrepareMixin(object):
             else:
                 # The key is new
                 new_items[item_hash] = i
+                if merge_cache is not None:
+                    merge_cache.add(cls, item_hash, i.id)
                 yield i
 
+        if merge_cache is not None:
+            for item_hash, existing_id in existing_ids.items():
+                if item_hash not in cached_hashes:
+                    merge_cache.add(cls, item_hash, existing_id)
+
+    @classmethod
+    # pyre-fixme[3]: Return type must be annotated.
+    # pyre-fixme[2]: Parameter must be annotated.
+    # pyre-fixme[2]: Parameter must be annotated.
+    # pyre-fixme[2]: Parameter must be annotated.
+    def _find_existing(cls, session, fetch_keys, attrs):
+        """Returns the (id, *attrs) rows of the items in the DB that have one of
+        the keys in fetch_keys.
+
+        A handful of keys is looked up with a single query. More keys are
+        inserted into a temporary table which is then joined against the
+        table of cls, so the DB can look up all of them in a single pass over
+        its index instead of through many queries of chained OR filters.
+        """
+        # pyre-fixme[16]: `PrepareMixin` has no attribute `id`.
+        cls_attrs = [cls.id] + [getattr(cls, attr.key) for attr in attrs]
+        if len(fetch_keys) == 0:
+            return []
+        if len(fetch_keys) <= BATCH_SIZE:
+            filters = []
+            for fetch_key in fetch_keys:
+                # Sub-filters for checking if item with fetch_key is in the DB
+                # Example: [
+                #   SharedText.kind.__eq__("feature"),
+                #   SharedText.contents.__eq__("via tito"),
+                # ]
+                subfilter = [
+                    getattr(cls, attr).__eq__(val) for attr, val in fetch_key.items()
+                ]
+                filters.append(and_(*subfilter))
+            return session.query(*cls_attrs).filter(or_(*(filters))).all()
+
+        keys_table = Table(
+            # pyre-fixme[16]: `PrepareMixin` has no attribute `__tablename__`.
+            "merge_keys_%s" % cls.__tablename__,
+            MetaData(),
+            *[
+                Column(attr.key, attr.property.columns[0].type.copy(), nullable=False)
+                for attr in attrs
+            ],
+            prefixes=["TEMPORARY"],
+        )
+        connection = session.connection()
+        # The table is emptied rather than dropped once the keys are looked up:
+        # MySQL commits the session's transaction on a DROP TABLE. It is kept
+        # until the connection is closed, so it can exist already.
+        keys_table.create(connection, checkfirst=True)
+        connection.execute(keys_table.delete())
+        try:
+            for batch in split_every(TEMPORARY_TABLE_BATCH_SIZE, fetch_keys):
+                connection.execute(keys_table.insert(), batch)
+            return (
+                session.query(*cls_attrs)
+                .join(
+                    keys_table,
+                    and_(
+                        *[
+                            getattr(cls, attr.key) == keys_table.c[attr.key]
+                            for attr in attrs
+                        ]
+                    ),
+                )
+                .all()
+            )
+        finally:
+            connection.execute(keys_table.delete())
+
     @classmethod
     # pyre-fixme[3]: Return type must be annotated.
     # pyre-fixme[2]: Parameter must be annotated.
@@ -381,6 +466,21 @@ class PrimaryKeyGeneratorBase:  # pyre-ignore[13]
 
         return self
 
+    def reserve_range(
+        self,
+        session: Session,
+        # pyre-fixme[24]: Generic type `type` expects 1 type parameter, use
+        #  `typing.Type` to avoid runtime subscripting errors.
+        cls: Type,
+        count: int,
+        use_lock: bool = False,
+    ) -> int:
+        """Reserves a range of count ids for rows of cls that are written
+        without going through `get`, and returns the first id of the range."""
+        self._reserve_id_range(session, cls, count, use_lock)
+        first_id, _last_id = self.pks.pop(cls.__name__)
+        return first_id
+
     # pyre-fixme[24]: Generic type `type` expects 1 type parameter, use
     #  `typing.Type` to avoid runtime subscripting errors.
     # pyre-fixme[24]: Generic type `type` expects 1 type parameter, use
@@ -0,0 +1,154 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""A local cache of the ids of merged rows that is kept across runs
+"""
+
+import logging
+import sqlite3
+from collections import defaultdict
+from contextlib import closing, contextmanager
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Set,
+    Tuple,
+)
+
+from .iterutil import split_every
+
+
+log: logging.Logger = logging.getLogger("sapp")
+
+
+class MergeCache:
+    """Maps the keys of rows merged by PrepareMixin._merge_by_keys (e.g. the
+    kind and contents of shared texts) to their ids, so that later runs don't
+    have to look them up in the database again. Entries are stored per table
+    in a local SQLite file.
+
+    SAPP doesn't change or delete merged rows, so entries stay valid as long as
+    the cache is used with the same database. To detect the cache being used
+    with a different or recreated database, it remembers the entry with the
+    highest id of each table, and the first lookup in a table checks that the
+    database still has that row. Otherwise the entries of the table are
+    dropped.
+
+    Entries are only stored by `commit`, which must be called once the merged
+    items have been written to the database.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._pending: DefaultDict[str, List[Tuple[str, Any]]] = defaultdict(list)
+        self._validated: Set[str] = set()
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "table_name TEXT NOT NULL, key TEXT NOT NULL, id INTEGER NOT NULL, "
+                "PRIMARY KEY (table_name, key))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS stamps ("
+                "table_name TEXT PRIMARY KEY, key TEXT NOT NULL, id INTEGER NOT NULL)"
+            )
+
+    def lookup(
+        self,
+        session: Any,
+        cls: Any,
+        hash_item: Callable[[Any], str],
+        attrs: Iterable[Any],
+        keys: Iterable[str],
+    ) -> Dict[str, int]:
+        """Returns the cached ids of the given keys of items of cls."""
+        table_name = cls.__tablename__
+        with self._connect() as connection:
+            if table_name not in self._validated:
+                self._validate(connection, session, cls, hash_item, attrs)
+            ids = {}
+            for batch in split_every(self.BATCH_SIZE, keys):
+                ids.update(
+                    connection.execute(
+                        "SELECT key, id FROM entries WHERE table_name = ? "
+                        "AND key IN (%s)" % ", ".join("?" * len(batch)),
+                        [table_name, *batch],
+                    )
+                )
+        return ids
+
+    def add(self, cls: Any, key: str, id: Any) -> None:
+        """Adds the id of a merged item. The id may be a DBID that is resolved
+        when the item is saved."""
+        self._pending[cls.__tablename__].append((key, id))
+
+    def commit(self) -> None:
+        """Stores the entries added since the last commit."""
+        pending, self._pending = self._pending, defaultdict(list)
+        with self._connect() as connection:
+            for table_name, entries in pending.items():
+                rows = [(table_name, key, int(id)) for key, id in entries]
+                if not rows:
+                    continue
+                connection.executemany(
+                    "INSERT OR REPLACE INTO entries (table_name, key, id) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+                _, key, id = max(rows, key=lambda row: row[2])
+                connection.execute(
+                    "INSERT OR REPLACE INTO stamps (table_name, key, id) "
+                    "SELECT ?, ?, ? WHERE NOT EXISTS ("
+                    "SELECT 1 FROM stamps WHERE table_name = ? AND id >= ?)",
+                    (table_name, key, id, table_name, id),
+                )
+
+    def _validate(
+        self,
+        connection: sqlite3.Connection,
+        session: Any,
+        cls: Any,
+        hash_item: Callable[[Any], str],
+        attrs: Iterable[Any],
+    ) -> None:
+        table_name = cls.__tablename__
+        stamp = connection.execute(
+            "SELECT key, id FROM stamps WHERE table_name = ?", (table_name,)
+        ).fetchone()
+        if stamp is not None:
+            key, id = stamp
+            row = (
+                session.query(cls.id, *[getattr(cls, attr.key) for attr in attrs])
+                .filter(cls.id == id)
+                .first()
+            )
+            if row is None or hash_item(row) != key:
+                log.warning(
+                    "Merge cache %s doesn't match the database, clearing %s",
+                    self.path,
+                    table_name,
+                )
+                connection.execute(
+                    "DELETE FROM entries WHERE table_name = ?", (table_name,)
+                )
+                connection.execute(
+                    "DELETE FROM stamps WHERE table_name = ?", (table_name,)
+                )
+        self._validated.add(table_name)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Connections aren't kept open, so the cache can be used from the
+        # background writer's thread as well.
+        with closing(sqlite3.connect(self.path)) as connection:
+            with connection:
+                yield connection
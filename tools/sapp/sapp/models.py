@@ -12,7 +12,7 @@ import logging
 from datetime import datetime
 from decimal import Decimal
 from itertools import islice
-from typing import Any, Dict, Optional, Set, Type
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
 
 from graphene_sqlalchemy.converter import (
     convert_column_to_int_or_id,
@@ -20,6 +20,7 @@ from graphene_sqlalchemy.converter import (
     convert_sqlalchemy_type,
 )
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     DateTime,
@@ -28,7 +29,9 @@ from sqlalchemy import (
     Index,
     Integer,
     String,
+    Table,
     func,
+    literal,
     types,
 )
 from sqlalchemy.dialects import mysql, sqlite
@@ -36,7 +39,7 @@ from sqlalchemy.dialects.mysql import BIGINT
 from sqlalchemy.exc import NoSuchTableError
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import Session, relationship
+from sqlalchemy.orm import Query, Session, relationship
 
 from .db import DB
 from .db_support import (
@@ -766,14 +769,30 @@ class Run(Base):  # noqa
     def get_summary(self, **kwargs) -> RunSummary:
         session = Session.object_session(self)
 
+        statistics = RunStatistics.get(session, [self.id.resolved()]).get(
+            self.id.resolved()
+        )
+        if statistics is None:
+            num_new_issues = self._get_num_new_issue_instances(session)
+            num_total_issues = self._get_num_total_issues(session)
+            alarm_counts = self._get_alarm_counts(session)
+        else:
+            num_new_issues = statistics.get((RunStatisticKind.new_issues, ""), 0)
+            num_total_issues = statistics.get((RunStatisticKind.total_issues, ""), 0)
+            alarm_counts = {
+                int(key): count
+                for (kind, key), count in statistics.items()
+                if kind == RunStatisticKind.code
+            }
+
         return RunSummary(
             commit_hash=self.commit_hash,
             differential_id=self.differential_id,
             id=self.id.resolved(),
             job_id=self.job_id,
-            num_new_issues=self._get_num_new_issue_instances(session),
-            num_total_issues=self._get_num_total_issues(session),
-            alarm_counts=self._get_alarm_counts(session),
+            num_new_issues=num_new_issues,
+            num_total_issues=num_total_issues,
+            alarm_counts=alarm_counts,
         )
 
     def new_issue_instances(self):
@@ -906,6 +925,212 @@ class MetaRunToRunAssoc(Base, PrepareMixin, RecordMixin):  # noqa
         return cls._merge_assocs(session, items, cls.meta_run_id, cls.run_id)
 
 
+class RunCallableHash(Base, PrepareMixin, RecordMixin):  # noqa
+    """Hash of the models and issues of a callable in the analysis output of a
+    run. Stored for incrementally ingested runs, so that the next run can tell
+    which callables changed."""
+
+    __tablename__ = "run_callable_hashes"
+
+    run_id = Column(BIGDBIDType, nullable=False, primary_key=True)
+
+    callable_hash: Column[int] = Column(
+        BigInteger,
+        doc="Hash of the name of the callable",
+        nullable=False,
+        primary_key=True,
+        autoincrement=False,
+    )
+
+    content_hash: Column[int] = Column(
+        BigInteger,
+        doc="Hash of the json of the models and issues of the callable",
+        nullable=False,
+    )
+
+
+class TypeaheadKind(enum.Enum):
+    # Do NOT reorder the enums. Depending on the type of database, existing
+    # DBs may have these enums represented internally as ints based on the
+    # order shown here, and changing it here messes up existing data. This
+    # also means that new enums should be added AT THE END of the list.
+    code = enum.auto()
+    path = enum.auto()
+    callable = enum.auto()
+    feature = enum.auto()
+
+
+class RunTypeahead(Base):  # noqa
+    """Distinct codes, paths, callables and features of the issue instances of
+    a run, with the number of issue instances that have them. Filled in when
+    the run is saved, so that the UI can search them by prefix without
+    aggregating the issue instances."""
+
+    __tablename__ = "run_typeahead"
+
+    run_id = Column(BIGDBIDType, nullable=False, primary_key=True)
+
+    kind: Column[str] = Column(Enum(TypeaheadKind), nullable=False, primary_key=True)
+
+    value: Column[str] = Column(
+        String(length=SHARED_TEXT_LENGTH), nullable=False, primary_key=True
+    )
+
+    issue_count: Column[int] = Column(Integer, nullable=False)
+
+    @classmethod
+    def populate(cls, session: Session, run_id: int) -> None:
+        """Computes the typeahead values of the given run."""
+        queries = {
+            TypeaheadKind.code: _count_by_code(session),
+            TypeaheadKind.path: _count_by_text(session, IssueInstance.filename_id),
+            TypeaheadKind.callable: _count_by_text(session, IssueInstance.callable_id),
+            TypeaheadKind.feature: _count_by_assoc_text(
+                session, SharedTextKind.FEATURE
+            ),
+        }
+        for kind, query in queries.items():
+            _insert_counts(
+                session, cls.__table__, ["value", "issue_count"], run_id, kind, query
+            )
+
+
+class RunStatisticKind(enum.Enum):
+    # Do NOT reorder the enums. Depending on the type of database, existing
+    # DBs may have these enums represented internally as ints based on the
+    # order shown here, and changing it here messes up existing data. This
+    # also means that new enums should be added AT THE END of the list.
+    total_issues = enum.auto()
+    new_issues = enum.auto()
+    code = enum.auto()
+    filename = enum.auto()
+    source_kind = enum.auto()
+    sink_kind = enum.auto()
+
+
+StatisticKey = Tuple[RunStatisticKind, str]
+
+
+class RunStatistics(Base):  # noqa
+    """Number of issue instances of a run, in total, new, and by code, filename,
+    source kind and sink kind. Written when the run is saved, so that summaries
+    of runs don't have to count the issue instances."""
+
+    __tablename__ = "run_statistics"
+
+    run_id = Column(BIGDBIDType, nullable=False, primary_key=True)
+
+    kind: Column[str] = Column(Enum(RunStatisticKind), nullable=False, primary_key=True)
+
+    key: Column[str] = Column(
+        String(length=SHARED_TEXT_LENGTH),
+        doc="The code, filename or kind that is counted, empty for the totals",
+        nullable=False,
+        primary_key=True,
+    )
+
+    count: Column[int] = Column(Integer, nullable=False)
+
+    @classmethod
+    def save(
+        cls, session: Session, run_id: int, counts: Dict[StatisticKey, int]
+    ) -> None:
+        session.execute(
+            cls.__table__.insert(),
+            [
+                {"run_id": run_id, "kind": kind, "key": key, "count": count}
+                for (kind, key), count in counts.items()
+            ],
+        )
+
+    @classmethod
+    def populate(cls, session: Session, run_id: int) -> None:
+        """Counts the issue instances of the given run in the database. Only
+        needed when not all of them are in the trace graph that is saved, e.g.
+        when they are copied from the parent run."""
+        total = session.query(literal("", String), func.count(IssueInstance.id))
+        queries = {
+            RunStatisticKind.total_issues: total,
+            RunStatisticKind.new_issues: total.filter(
+                IssueInstance.is_new_issue.is_(True)
+            ),
+            RunStatisticKind.code: _count_by_code(session),
+            RunStatisticKind.filename: _count_by_text(
+                session, IssueInstance.filename_id
+            ),
+            RunStatisticKind.source_kind: _count_by_assoc_text(
+                session, SharedTextKind.SOURCE
+            ),
+            RunStatisticKind.sink_kind: _count_by_assoc_text(
+                session, SharedTextKind.SINK
+            ),
+        }
+        for kind, query in queries.items():
+            _insert_counts(
+                session, cls.__table__, ["key", "count"], run_id, kind, query
+            )
+
+    @classmethod
+    def get(
+        cls, session: Session, run_ids: List[int]
+    ) -> Dict[int, Dict[StatisticKey, int]]:
+        """Returns the statistics of the given runs. Runs saved before statistics
+        were written have none."""
+        statistics: Dict[int, Dict[StatisticKey, int]] = {}
+        for run_id, kind, key, count in session.query(
+            cls.run_id, cls.kind, cls.key, cls.count
+        ).filter(cls.run_id.in_(run_ids)):
+            statistics.setdefault(int(run_id), {})[(kind, key)] = count
+        return statistics
+
+
+def _count_by_code(session: Session) -> Query:
+    return (
+        session.query(func.cast(Issue.code, String), func.count(IssueInstance.id))
+        .join(Issue, Issue.id == IssueInstance.issue_id)
+        .group_by(Issue.code)
+    )
+
+
+def _count_by_text(session: Session, text_id: Column) -> Query:
+    return (
+        session.query(SharedText.contents, func.count(IssueInstance.id))
+        .join(SharedText, SharedText.id == text_id)
+        .group_by(SharedText.contents)
+    )
+
+
+def _count_by_assoc_text(session: Session, kind: SharedTextKind) -> Query:
+    return (
+        session.query(SharedText.contents, func.count(IssueInstance.id.distinct()))
+        .join(
+            IssueInstanceSharedTextAssoc,
+            IssueInstanceSharedTextAssoc.issue_instance_id == IssueInstance.id,
+        )
+        .join(SharedText, SharedText.id == IssueInstanceSharedTextAssoc.shared_text_id)
+        .filter(SharedText.kind == kind)
+        .group_by(SharedText.contents)
+    )
+
+
+def _insert_counts(
+    session: Session,
+    table: Table,
+    columns: List[str],
+    run_id: int,
+    kind: enum.Enum,
+    query: Query,
+) -> None:
+    """Inserts the (value, count) rows of a query over the issue instances of
+    the run, as the rows of the given kind."""
+    query = query.filter(IssueInstance.run_id == run_id).add_columns(
+        literal(run_id, BIGDBIDType), literal(kind, table.c.kind.type)
+    )
+    session.execute(
+        table.insert().from_select(columns + ["run_id", "kind"], query.subquery())
+    )
+
+
 class TraceFrameLeafAssoc(Base, PrepareMixin, RecordMixin):  # noqa
 
     __tablename__ = "trace_frame_message_assoc"
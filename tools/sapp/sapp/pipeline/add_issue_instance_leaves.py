@@ -4,12 +4,12 @@
 # LICENSE file in the root directory of this source tree.
 
 import logging
-from collections import deque
-from typing import Set, Tuple
+from typing import Dict, Set, Tuple
 
 from ..models import DBID, SharedText, SharedTextKind
 from ..trace_graph import LeafMapping, TraceGraph
 from . import PipelineStep, Summary
+from .reachability import FrameID, KindMap, propagate_kinds
 
 
 # pyre-fixme[5]: Global expression must be annotated.
@@ -38,33 +38,19 @@ class AddIssueInstanceLeaves(PipelineStep[TraceGraph, TraceGraph]):
             if self.code == graph.get_issue(instance.issue_id).code
         ]
 
-        # Add all the trace frame ids for all the issue instances
-        trace_frames = []
-        for instance in instances:
-            trace_frames.extend(graph.get_issue_instance_trace_frames(instance))
-
-        # Explore forward (caller -> callee; issue -> leaf)
-        queue = deque([(frame, 0) for frame in trace_frames])
-        depth_by_frame_id = {}
-        while len(queue) > 0:
-            trace_frame, depth = queue.popleft()
-            trace_frame_id = trace_frame.id.local_id
-
-            # Skip repeat frames unless we arrived at them by a shorter path.
-            if (
-                trace_frame_id in depth_by_frame_id
-                and depth >= depth_by_frame_id[trace_frame_id]
-            ):
-                continue
-            else:
-                # Record the minimum depth.
-                depth_by_frame_id[trace_frame_id] = depth
-
-            # Iterate forward
-            queue.extend(
-                (next_frame, depth + 1)
-                for next_frame in graph.get_next_trace_frames(trace_frame)
-            )
+        # Explore forward (caller -> callee; issue -> leaf) from the trace
+        # frames of all the issue instances, recording the minimum depths.
+        initial: Dict[FrameID, KindMap] = {
+            frame.id.local_id: {None: 1}
+            for instance in instances
+            for frame in graph.get_issue_instance_trace_frames(instance)
+        }
+        depth_by_frame_id = {
+            trace_frame_id: reached[None][0][1]
+            for trace_frame_id, reached in propagate_kinds(
+                graph, initial, map_leaves=False
+            ).items()
+        }
 
         # Create new leaves based on these depths
         leaf = graph.get_shared_text(self.leaf_kind, self.leaf_name)
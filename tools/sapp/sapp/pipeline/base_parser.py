@@ -18,6 +18,8 @@ import xxhash
 
 from ..analysis_output import AnalysisOutput, Metadata
 from . import DictEntries, InputFiles, Optional, PipelineStep, Summary
+from .incremental import CallableHashes
+from .offset_index import LazyConditions, OffsetIndex
 
 
 # if these imports have the same name we get a linter error
@@ -44,6 +46,9 @@ class ParseType(Enum):
     POSTCONDITION = "postcondition"
 
 
+CONDITION_TYPES: Set[ParseType] = {ParseType.PRECONDITION, ParseType.POSTCONDITION}
+
+
 def log_trace_keyerror(func):
     def wrapper(self, json, *args):
         try:
@@ -85,6 +90,8 @@ class BaseParser(PipelineStep[InputFiles, DictEntries]):
     def __init__(self, repo_dir=None):
         self.repo_dir = os.path.realpath(repo_dir) if repo_dir else None
         self.version = None
+        # Issues with other codes are skipped without parsing their traces.
+        self.codes_to_keep: Optional[Set[int]] = None
 
     def get_version(self):
         return self.version
@@ -106,10 +113,23 @@ class BaseParser(PipelineStep[InputFiles, DictEntries]):
         return
         yield
 
+    def parse_by_types(
+        self, input: AnalysisOutput, types: Set[ParseType]
+    ) -> Iterable[Dict[str, Any]]:
+        """Same as `parse`, but only returns objects of the given types.
+        Subclasses should override this if they can skip building the other
+        objects altogether."""
+        for entry in self.parse(input):
+            if entry["type"] in types:
+                yield entry
+
     def _analysis_output_to_parsed_types(
-        self, input: AnalysisOutput
+        self, input: AnalysisOutput, types: Optional[Set[ParseType]] = None
     ) -> Iterable[Tuple[ParseType, Any, Dict[str, Any]]]:
-        entries = self.parse(input)
+        if types is None:
+            entries = self.parse(input)
+        else:
+            entries = self.parse_by_types(input, types)
 
         for e in entries:
             typ = e["type"]
@@ -127,6 +147,8 @@ class BaseParser(PipelineStep[InputFiles, DictEntries]):
         previous_inputfile: Optional[AnalysisOutput],
         previous_issue_handles: Optional[AnalysisOutput],
         linemapfile: Optional[str],
+        streaming: bool = False,
+        use_offset_index: bool = False,
     ) -> DictEntries:
         """Here we take input generators and return a dict with issues,
         preconditions, and postconditions separated. If there is only a single
@@ -139,6 +161,17 @@ class BaseParser(PipelineStep[InputFiles, DictEntries]):
         filename, each new file line position to a list of old file line
         position. This is used to adjust handles to we can recognize when issues
         moved.
+
+        With use_offset_index, pre/postconditions are not parsed up front.
+        Instead, an index of where they are in the inputfile is built (or
+        reused) and they are read from there when they are looked up.
+
+        When streaming, issues are returned as a generator that parses them
+        from the inputfile again as it is consumed, so the inputfile must be
+        readable more than once. Streaming implies use_offset_index: otherwise
+        every pre/postcondition would still be held in memory. If the
+        inputfile can't be indexed, the conditions are parsed up front and
+        streaming only saves the memory of the issues.
         """
 
         issues = []
@@ -177,6 +210,38 @@ class BaseParser(PipelineStep[InputFiles, DictEntries]):
                     # Use exact handle match too in case linemap is missing.
                     previous_handles.add(master_key)
 
+        if use_offset_index or streaming:
+            try:
+                index = OffsetIndex.from_analysis_output(self, inputfile)
+            except NotImplementedError as error:
+                log.warning("Not using an offset index: %s", error)
+                if streaming:
+                    log.warning("Streaming keeps every pre/postcondition in memory")
+            else:
+                issues = self._stream_new_issues(inputfile, linemap, previous_handles)
+                return {
+                    "issues": issues if streaming else list(issues),
+                    "preconditions": LazyConditions(
+                        self, index, ParseType.PRECONDITION
+                    ),
+                    "postconditions": LazyConditions(
+                        self, index, ParseType.POSTCONDITION
+                    ),
+                }
+
+        if streaming:
+            log.info("Parsing hh_server output (conditions only)")
+            for typ, key, e in self._analysis_output_to_parsed_types(
+                inputfile, CONDITION_TYPES
+            ):
+                conditions[typ][key].append(e)
+
+            return {
+                "issues": self._stream_new_issues(inputfile, linemap, previous_handles),
+                "preconditions": conditions[ParseType.PRECONDITION],
+                "postconditions": conditions[ParseType.POSTCONDITION],
+            }
+
         log.info("Parsing hh_server output")
         for typ, key, e in self._analysis_output_to_parsed_types(inputfile):
             if typ == ParseType.ISSUE:
@@ -193,6 +258,16 @@ class BaseParser(PipelineStep[InputFiles, DictEntries]):
             "postconditions": conditions[ParseType.POSTCONDITION],
         }
 
+    def _stream_new_issues(
+        self, inputfile: AnalysisOutput, linemap, previous_handles: Set[str]
+    ) -> Iterable[Dict[str, Any]]:
+        log.info("Streaming issues from hh_server output")
+        for _typ, key, e in self._analysis_output_to_parsed_types(
+            inputfile, {ParseType.ISSUE}
+        ):
+            if not self._is_existing_issue(linemap, previous_handles, e, key):
+                yield e
+
     def _is_existing_issue(self, linemap, old_handles, new_issue, new_handle):
         if new_handle in old_handles:
             return True
@@ -216,6 +291,19 @@ class BaseParser(PipelineStep[InputFiles, DictEntries]):
 
     def run(self, input: InputFiles, summary: Summary) -> Tuple[DictEntries, Summary]:
         inputfile, previous_inputfile = input
+        self.codes_to_keep = summary.get("codes_to_keep")
+
+        if summary.get("incremental"):
+            if previous_inputfile or summary.get("previous_issue_handles"):
+                log.warning("Not ingesting incrementally, only new issues are ingested")
+            elif self.codes_to_keep is not None:
+                log.warning("Not ingesting incrementally, only some codes are ingested")
+            else:
+                try:
+                    log.info("Hashing callables")
+                    summary["callable_hashes"] = self.get_callable_hashes(inputfile)
+                except NotImplementedError as error:
+                    log.warning("Not ingesting incrementally: %s", error)
 
         return (
             self.analysis_output_to_dict_entries(
@@ -223,10 +311,15 @@ class BaseParser(PipelineStep[InputFiles, DictEntries]):
                 previous_inputfile,
                 summary.get("previous_issue_handles"),
                 summary.get("old_linemap_file"),
+                summary.get("streaming", False),
+                summary.get("use_offset_index", False),
             ),
             summary,
         )
 
+    def is_kept_code(self, code: int) -> bool:
+        return self.codes_to_keep is None or code in self.codes_to_keep
+
     @staticmethod
     def compute_master_handle(callable, line, start, end, code):
         key = "{callable}:{line}|{start}|{end}:{code}".format(
@@ -263,3 +356,26 @@ class BaseParser(PipelineStep[InputFiles, DictEntries]):
     # Given a path and an offset, return the json in mostly-raw form.
     def get_json_from_file_offset(self, path: str, offset: int) -> Dict[str, Any]:
         raise NotImplementedError("get_json_from_file_offset not implemented")
+
+    # Returns the type, (caller, caller_port), shard and offset of the entry
+    # each pre/postcondition is parsed from, where shard is the index of the
+    # file in input.file_names(). Used to build an OffsetIndex.
+    def get_condition_offsets(
+        self, input: AnalysisOutput
+    ) -> Iterable[Tuple[ParseType, Tuple[str, str], int, int]]:
+        raise NotImplementedError("get_condition_offsets not implemented")
+
+    # Parses the json returned by get_json_from_file_offset like `parse` would.
+    def parse_raw(self, json: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+        raise NotImplementedError("parse_raw not implemented")
+
+    # Returns the hashes of the json of the models and issues of each callable,
+    # used to ingest a run incrementally.
+    def get_callable_hashes(self, input: AnalysisOutput) -> CallableHashes:
+        raise NotImplementedError("get_callable_hashes not implemented")
+
+    # Returns the offset of the first entry if, from there on, the file has one
+    # json entry per line that can be parsed with `parse_raw`. Used to split
+    # large files for parallel parsing.
+    def get_entries_offset(self, handle: TextIO) -> Optional[int]:
+        return None
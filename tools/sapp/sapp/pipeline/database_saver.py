@@ -6,7 +6,8 @@
 #!/usr/bin/env python3
 
 import logging
-from typing import Optional, Tuple
+from collections import Counter
+from typing import Dict, Optional, Tuple
 
 from ..bulk_saver import BulkSaver
 from ..db import DB
@@ -16,8 +17,14 @@ from ..models import (
     MetaRunToRunAssoc,
     PrimaryKeyGenerator,
     Run,
+    RunCallableHash,
+    RunStatisticKind,
+    RunStatistics,
     RunStatus,
     RunSummary,
+    RunTypeahead,
+    SharedTextKind,
+    StatisticKey,
     TraceFrame,
     TraceFrameAnnotation,
     TraceFrameLeafAssoc,
@@ -25,6 +32,7 @@ from ..models import (
 )
 from ..trace_graph import TraceGraph
 from . import PipelineStep, Summary
+from .offset_index import LazyConditions
 
 
 # pyre-fixme[5]: Global expression must be annotated.
@@ -66,13 +74,36 @@ class DatabaseSaver(PipelineStep[TraceGraph, RunSummary]):
         database.
         """
         log.info("Preparing bulk save.")
+        self.bulk_saver.merge_cache = self.summary.get("merge_cache")
         # pyre-fixme[16]: `DatabaseSaver` has no attribute `graph`.
         self.graph.update_bulk_saver(self.bulk_saver)
 
+        callable_hashes = self.summary.get("callable_hashes")
+        if callable_hashes is not None:
+            for callable_hash, content_hash in callable_hashes.items():
+                self.bulk_saver.add(
+                    RunCallableHash.Record(
+                        run_id=self.summary["run"].id,
+                        callable_hash=callable_hash,
+                        content_hash=content_hash,
+                    )
+                )
+
+        writer = self.summary.get("background_writer")
+        if writer is not None:
+            log.info("Waiting for background writes to finish.")
+            writer.finish()
+            writer.discard_saved(self.bulk_saver)
+
         for trace_kind, unused in self.summary["trace_entries"].items():
+            if isinstance(unused, LazyConditions):
+                # Don't read the unused conditions just to count them.
+                num_unused = len(unused)
+            else:
+                num_unused = sum(len(v) for v in unused.values())
             log.info(
                 "Dropped %d unused %s, %d are missing",
-                sum(len(v) for v in unused.values()),
+                num_unused,
                 trace_kind,
                 len(self.summary["missing_traces"][trace_kind]),
             )
@@ -104,10 +135,12 @@ class DatabaseSaver(PipelineStep[TraceGraph, RunSummary]):
         )
 
         with self.database.make_session() as session:
-            pk_gen = self.primary_key_generator.reserve(
-                session, [Run], use_lock=self.use_lock
-            )
-            self.summary["run"].id.resolve(id=pk_gen.get(Run), is_new=True)
+            # The id may have been reserved up front by a BackgroundWriter.
+            if self.summary["run"].id.resolved() is None:
+                pk_gen = self.primary_key_generator.reserve(
+                    session, [Run], use_lock=self.use_lock
+                )
+                self.summary["run"].id.resolve(id=pk_gen.get(Run), is_new=True)
             session.add(self.summary["run"])
             meta_run_identifier = self.summary.get("meta_run_identifier")
             if meta_run_identifier is not None:
@@ -123,9 +156,26 @@ class DatabaseSaver(PipelineStep[TraceGraph, RunSummary]):
 
         self.bulk_saver.save_all(self.database, self.use_lock)
 
+        parent_run = self.summary.get("parent_run")
+        if parent_run is not None:
+            log.info("Copying unchanged callables from run %d", parent_run.id)
+            # pyre-fixme[16]: `DatabaseSaver` has no attribute `graph`.
+            parent_run.copy_unchanged(
+                self.database,
+                run_id,
+                self.graph.get_trace_frames(),
+                self.primary_key_generator,
+            )
+
         # Now that the run is finished, fetch it from the DB again and set its
         # status to FINISHED.
         with self.database.make_session() as session:
+            if parent_run is None:
+                RunStatistics.save(session, run_id, self._statistics())
+            else:
+                # Instances copied from the parent run are not in the graph.
+                RunStatistics.populate(session, run_id)
+            RunTypeahead.populate(session, run_id)
             run = session.query(self.RUN_MODEL).filter_by(id=run_id).one()
             run.status = RunStatus.FINISHED
             session.add(run)
@@ -142,3 +192,29 @@ class DatabaseSaver(PipelineStep[TraceGraph, RunSummary]):
         )
 
         return run_summary
+
+    def _statistics(self) -> Dict[StatisticKey, int]:
+        """Counts the saved issue instances of the graph."""
+        # pyre-fixme[16]: `DatabaseSaver` has no attribute `graph`.
+        graph = self.graph
+        counts: Counter[StatisticKey] = Counter()
+        counts[(RunStatisticKind.total_issues, "")] = 0
+        counts[(RunStatisticKind.new_issues, "")] = 0
+        for instance in graph.get_issue_instances():
+            counts[(RunStatisticKind.total_issues, "")] += 1
+            if instance.issue_id.is_new:
+                counts[(RunStatisticKind.new_issues, "")] += 1
+            code = graph.get_issue(instance.issue_id).code
+            counts[(RunStatisticKind.code, str(code))] += 1
+            counts[
+                (RunStatisticKind.filename, graph.get_text(instance.filename_id))
+            ] += 1
+            for text_kind, kind in [
+                (SharedTextKind.SOURCE, RunStatisticKind.source_kind),
+                (SharedTextKind.SINK, RunStatisticKind.sink_kind),
+            ]:
+                for text in graph.get_issue_instance_shared_texts(
+                    instance.id.local_id, text_kind
+                ):
+                    counts[(kind, text.contents)] += 1
+        return counts
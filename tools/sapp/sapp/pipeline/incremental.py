@@ -0,0 +1,492 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Ingesting a run incrementally, against the run before it
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import xxhash
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    and_,
+    exists,
+    func,
+    literal,
+    select,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import aliased
+
+from ..db import DB
+from ..iterutil import split_every
+from ..models import (
+    IssueInstance,
+    IssueInstanceSharedTextAssoc,
+    IssueInstanceTraceFrameAssoc,
+    PrimaryKeyGenerator,
+    Run,
+    RunCallableHash,
+    RunStatus,
+    SharedText,
+    TraceFrame,
+    TraceFrameAnnotation,
+    TraceFrameAnnotationTraceFrameAssoc,
+    TraceFrameLeafAssoc,
+    TraceKind,
+)
+from ..trace_graph import TraceGraph
+from . import DictEntries, PipelineStep, Summary
+
+
+log: logging.Logger = logging.getLogger("sapp")
+
+HASH_MASK: int = (1 << 64) - 1
+
+# Number of rows inserted into a temporary table per executemany.
+BATCH_SIZE = 10000
+
+
+def _signed(value: int) -> int:
+    """Fits an unsigned 64 bit hash into a signed BIGINT column."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hash_callable(callable: str) -> int:
+    return _signed(xxhash.xxh64(callable).intdigest())
+
+
+class CallableHashes:
+    """Hashes of the models and issues of each callable in an analysis output,
+    keyed on the hash of the callable's name.
+
+    The hash of a callable is the sum of the hashes of the json of its entries,
+    so it doesn't depend on the order the entries are read in.
+    """
+
+    def __init__(self) -> None:
+        self._hashes: Dict[int, int] = {}
+
+    def add(self, callable: str, json: str) -> None:
+        key = hash_callable(callable)
+        self._hashes[key] = (
+            self._hashes.get(key, 0) + xxhash.xxh64(json).intdigest()
+        ) & HASH_MASK
+
+    def get(self, callable: str) -> Optional[int]:
+        value = self._hashes.get(hash_callable(callable))
+        return None if value is None else _signed(value)
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        for key, value in self._hashes.items():
+            yield key, _signed(value)
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+
+class ParentRun:
+    """The run that an incremental run is ingested against.
+
+    The issue instances and trace frames of callables that are unchanged since
+    the parent run aren't generated again. Instead, `copy_unchanged` copies the
+    rows of the parent run within the database. Trace frames are run specific,
+    so the rows are copied rather than shared between the runs.
+
+    The new run may still reach the trace frames of unchanged callables from
+    changed ones, in which case it generates them and they aren't copied. To
+    continue the traces of the copied trace frames, `seeds` are the
+    (kind, callee, callee port) of the copied trace frames that lead into
+    changed callables, which the new run has to generate trace frames for.
+    """
+
+    def __init__(
+        self,
+        id: int,
+        unchanged_callables: Set[str],
+        unchanged_callable_ids: Set[int],
+        seeds: List[Tuple[TraceKind, str, str]],
+    ) -> None:
+        self.id = id
+        self.unchanged_callables = unchanged_callables
+        self.unchanged_callable_ids = unchanged_callable_ids
+        self.seeds = seeds
+
+    def is_unchanged(self, callable: str) -> bool:
+        return callable in self.unchanged_callables
+
+    def copy_unchanged(
+        self,
+        database: DB,
+        run_id: int,
+        generated_trace_frames: Iterable[TraceFrame],
+        primary_key_generator: PrimaryKeyGenerator,
+    ) -> None:
+        """Copies the issue instances and trace frames of unchanged callables,
+        and their assocs, from the parent run to the run with run_id. Trace
+        frames with the same kind, caller and caller port as one of
+        generated_trace_frames are left out.
+
+        Ids are only reserved for the rows that are copied. The ids of the
+        parent run's rows are collected into temporary tables first, which
+        number them to map them to the reserved ids.
+        """
+        generated_keys = {
+            (frame.kind, int(frame.caller_id), frame.caller_port)
+            for frame in generated_trace_frames
+            if int(frame.caller_id) in self.unchanged_callable_ids
+        }
+
+        frames = TraceFrame.__table__
+        instances = IssueInstance.__table__
+        annotations = TraceFrameAnnotation.__table__
+        with database.engine.connect() as connection:
+            callables = _create_temporary_table(
+                connection,
+                "incremental_callables",
+                Column("id", BigInteger, primary_key=True),
+            )
+            generated = _create_temporary_table(
+                connection,
+                "incremental_generated_frames",
+                Column("kind", frames.c.kind.type.copy(), nullable=False),
+                Column("caller_id", BigInteger, nullable=False),
+                Column("caller_port", frames.c.caller_port.type.copy(), nullable=False),
+            )
+            copied_frames = _create_copied_ids_table(
+                connection, "incremental_copied_frames"
+            )
+            copied_instances = _create_copied_ids_table(
+                connection, "incremental_copied_instances"
+            )
+            copied_annotations = _create_copied_ids_table(
+                connection, "incremental_copied_annotations"
+            )
+            try:
+                with connection.begin():
+                    _insert(
+                        connection,
+                        callables,
+                        ({"id": id} for id in self.unchanged_callable_ids),
+                    )
+                    _insert(
+                        connection,
+                        generated,
+                        (
+                            {"kind": kind, "caller_id": caller_id, "caller_port": port}
+                            for kind, caller_id, port in generated_keys
+                        ),
+                    )
+                    _insert_copied_ids(
+                        connection,
+                        copied_frames,
+                        frames.c.id,
+                        and_(
+                            frames.c.run_id == self.id,
+                            frames.c.caller_id.in_(select([callables.c.id])),
+                            ~exists().where(
+                                and_(
+                                    generated.c.kind == frames.c.kind,
+                                    generated.c.caller_id == frames.c.caller_id,
+                                    generated.c.caller_port == frames.c.caller_port,
+                                )
+                            ),
+                        ),
+                    )
+                    _insert_copied_ids(
+                        connection,
+                        copied_instances,
+                        instances.c.id,
+                        and_(
+                            instances.c.run_id == self.id,
+                            instances.c.callable_id.in_(select([callables.c.id])),
+                        ),
+                    )
+                    _insert_copied_ids(
+                        connection,
+                        copied_annotations,
+                        annotations.c.id,
+                        annotations.c.trace_frame_id.in_(select([copied_frames.c.id])),
+                    )
+
+                with database.make_session() as session:
+                    offsets = {
+                        table: self._reserve(
+                            session, primary_key_generator, cls, connection, table
+                        )
+                        for cls, table in [
+                            (TraceFrame, copied_frames),
+                            (IssueInstance, copied_instances),
+                            (TraceFrameAnnotation, copied_annotations),
+                        ]
+                    }
+
+                with connection.begin():
+                    for table, offset in offsets.items():
+                        connection.execute(
+                            table.update().values(new_id=table.c.position + offset)
+                        )
+
+                    _copy(connection, frames, {"id": copied_frames}, {"run_id": run_id})
+                    _copy(
+                        connection,
+                        TraceFrameLeafAssoc.__table__,
+                        {"trace_frame_id": copied_frames},
+                        {},
+                    )
+                    _copy(
+                        connection,
+                        annotations,
+                        {"id": copied_annotations, "trace_frame_id": copied_frames},
+                        {},
+                    )
+                    _copy(
+                        connection,
+                        TraceFrameAnnotationTraceFrameAssoc.__table__,
+                        {
+                            "trace_frame_annotation_id": copied_annotations,
+                            "trace_frame_id": copied_frames,
+                        },
+                        {},
+                    )
+                    _copy(
+                        connection,
+                        instances,
+                        {"id": copied_instances},
+                        {"run_id": run_id, "is_new_issue": False},
+                    )
+                    _copy(
+                        connection,
+                        IssueInstanceSharedTextAssoc.__table__,
+                        {"issue_instance_id": copied_instances},
+                        {},
+                    )
+                    _copy(
+                        connection,
+                        IssueInstanceTraceFrameAssoc.__table__,
+                        {
+                            "issue_instance_id": copied_instances,
+                            "trace_frame_id": copied_frames,
+                        },
+                        {},
+                    )
+
+                    num_frames = connection.execute(
+                        select([func.count()]).select_from(copied_frames)
+                    ).scalar()
+                    num_instances = connection.execute(
+                        select([func.count()]).select_from(copied_instances)
+                    ).scalar()
+            finally:
+                for table in [
+                    callables,
+                    generated,
+                    copied_frames,
+                    copied_instances,
+                    copied_annotations,
+                ]:
+                    table.drop(connection)
+
+        log.info(
+            "Copied %d issue instances and %d trace frames from run %d",
+            num_instances,
+            num_frames,
+            self.id,
+        )
+
+    @staticmethod
+    def _reserve(
+        session: Any,
+        primary_key_generator: PrimaryKeyGenerator,
+        # pyre-fixme[2]: Parameter must be annotated.
+        cls,
+        connection: Connection,
+        copied_ids: Table,
+    ) -> int:
+        """Reserves ids for the rows in the table of copied ids, and returns the
+        offset from their positions in the table to the reserved ids."""
+        first_position, last_position = connection.execute(
+            select([func.min(copied_ids.c.position), func.max(copied_ids.c.position)])
+        ).first()
+        if first_position is None:
+            return 0
+        first_id = primary_key_generator.reserve_range(
+            session, cls, last_position - first_position + 1
+        )
+        return first_id - first_position
+
+
+class FindParentRun(PipelineStep[DictEntries, DictEntries]):
+    """Finds the run to ingest the new run against, if the parser computed
+    callable hashes: the latest finished run of the same kind that stored
+    callable hashes. Sets the "parent_run" of the summary to a ParentRun.
+    """
+
+    def __init__(self, database: DB) -> None:
+        super().__init__()
+        self.database = database
+
+    def run(self, input: DictEntries, summary: Summary) -> Tuple[DictEntries, Summary]:
+        hashes: Optional[CallableHashes] = summary.get("callable_hashes")
+        if hashes is None:
+            return input, summary
+        if summary.get("affected_files") is not None:
+            # Trimming would drop the trace frames generated for copied ones.
+            log.warning("Not ingesting incrementally, the trace graph is trimmed")
+            return input, summary
+
+        with self.database.make_session() as session:
+            parent_run_id = (
+                session.query(Run.id)
+                .filter(Run.status == RunStatus.FINISHED)
+                .filter(Run.kind == summary["run_kind"])
+                .filter(
+                    session.query(RunCallableHash)
+                    .filter(RunCallableHash.run_id == Run.id)
+                    .exists()
+                )
+                .order_by(Run.id.desc())
+                .limit(1)
+                .scalar()
+            )
+            if parent_run_id is None:
+                log.info("No previous run with callable hashes to ingest against")
+                return input, summary
+            parent_run_id = int(parent_run_id)
+            summary["parent_run"] = self._load_parent_run(
+                session, parent_run_id, hashes
+            )
+        return input, summary
+
+    def _load_parent_run(
+        self, session: Any, parent_run_id: int, hashes: CallableHashes
+    ) -> ParentRun:
+        parent_hashes = dict(
+            session.query(RunCallableHash.callable_hash, RunCallableHash.content_hash)
+            .filter(RunCallableHash.run_id == parent_run_id)
+            .all()
+        )
+        unchanged_hashes = {
+            callable_hash
+            for callable_hash, content_hash in hashes.items()
+            if parent_hashes.get(callable_hash) == content_hash
+        }
+
+        callables: Dict[int, str] = {}
+        for query in [
+            session.query(TraceFrame.caller_id, SharedText.contents)
+            .join(SharedText, SharedText.id == TraceFrame.caller_id)
+            .filter(TraceFrame.run_id == parent_run_id),
+            session.query(IssueInstance.callable_id, SharedText.contents)
+            .join(SharedText, SharedText.id == IssueInstance.callable_id)
+            .filter(IssueInstance.run_id == parent_run_id),
+        ]:
+            callables.update((int(id), contents) for id, contents in query.distinct())
+        unchanged_callable_ids = {
+            id
+            for id, callable in callables.items()
+            if hash_callable(callable) in unchanged_hashes
+        }
+        unchanged_callables = {callables[id] for id in unchanged_callable_ids}
+
+        CalleeText = aliased(SharedText)
+        seeds = [
+            (kind, callee, callee_port)
+            for kind, caller_id, callee, callee_port in session.query(
+                TraceFrame.kind,
+                TraceFrame.caller_id,
+                CalleeText.contents,
+                TraceFrame.callee_port,
+            )
+            .join(CalleeText, CalleeText.id == TraceFrame.callee_id)
+            .filter(TraceFrame.run_id == parent_run_id)
+            .distinct()
+            if int(caller_id) in unchanged_callable_ids
+            and callee not in unchanged_callables
+            and not TraceGraph.is_leaf_port(callee_port)
+        ]
+
+        log.info(
+            "Ingesting against run %d, %d of %d callables are unchanged",
+            parent_run_id,
+            len(unchanged_hashes),
+            len(hashes),
+        )
+        return ParentRun(
+            parent_run_id, unchanged_callables, unchanged_callable_ids, seeds
+        )
+
+
+def _create_temporary_table(
+    connection: Connection, name: str, *columns: Column
+) -> Table:
+    table = Table(name, MetaData(), *columns, prefixes=["TEMPORARY"])
+    table.create(connection, checkfirst=True)
+    connection.execute(table.delete())
+    return table
+
+
+def _insert(connection: Connection, table: Table, rows: Iterable[Dict[str, Any]]):
+    for batch in split_every(BATCH_SIZE, rows):
+        connection.execute(table.insert(), batch)
+
+
+def _create_copied_ids_table(connection: Connection, name: str) -> Table:
+    """A table of the ids of the parent run's rows that are copied. Rows are
+    numbered by their position in the table, and get a new id from it."""
+    return _create_temporary_table(
+        connection,
+        name,
+        Column("position", Integer, primary_key=True, autoincrement=True),
+        Column("id", BigInteger, nullable=False, unique=True),
+        Column("new_id", BigInteger),
+    )
+
+
+def _insert_copied_ids(
+    connection: Connection,
+    copied_ids: Table,
+    id_column: Column,
+    # pyre-fixme[2]: Parameter must be annotated.
+    whereclause,
+) -> None:
+    connection.execute(
+        copied_ids.insert().from_select(
+            ["id"], select([id_column]).where(whereclause).order_by(id_column)
+        )
+    )
+
+
+def _copy(
+    connection: Connection,
+    table: Table,
+    ids: Dict[str, Table],
+    values: Dict[str, Any],
+) -> None:
+    """Copies the rows of table whose columns in ids are in the given tables of
+    copied ids, replacing these columns with the new ids and the columns in
+    values."""
+    columns = []
+    rows = table
+    for column in table.columns:
+        if column.key in ids:
+            copied_ids = ids[column.key]
+            rows = rows.join(copied_ids, copied_ids.c.id == column)
+            columns.append(copied_ids.c.new_id)
+        elif column.key in values:
+            columns.append(literal(values[column.key]))
+        else:
+            columns.append(column)
+    connection.execute(
+        table.insert().from_select(
+            [column.key for column in table.columns],
+            select(columns).select_from(rows),
+        )
+    )
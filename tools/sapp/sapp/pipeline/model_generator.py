@@ -7,11 +7,12 @@
 
 import datetime
 import logging
-from collections import defaultdict
-from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import ujson as json
 
+from ..compact_trace_graph import CompactTraceGraph
 from ..models import (
     DBID,
     Issue,
@@ -28,8 +29,10 @@ from ..models import (
     TraceFrameAnnotation,
     TraceKind,
 )
+from ..iterutil import split_every
 from ..trace_graph import LeafMapping, TraceGraph
 from . import DictEntries, PipelineStep, Summary
+from .incremental import ParentRun
 
 
 log = logging.getLogger("sapp")
@@ -38,6 +41,11 @@ log = logging.getLogger("sapp")
 # pyre-fixme[13]: Attribute `graph` is never initialized.
 # pyre-fixme[13]: Attribute `summary` is never initialized.
 class ModelGenerator(PipelineStep[DictEntries, TraceGraph]):
+    # Issues are generated, and the background writer is flushed, in batches of
+    # this many. When streaming, this bounds the parsed issues that are held at
+    # once, but not the trace graph generated from them.
+    PARSE_BATCH_SIZE = 10000
+
     def __init__(self) -> None:
         super().__init__()
         self.summary: Summary
@@ -55,25 +63,80 @@ class ModelGenerator(PipelineStep[DictEntries, TraceGraph]):
         )  # Dict[TraceKind, Set[Tuple[str, str]]]
         self.summary["big_tito"] = set()  # Set[Tuple[str, str, int]]
 
-        self.graph = TraceGraph()
+        if self.summary.get("compact_trace_graph"):
+            self.graph = CompactTraceGraph()
+        else:
+            self.graph = TraceGraph()
         self.summary["run"] = self._create_empty_run(status=RunStatus.INCOMPLETE)
         self.summary["run"].id = DBID()
 
         self.summary["trace_entries"][TraceKind.precondition] = input["preconditions"]
         self.summary["trace_entries"][TraceKind.postcondition] = input["postconditions"]
-        callables = self._compute_callables_count(input)
 
-        log.info("Generating issues and traces")
-        for entry in input["issues"]:
-            self._generate_issue(self.summary["run"], entry, callables)
+        writer = self.summary.get("background_writer")
+        if writer is not None:
+            # Trimming may drop trace frames and the shared texts they
+            # reference, so only save them early if the graph won't be trimmed.
+            writer.start(
+                self.summary["run"],
+                self.graph,
+                save_items=self.summary.get("affected_files") is None,
+            )
 
-        if self.summary.get("store_unused_models"):
+        parent_run = self.summary.get("parent_run")
+        issues = input["issues"]
+        if parent_run is not None:
+            # The issues of unchanged callables are copied from the parent run.
+            issues = (
+                entry
+                for entry in issues
+                if not parent_run.is_unchanged(entry["callable"])
+            )
+
+        log.info("Generating issues and traces")
+        if self.summary.get("streaming"):
+            self._generate_issues_as_parsed(self.summary["run"], issues)
+        else:
+            callables = self._compute_callables_count(input)
+            for batch in split_every(self.PARSE_BATCH_SIZE, issues):
+                for entry in batch:
+                    self._generate_issue(self.summary["run"], entry, callables)
+                self._flush_writes()
+
+        if parent_run is not None:
+            self._generate_parent_run_seeds(self.summary["run"], parent_run)
+
+        if self.summary.get("codes_to_keep") is not None:
+            # The unused models are the ones that no kept issue reaches.
+            if self.summary.get("store_unused_models"):
+                log.info("Not storing unused models, only some codes are ingested")
+        elif self.summary.get("store_unused_models"):
             for trace_kind, traces in self.summary["trace_entries"].items():
                 for _key, entry in traces:
                     self._generate_trace_frame(trace_kind, self.summary["run"], entry)
 
+        self._flush_writes()
         return self.graph, self.summary
 
+    def _generate_parent_run_seeds(self, run, parent_run: ParentRun) -> None:
+        """Generates the trace frames that the trace frames copied from the
+        parent run lead to in changed callables."""
+        log.info("Generating traces of %d changed callees", len(parent_run.seeds))
+        for kind, callee, callee_port in parent_run.seeds:
+            callee_record = self._get_shared_text(SharedTextKind.CALLABLE, callee)
+            for frame, leaf_mapping in self._get_or_populate_trace_frames(
+                kind, run, callee_record.id, callee_port
+            ):
+                self._generate_transitive_trace_frames(
+                    run, frame, {leaf_map.callee_leaf for leaf_map in leaf_mapping}
+                )
+        self._flush_writes()
+
+    def _flush_writes(self) -> None:
+        writer = self.summary.get("background_writer")
+        if writer is not None:
+            writer.flush(self.graph)
+
     def _compute_callables_count(self, iters: Dict[str, Any]):
         """Iterate over all issues and count the number of times each callable
         is seen."""
@@ -85,6 +148,28 @@ class ModelGenerator(PipelineStep[DictEntries, TraceGraph]):
 
         return count
 
+    def _generate_issues_as_parsed(self, run, issues: Iterable[Dict[str, Any]]) -> None:
+        """Generates issues in batches as they are parsed, without holding all
+        of the parsed issues in memory. The number of issues per callable is
+        only known once every issue has been seen, so it is filled in at the
+        end.
+
+        This only bounds the memory used for parsing, not for ingesting: the
+        issues, trace frames and shared texts generated from the batches stay
+        in self.graph, which later steps need whole, until it is saved."""
+        callables: Counter = Counter()
+        for batch in split_every(self.PARSE_BATCH_SIZE, issues):
+            for entry in batch:
+                callables[entry["callable"]] += 1
+                self._generate_issue(run, entry, callables)
+            log.info("Generated %d issues", sum(callables.values()))
+            self._flush_writes()
+
+        for instance in self.graph.get_issue_instances():
+            instance.callable_count = callables[
+                self.graph.get_text(instance.callable_id)
+            ]
+
     def _create_empty_run(
         self, status=RunStatus.FINISHED, status_description=None
     ) -> Run:
@@ -0,0 +1,203 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Index of where pre/postconditions live in the analysis output, so they can
+be read on demand instead of being parsed and kept in memory up front."""
+
+import logging
+import os
+from collections import defaultdict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    DefaultDict,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import ujson as json
+import xxhash
+
+from ..analysis_output import AnalysisOutput
+
+
+if TYPE_CHECKING:
+    from .base_parser import BaseParser, ParseType  # noqa
+
+
+log: logging.Logger = logging.getLogger("sapp")
+
+# (caller, caller_port)
+ConditionKey = Tuple[str, str]
+# (shard, offset), where shard is the index of the file in the analysis output.
+Position = Tuple[int, int]
+
+INDEX_VERSION = 1
+
+
+class OffsetIndex:
+    """Maps the (callable, port) of each pre/postcondition to the (shard,
+    offset) of the entry it is parsed from.
+
+    The index is persisted next to the analysis output, so it only needs to be
+    built once per AnalysisOutput. It is invalidated when any of the files of
+    the analysis output change.
+    """
+
+    def __init__(
+        self,
+        file_names: List[str],
+        positions: Dict[str, Dict[ConditionKey, List[Position]]],
+    ) -> None:
+        self.file_names = file_names
+        self.positions = positions
+
+    @classmethod
+    def from_analysis_output(
+        cls, parser: "BaseParser", input: AnalysisOutput
+    ) -> "OffsetIndex":
+        file_names = list(input.file_names())
+        path = cls._cache_path(file_names)
+        index = cls.load(path, file_names)
+        if index is not None:
+            log.info("Using offset index from %s", path)
+            return index
+
+        log.info("Building offset index")
+        index = cls.build(parser, input, file_names)
+        try:
+            index.save(path)
+        except OSError as error:
+            log.warning("Unable to save offset index to %s: %s", path, error)
+        return index
+
+    @classmethod
+    def build(
+        cls, parser: "BaseParser", input: AnalysisOutput, file_names: List[str]
+    ) -> "OffsetIndex":
+        positions: DefaultDict[
+            str, DefaultDict[ConditionKey, List[Position]]
+        ] = defaultdict(lambda: defaultdict(list))
+        for typ, key, shard, offset in parser.get_condition_offsets(input):
+            positions[typ.value][key].append((shard, offset))
+        return cls(file_names, positions)
+
+    @classmethod
+    def load(cls, path: str, file_names: List[str]) -> Optional["OffsetIndex"]:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("version") != INDEX_VERSION or data.get("files") != [
+            list(stamp) for stamp in _file_stamps(file_names)
+        ]:
+            log.info("Offset index at %s is out of date", path)
+            return None
+
+        positions: DefaultDict[
+            str, DefaultDict[ConditionKey, List[Position]]
+        ] = defaultdict(lambda: defaultdict(list))
+        for typ, rows in data["positions"].items():
+            for caller, port, shard, offset in rows:
+                positions[typ][(caller, port)].append((shard, offset))
+        return cls(file_names, positions)
+
+    def save(self, path: str) -> None:
+        data: Dict[str, Any] = {
+            "version": INDEX_VERSION,
+            "files": [list(stamp) for stamp in _file_stamps(self.file_names)],
+            "positions": {
+                typ: [
+                    [caller, port, shard, offset]
+                    for (caller, port), key_positions in positions.items()
+                    for (shard, offset) in key_positions
+                ]
+                for typ, positions in self.positions.items()
+            },
+        }
+        with open(path, "w") as f:
+            json.dump(data, f)
+
+    @staticmethod
+    def _cache_path(file_names: List[str]) -> str:
+        hash_gen = xxhash.xxh64()
+        for name in file_names:
+            hash_gen.update(os.path.abspath(name))
+        directory = os.path.dirname(os.path.abspath(file_names[0]))
+        return os.path.join(directory, f".sapp-offsets-{hash_gen.hexdigest()}.json")
+
+
+def _file_stamps(file_names: List[str]) -> Iterable[Tuple[str, int, int]]:
+    for name in file_names:
+        stat = os.stat(name)
+        yield (os.path.abspath(name), stat.st_size, stat.st_mtime_ns)
+
+
+class LazyConditions:
+    """Stands in for the Dict[(caller, caller_port), List[condition]] of one
+    condition type produced by the parser. Conditions are only read from the
+    analysis output, by seeking to the entry they come from, when they are
+    popped or iterated over.
+    """
+
+    def __init__(
+        self, parser: "BaseParser", index: OffsetIndex, typ: "ParseType"
+    ) -> None:
+        self._parser = parser
+        self._file_names: List[str] = index.file_names
+        self._positions: Dict[ConditionKey, List[Position]] = dict(
+            index.positions.get(typ.value, {})
+        )
+        self._type = typ
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, key: ConditionKey) -> bool:
+        return key in self._positions
+
+    def __iter__(self) -> Iterator[ConditionKey]:
+        return iter(list(self._positions))
+
+    def keys(self) -> List[ConditionKey]:
+        return list(self._positions)
+
+    def pop(
+        self, key: ConditionKey, default: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        positions = self._positions.pop(key, None)
+        if positions is None:
+            return default
+        return self._read(key, positions)
+
+    def items(self) -> Iterable[Tuple[ConditionKey, List[Dict[str, Any]]]]:
+        for key, positions in list(self._positions.items()):
+            yield key, self._read(key, positions)
+
+    def values(self) -> Iterable[List[Dict[str, Any]]]:
+        for _key, entries in self.items():
+            yield entries
+
+    def _read(
+        self, key: ConditionKey, positions: List[Position]
+    ) -> List[Dict[str, Any]]:
+        entries = []
+        for shard, offset in positions:
+            raw = self._parser.get_json_from_file_offset(
+                self._file_names[shard], offset
+            )
+            for entry in self._parser.parse_raw(raw):
+                if (
+                    entry["type"] == self._type
+                    and (entry["caller"], entry["caller_port"]) == key
+                ):
+                    entries.append(entry)
+        return entries
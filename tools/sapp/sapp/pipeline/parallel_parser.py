@@ -4,47 +4,147 @@
 # LICENSE file in the root directory of this source tree.
 
 import logging
+import os
 from multiprocessing import Pool
-from typing import Any, Dict, Iterable
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 
-from ..analysis_output import AnalysisOutput
-from .base_parser import BaseParser
+import ujson as json
+
+from ..analysis_output import AnalysisOutput, Metadata
+from .base_parser import BaseParser, ParseType
+from .incremental import CallableHashes
 
 
 log: logging.Logger = logging.getLogger("sapp")
 logging.basicConfig(format="%(asctime)s [%(levelname)s] %(message)s")
 
+DEFAULT_CHUNK_SIZE: int = 32 * 1024 * 1024
+
+
+class Chunk(NamedTuple):
+    """A unit of work for a worker: the entries of `path` that start in
+    [start, end). If end is None, the whole file is parsed with parse_handle."""
+
+    path: str
+    start: int
+    end: Optional[int]
+
 
 # We are going to call this per process, so we need to pass in and return
 # serializable data. And as a single arg, as far as I can tell. Which is why the
 # args type looks so silly.
-# pyre-fixme[3]: Return type must be annotated.
-# pyre-fixme[2]: Parameter must be annotated.
-def parse(args):
-    (base_parser, repo_dir, metadata), path = args
+def parse(
+    args: Tuple[
+        Tuple[type, Optional[str], Optional[Metadata], Optional[Set[int]]], Chunk
+    ]
+) -> List[Dict[str, Any]]:
+    (base_parser, repo_dir, metadata, codes_to_keep), chunk = args
 
     parser = base_parser(repo_dir)
     parser.initialize(metadata)
+    parser.codes_to_keep = codes_to_keep
+
+    if chunk.end is None:
+        with open(chunk.path) as handle:
+            return list(parser.parse_handle(handle))
 
-    with open(path) as handle:
-        return list(parser.parse_handle(handle))
+    entries = []
+    with open(chunk.path, "rb") as handle:
+        handle.seek(chunk.start)
+        while handle.tell() < chunk.end:
+            line = handle.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry:
+                entries.extend(parser.parse_raw(entry))
+    return entries
 
 
 class ParallelParser(BaseParser):
+    """Parses the analysis output with a pool of `processes` workers.
+
+    Files that the parser can read one entry per line are split on line
+    boundaries into chunks of about `chunk_size` bytes, so that one large
+    shard doesn't serialize the run, and results are yielded chunk by chunk as
+    workers finish them. With `ordered`, results are yielded in the order a
+    serial parse would yield them, at the cost of waiting on slow chunks.
+    """
+
     # pyre-fixme[2]: Parameter must be annotated.
     # pyre-fixme[2]: Parameter must be annotated.
-    def __init__(self, parser_class, repo_dir=None) -> None:
+    def __init__(
+        self,
+        parser_class,
+        repo_dir=None,
+        processes: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        ordered: bool = False,
+    ) -> None:
         super().__init__(repo_dir)
         # pyre-fixme[4]: Attribute must be annotated.
         self.parser = parser_class
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.ordered = ordered
+        # Used for reading single entries, which isn't worth a process pool.
+        self._entry_parser: BaseParser = parser_class(repo_dir)
 
     def parse(self, input: AnalysisOutput) -> Iterable[Dict[str, Any]]:
         log.info("Parsing in parallel")
-        files = list(input.file_names())
+        chunks = [
+            chunk for path in input.file_names() for chunk in self._split_file(path)
+        ]
+        log.info("Parsing %d chunks", len(chunks))
+
+        # Pair up the arguments with each chunk.
+        args = zip(
+            [(self.parser, self.repo_dir, input.metadata, self.codes_to_keep)]
+            * len(chunks),
+            chunks,
+        )
+
+        with Pool(processes=self.processes) as pool:
+            results = (
+                pool.imap(parse, args)
+                if self.ordered
+                else pool.imap_unordered(parse, args)
+            )
+            for entries in results:
+                yield from entries
+
+    def _split_file(self, path: str) -> Iterable[Chunk]:
+        with open(path) as handle:
+            start = self._entry_parser.get_entries_offset(handle)
+        if start is None:
+            yield Chunk(path, 0, None)
+            return
+
+        size = os.path.getsize(path)
+        with open(path, "rb") as handle:
+            while start < size:
+                handle.seek(start + self.chunk_size)
+                # Move the end of the chunk to the start of the next line.
+                handle.readline()
+                end = min(handle.tell(), size)
+                yield Chunk(path, start, end)
+                start = end
+
+    def get_json_from_file_offset(self, path: str, offset: int) -> Dict[str, Any]:
+        return self._entry_parser.get_json_from_file_offset(path, offset)
+
+    def get_condition_offsets(
+        self, input: AnalysisOutput
+    ) -> Iterable[Tuple[ParseType, Tuple[str, str], int, int]]:
+        self._entry_parser.initialize(input.metadata)
+        return self._entry_parser.get_condition_offsets(input)
 
-        # Pair up the arguments with each file.
-        args = zip([(self.parser, self.repo_dir, input.metadata)] * len(files), files)
+    def get_callable_hashes(self, input: AnalysisOutput) -> CallableHashes:
+        self._entry_parser.initialize(input.metadata)
+        return self._entry_parser.get_callable_hashes(input)
 
-        with Pool(processes=None) as pool:
-            for f in pool.imap_unordered(parse, args):
-                yield from f
+    def parse_raw(self, json: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+        self._entry_parser.codes_to_keep = self.codes_to_keep
+        return self._entry_parser.parse_raw(json)
@@ -7,18 +7,20 @@
 
 import logging
 from collections import defaultdict
-from typing import IO, Any, Dict, Iterable, List, Optional, Tuple
+from typing import IO, Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import ujson as json
 
 from .. import errors
 from ..analysis_output import AnalysisOutput, Metadata
 from .base_parser import (
+    CONDITION_TYPES,
     BaseParser,
     EntryPosition,
     ParseType,
     log_trace_keyerror_in_generator,
 )
+from .incremental import CallableHashes
 
 
 # pyre-fixme[5]: Global expression must be annotated.
@@ -40,11 +42,29 @@ class Parser(BaseParser):
         for entry in self._parse_basic(handle):
             yield from self._parse_by_type(entry)
 
+    def parse_by_types(
+        self, input: AnalysisOutput, types: Set[ParseType]
+    ) -> Iterable[Dict[str, Any]]:
+        # Only decode the traces of the entries we are going to keep.
+        parsed_kinds = set()
+        if ParseType.ISSUE in types:
+            parsed_kinds.add("issue")
+        if not types.isdisjoint(CONDITION_TYPES):
+            parsed_kinds.add("model")
+
+        for handle in input.file_handles():
+            for entry in self._parse_basic(handle):
+                if entry["kind"] not in parsed_kinds:
+                    continue
+                for parsed in self._parse_by_type(entry):
+                    if parsed["type"] in types:
+                        yield parsed
+
     # Instead of returning the actual json from the AnalysisOutput, we return
     # location information so it can be retrieved later.
     def get_json_file_offsets(self, input: AnalysisOutput) -> Iterable[EntryPosition]:
-        for handle in input.file_handles():
-            for entry, position in self._parse_v2(handle):
+        for shard, handle in enumerate(input.file_handles()):
+            for entry, position in self._parse_v2(handle, shard):
                 callable = self._get_callable(entry["data"].get("callable")).lstrip(
                     "\\"
                 )
@@ -60,6 +80,54 @@ class Parser(BaseParser):
             fh.seek(offset)
             return json.loads(fh.readline())
 
+    def get_condition_offsets(
+        self, input: AnalysisOutput
+    ) -> Iterable[Tuple[ParseType, Tuple[str, str], int, int]]:
+        for shard, handle in enumerate(input.file_handles()):
+            if self._guess_file_version(handle) != 2:
+                raise NotImplementedError("Offsets require jsonlines (v2) output")
+            for entry, position in self._parse_v2(handle, shard):
+                if entry["kind"] != "model":
+                    continue
+                model = entry["data"]
+                for source_trace in model["sources"]:
+                    yield (
+                        ParseType.POSTCONDITION,
+                        (model["callable"], source_trace["port"]),
+                        shard,
+                        position["offset"],
+                    )
+                for sink_trace in model["sinks"]:
+                    yield (
+                        ParseType.PRECONDITION,
+                        (model["callable"], sink_trace["port"]),
+                        shard,
+                        position["offset"],
+                    )
+
+    def get_callable_hashes(self, input: AnalysisOutput) -> CallableHashes:
+        hashes = CallableHashes()
+        for handle in input.file_handles():
+            if self._guess_file_version(handle) != 2:
+                raise NotImplementedError(
+                    "Callable hashes require jsonlines (v2) output"
+                )
+            handle.readline()
+            for line in handle:
+                entry = json.loads(line)
+                if entry:
+                    hashes.add(entry["data"]["callable"], line)
+        return hashes
+
+    def parse_raw(self, json: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+        return self._parse_by_type(json)
+
+    def get_entries_offset(self, handle: IO[str]) -> Optional[int]:
+        if self._guess_file_version(handle) != 2:
+            return None
+        handle.readline()
+        return handle.tell()
+
     def _parse_basic(self, handle: IO[str]) -> Iterable[Dict[str, Any]]:
         file_version = self._guess_file_version(handle)
         if file_version == 2:
@@ -76,7 +144,7 @@ class Parser(BaseParser):
         return results
 
     def _parse_v2(
-        self, handle: IO[str]
+        self, handle: IO[str], shard: int = 0
     ) -> Iterable[Tuple[Dict[str, Any], Dict[str, int]]]:
         """Parse analysis in jsonlines format:
         { "file_version": 2, "config": <json> }
@@ -87,8 +155,6 @@ class Parser(BaseParser):
         header = json.loads(handle.readline())
         assert header["file_version"] == 2
 
-        shard = 0
-
         offset, line = handle.tell(), handle.readline()
         while line:
             entry = json.loads(line)
@@ -120,7 +186,8 @@ class Parser(BaseParser):
         if entry["kind"] == "model":
             yield from self._parse_model(entry["data"])
         elif entry["kind"] == "issue":
-            yield from self._parse_issue(entry["data"])
+            if self.is_kept_code(entry["data"]["code"]):
+                yield from self._parse_issue(entry["data"])
 
     @staticmethod
     # pyre-fixme[3]: Return type must be annotated.
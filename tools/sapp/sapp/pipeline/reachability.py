@@ -0,0 +1,114 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""Propagation of sets of kinds along the traces of a TraceGraph
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..trace_graph import LeafMapping, TraceGraph
+
+
+FrameID = int
+# Maps leaves of a frame to a set of kinds, as bits. Leaves are None when
+# kinds are propagated regardless of the leaves of frames.
+KindMap = Dict[Optional[int], int]
+# The kinds that reached each leaf of a frame, as (kinds, depth) pairs.
+Reached = Dict[Optional[int], List[Tuple[int, int]]]
+
+
+class KindBits:
+    """Assigns a bit to each kind (e.g. a shared text local id) so that sets of
+    kinds can be stored as ints and combined with bitwise operations."""
+
+    def __init__(self) -> None:
+        self._bits: Dict[int, int] = {}
+        self._kinds: List[int] = []
+
+    def encode(self, kinds: Iterable[int]) -> int:
+        bits = 0
+        for kind in kinds:
+            bit = self._bits.get(kind)
+            if bit is None:
+                bit = self._bits[kind] = 1 << len(self._kinds)
+                self._kinds.append(kind)
+            bits |= bit
+        return bits
+
+    def decode(self, bits: int) -> Iterator[int]:
+        while bits:
+            lowest = bits & -bits
+            yield self._kinds[lowest.bit_length() - 1]
+            bits ^= lowest
+
+
+def propagate_kinds(
+    graph: TraceGraph, initial: Dict[FrameID, KindMap], map_leaves: bool = True
+) -> Dict[FrameID, Reached]:
+    """Propagates kinds from the initial frames to all trace frames reachable
+    from them, in the caller to callee direction, and returns the minimum depth
+    at which each kind reaches each frame.
+
+    All initial frames are at depth 0 and the frames are visited one depth at a
+    time, so each frame is expanded at most once per depth for all kinds
+    together, and kinds that already reached a leaf of a frame are not
+    propagated again from it.
+
+    With map_leaves, the kinds of a leaf are passed on to the callee leaves that
+    the next frame's leaf mapping maps it to. Otherwise all kinds are passed on
+    to all next frames.
+
+    The kinds returned for the leaves of a frame are disjoint between depths,
+    and in increasing order of depth.
+    """
+    visited: Dict[FrameID, KindMap] = {}
+    reached: Dict[FrameID, Reached] = {}
+    frontier = initial
+    depth = 0
+    while frontier:
+        next_frontier: Dict[FrameID, KindMap] = {}
+        for frame_id, kind_map in frontier.items():
+            frame_visited = visited.setdefault(frame_id, {})
+            new_kind_map: KindMap = {}
+            for leaf, kinds in kind_map.items():
+                new_kinds = kinds & ~frame_visited.get(leaf, 0)
+                if new_kinds:
+                    frame_visited[leaf] = frame_visited.get(leaf, 0) | new_kinds
+                    new_kind_map[leaf] = new_kinds
+                    reached.setdefault(frame_id, {}).setdefault(leaf, []).append(
+                        (new_kinds, depth)
+                    )
+            if not new_kind_map:
+                continue
+
+            frame = graph.get_trace_frame_from_id(frame_id)
+            for next_frame in graph.get_next_trace_frames(frame):
+                if map_leaves:
+                    next_kind_map: KindMap = {}
+                    # pyre-fixme[16]: extra fields are not known to pyre
+                    leaf_mapping: Iterable[LeafMapping] = next_frame.leaf_mapping
+                    for leaf_map in leaf_mapping:
+                        kinds = new_kind_map.get(leaf_map.caller_leaf)
+                        if kinds:
+                            next_kind_map[leaf_map.callee_leaf] = (
+                                next_kind_map.get(leaf_map.callee_leaf, 0) | kinds
+                            )
+                    if not next_kind_map:
+                        continue
+                else:
+                    next_kind_map = new_kind_map
+                _merge(next_frontier, next_frame.id.local_id, next_kind_map)
+        frontier = next_frontier
+        depth += 1
+    return reached
+
+
+def _merge(frontier: Dict[FrameID, KindMap], frame_id: FrameID, kinds: KindMap) -> None:
+    kind_map = frontier.get(frame_id)
+    if kind_map is None:
+        frontier[frame_id] = dict(kinds)
+        return
+    for leaf, leaf_kinds in kinds.items():
+        kind_map[leaf] = kind_map.get(leaf, 0) | leaf_kinds
@@ -0,0 +1,276 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Set, Tuple
+from unittest import TestCase
+
+from sqlalchemy.orm import aliased
+
+from ...analysis_output import AnalysisOutput
+from ...db import DB, DBType
+from ...models import (
+    Issue,
+    IssueInstance,
+    IssueInstanceTraceFrameAssoc,
+    PrimaryKey,
+    PrimaryKeyGenerator,
+    Run,
+    RunStatisticKind,
+    RunStatistics,
+    SharedText,
+    TraceFrame,
+    TraceFrameLeafAssoc,
+    TraceKind,
+)
+from .. import Pipeline
+from ..create_database import CreateDatabase
+from ..database_saver import DatabaseSaver
+from ..incremental import CallableHashes, FindParentRun
+from ..model_generator import ModelGenerator
+from ..pysa_taint_parser import Parser
+from ..trim_trace_graph import TrimTraceGraph
+from .pysa_taint_parser_test import make_issue, make_output
+
+
+def make_model(callable: str, callee: Optional[str] = None, line: int = 7):
+    if callee is None:
+        taint = {"root": {"filename": "module.py", "line": line, "start": 1, "end": 2}}
+    else:
+        taint = {
+            "call": {
+                "position": {
+                    "filename": "module.py",
+                    "line": line,
+                    "start": 1,
+                    "end": 2,
+                },
+                "resolves_to": [callee],
+                "port": "formal(x)",
+                "length": 1,
+            }
+        }
+    taint["leaves"] = [{"kind": "RCE", "name": "eval"}]
+    return {
+        "kind": "model",
+        "data": {
+            "callable": callable,
+            "sources": [],
+            "sinks": [{"port": "formal(x)", "taint": [taint]}],
+        },
+    }
+
+
+def make_wrapped_issue(callable: str, code: int) -> Dict[str, Any]:
+    issue = make_issue(callable, code)
+    issue["data"]["traces"][1]["roots"][0]["call"]["resolves_to"] = ["module.wrapper"]
+    return issue
+
+
+Frame = Tuple[str, str, str, str, str]
+
+
+class IncrementalTest(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _analyze(
+        self, db: DB, entries: List[Dict[str, Any]], incremental: bool = True
+    ) -> Dict[str, Any]:
+        input_path = os.path.join(self.directory.name, "taint-output.json")
+        with open(input_path, "w") as f:
+            f.write(make_output(entries))
+        summary: Dict[str, Any] = {
+            "run_kind": "master",
+            "repository": "/repo",
+            "branch": "master",
+            "commit_hash": "abc",
+            "old_linemap_file": None,
+            "store_unused_models": False,
+            "job_id": None,
+            "incremental": incremental,
+        }
+        Pipeline(
+            [
+                Parser(),
+                CreateDatabase(db),
+                FindParentRun(db),
+                ModelGenerator(),
+                TrimTraceGraph(),
+                DatabaseSaver(db, primary_key_generator=PrimaryKeyGenerator()),
+            ]
+        ).run((AnalysisOutput.from_file(input_path), None), summary)
+        return summary
+
+    def _latest_run(
+        self, db: DB
+    ) -> Tuple[Set[Frame], Set[Tuple[Frame, str]], Set[Tuple[str, Frame]]]:
+        """Returns the trace frames, leaves and issue instance trace frames of the
+        latest run, by contents."""
+        CallerText = aliased(SharedText)
+        CalleeText = aliased(SharedText)
+        with db.make_session() as session:
+            run_id = session.query(Run.id).order_by(Run.id.desc()).limit(1).scalar()
+            frames = {
+                int(id): (caller, caller_port, callee, callee_port, str(kind))
+                for id, caller, caller_port, callee, callee_port, kind in session.query(
+                    TraceFrame.id,
+                    CallerText.contents,
+                    TraceFrame.caller_port,
+                    CalleeText.contents,
+                    TraceFrame.callee_port,
+                    TraceFrame.kind,
+                )
+                .join(CallerText, CallerText.id == TraceFrame.caller_id)
+                .join(CalleeText, CalleeText.id == TraceFrame.callee_id)
+                .filter(TraceFrame.run_id == run_id)
+            }
+            leaves = {
+                (frames[int(frame_id)], leaf)
+                for frame_id, leaf in session.query(
+                    TraceFrameLeafAssoc.trace_frame_id, SharedText.contents
+                )
+                .join(SharedText, SharedText.id == TraceFrameLeafAssoc.leaf_id)
+                .filter(TraceFrameLeafAssoc.trace_frame_id.in_(list(frames)))
+            }
+            instance_frames = {
+                (handle, frames[int(frame_id)])
+                for handle, frame_id in session.query(
+                    Issue.handle, IssueInstanceTraceFrameAssoc.trace_frame_id
+                )
+                .join(IssueInstance, IssueInstance.issue_id == Issue.id)
+                .join(
+                    IssueInstanceTraceFrameAssoc,
+                    IssueInstanceTraceFrameAssoc.issue_instance_id == IssueInstance.id,
+                )
+                .filter(IssueInstance.run_id == run_id)
+            }
+            self.assertEqual(
+                session.query(IssueInstance)
+                .filter(IssueInstance.run_id == run_id)
+                .count(),
+                len({handle for handle, _frame in instance_frames}),
+            )
+        return set(frames.values()), leaves, instance_frames
+
+    def test_matches_full_ingest(self) -> None:
+        db = DB(DBType.SQLITE, os.path.join(self.directory.name, "incremental.db"))
+        first = [
+            make_wrapped_issue("module.f0", 5000),
+            make_wrapped_issue("module.f1", 5001),
+            make_model("module.wrapper", callee="module.sink"),
+            make_model("module.sink"),
+        ]
+        summary = self._analyze(db, first)
+        self.assertNotIn("parent_run", summary)
+
+        # The sink moved and module.f2 is new, module.f0, module.f1 and
+        # module.wrapper are unchanged.
+        second = [
+            make_wrapped_issue("module.f0", 5000),
+            make_wrapped_issue("module.f1", 5001),
+            make_issue("module.f2", 5002),
+            make_model("module.wrapper", callee="module.sink"),
+            make_model("module.sink", line=8),
+        ]
+        summary = self._analyze(db, second)
+        parent_run = summary["parent_run"]
+        self.assertEqual(
+            parent_run.unchanged_callables,
+            {"module.f0", "module.f1", "module.wrapper"},
+        )
+        self.assertEqual(
+            parent_run.seeds, [(TraceKind.PRECONDITION, "module.sink", "formal(x)")]
+        )
+        incremental = self._latest_run(db)
+
+        full_db = DB(DBType.SQLITE, os.path.join(self.directory.name, "full.db"))
+        self._analyze(full_db, second, incremental=False)
+        full = self._latest_run(full_db)
+
+        self.assertEqual(incremental, full)
+        self.assertEqual(len(full[0]), 8)
+        self.assertEqual(len(full[2]), 6)
+        incremental_statistics = self._statistics(db)
+        full_statistics = self._statistics(full_db)
+        # Only module.f2 has a new issue, in the database of the previous run.
+        self.assertEqual(
+            incremental_statistics.pop((RunStatisticKind.new_issues, "")), 1
+        )
+        self.assertEqual(full_statistics.pop((RunStatisticKind.new_issues, "")), 3)
+        self.assertEqual(incremental_statistics, full_statistics)
+
+        # Everything is unchanged since the previous, incremental, run.
+        reserved_ids = self._reserved_ids(db)
+        summary = self._analyze(db, second)
+        self.assertEqual(len(summary["parent_run"].unchanged_callables), 5)
+        self.assertEqual(self._latest_run(db), full)
+        # Ids are only reserved for the copied rows, not for the span of ids of
+        # the parent run.
+        self.assertEqual(
+            self._reserved_ids(db) - reserved_ids,
+            len(full[0]) + len({handle for handle, _frame in full[2]}),
+        )
+
+    def _reserved_ids(self, db: DB) -> int:
+        with db.make_session() as session:
+            return sum(
+                current_id
+                for current_id, in session.query(PrimaryKey.current_id).filter(
+                    PrimaryKey.table_name.in_(["TraceFrame", "IssueInstance"])
+                )
+            )
+
+    def _statistics(self, db: DB) -> Dict[Tuple[RunStatisticKind, str], int]:
+        with db.make_session() as session:
+            run_id = session.query(Run.id).order_by(Run.id.desc()).limit(1).scalar()
+            return RunStatistics.get(session, [int(run_id)])[int(run_id)]
+
+    def test_statistics(self) -> None:
+        db = DB(DBType.SQLITE, os.path.join(self.directory.name, "statistics.db"))
+        self._analyze(
+            db,
+            [
+                make_issue("module.f0", 5000),
+                make_issue("module.f1", 5000),
+                make_issue("module.f2", 5001),
+            ],
+            incremental=False,
+        )
+        statistics = self._statistics(db)
+        self.assertEqual(statistics[(RunStatisticKind.total_issues, "")], 3)
+        self.assertEqual(statistics[(RunStatisticKind.new_issues, "")], 3)
+        self.assertEqual(statistics[(RunStatisticKind.code, "5000")], 2)
+        self.assertEqual(statistics[(RunStatisticKind.code, "5001")], 1)
+
+        # The statistics computed from the trace graph match the ones counted
+        # in the database.
+        with db.make_session() as session:
+            run = session.query(Run).one()
+            summary = run.get_summary()
+            self.assertEqual(summary.num_total_issues, 3)
+            self.assertEqual(summary.alarm_counts, {5000: 2, 5001: 1})
+            session.query(RunStatistics).delete()
+            RunStatistics.populate(session, int(run.id))
+            session.commit()
+        self.assertEqual(self._statistics(db), statistics)
+
+    def test_callable_hashes(self) -> None:
+        hashes = CallableHashes()
+        hashes.add("module.f", '{"a": 1}')
+        hashes.add("module.f", '{"b": 2}')
+        reordered = CallableHashes()
+        reordered.add("module.f", '{"b": 2}')
+        reordered.add("module.f", '{"a": 1}')
+        self.assertEqual(list(hashes.items()), list(reordered.items()))
+        self.assertNotEqual(hashes.get("module.f"), None)
+        self.assertEqual(hashes.get("module.g"), None)
+        self.assertTrue(
+            all(-(1 << 63) <= value < (1 << 63) for _, value in hashes.items())
+        )
@@ -0,0 +1,83 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from ...analysis_output import AnalysisOutput
+from ..base_parser import ParseType
+from ..offset_index import LazyConditions, OffsetIndex
+from ..pysa_taint_parser import Parser
+from .pysa_taint_parser_test import make_issue, make_model, make_output
+
+
+class OffsetIndexTest(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "taint-output.json")
+        self._write_output(["module.sink", "module.other_sink"])
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _write_output(self, sinks) -> None:
+        entries = [make_issue("module.first", 5001)]
+        entries.extend(make_model(sink) for sink in sinks)
+        with open(self.path, "w") as f:
+            f.write(make_output(entries))
+
+    def _index_files(self):
+        return [
+            name
+            for name in os.listdir(self.directory.name)
+            if name.startswith(".sapp-offsets-")
+        ]
+
+    def test_lazy_matches_eager(self) -> None:
+        input = AnalysisOutput.from_file(self.path)
+        eager = Parser().analysis_output_to_dict_entries(input, None, None, None)
+        lazy = Parser().analysis_output_to_dict_entries(
+            input, None, None, None, use_offset_index=True
+        )
+
+        self.assertIsInstance(lazy["preconditions"], LazyConditions)
+        self.assertEqual(lazy["issues"], eager["issues"])
+        self.assertEqual(
+            dict(lazy["preconditions"].items()), dict(eager["preconditions"])
+        )
+        self.assertEqual(len(lazy["postconditions"]), 0)
+
+        key = ("module.sink", "formal(x)")
+        self.assertIn(key, lazy["preconditions"])
+        self.assertEqual(lazy["preconditions"].pop(key), eager["preconditions"][key])
+        self.assertNotIn(key, lazy["preconditions"])
+        self.assertEqual(lazy["preconditions"].pop(key, []), [])
+
+    def test_index_is_reused(self) -> None:
+        input = AnalysisOutput.from_file(self.path)
+        OffsetIndex.from_analysis_output(Parser(), input)
+        self.assertEqual(len(self._index_files()), 1)
+
+        with patch.object(Parser, "get_condition_offsets") as get_condition_offsets:
+            index = OffsetIndex.from_analysis_output(Parser(), input)
+            get_condition_offsets.assert_not_called()
+        self.assertEqual(
+            set(index.positions[ParseType.PRECONDITION.value]),
+            {("module.sink", "formal(x)"), ("module.other_sink", "formal(x)")},
+        )
+
+    def test_index_is_rebuilt_when_output_changes(self) -> None:
+        input = AnalysisOutput.from_file(self.path)
+        OffsetIndex.from_analysis_output(Parser(), input)
+
+        self._write_output(["module.new_sink"])
+        index = OffsetIndex.from_analysis_output(Parser(), input)
+        self.assertEqual(
+            set(index.positions[ParseType.PRECONDITION.value]),
+            {("module.new_sink", "formal(x)")},
+        )
+        self.assertEqual(len(self._index_files()), 1)
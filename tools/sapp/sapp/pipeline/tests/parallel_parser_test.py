@@ -0,0 +1,61 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import tempfile
+from unittest import TestCase
+
+from ...analysis_output import AnalysisOutput
+from ..base_parser import ParseType
+from ..parallel_parser import ParallelParser
+from ..pysa_taint_parser import Parser
+from .pysa_taint_parser_test import make_issue, make_model, make_output
+
+
+class ParallelParserTest(TestCase):
+    def setUp(self) -> None:
+        entries = []
+        for i in range(20):
+            entries.append(make_issue(f"module.f{i}", 5000 + i))
+            entries.append(make_model(f"module.sink{i}"))
+        self.output_file = tempfile.NamedTemporaryFile("w", suffix=".json")
+        self.output_file.write(make_output(entries))
+        self.output_file.flush()
+        self.input = AnalysisOutput.from_file(self.output_file.name)
+
+    def tearDown(self) -> None:
+        self.output_file.close()
+
+    def test_split_file(self) -> None:
+        parser = ParallelParser(Parser, chunk_size=1000)
+        chunks = list(parser._split_file(self.output_file.name))
+        self.assertGreater(len(chunks), 1)
+
+        with open(self.output_file.name, "rb") as handle:
+            contents = handle.read()
+        # Chunks cover everything after the header, and break on lines.
+        self.assertEqual(chunks[0].start, contents.index(b"\n") + 1)
+        self.assertEqual(chunks[-1].end, len(contents))
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(previous.end, chunk.start)
+            self.assertEqual(contents[chunk.start - 1 : chunk.start], b"\n")
+
+    def test_matches_serial_parse(self) -> None:
+        expected = list(Parser().parse(self.input))
+
+        parser = ParallelParser(Parser, processes=2, chunk_size=1000, ordered=True)
+        self.assertEqual(list(parser.parse(self.input)), expected)
+
+        parser = ParallelParser(Parser, processes=2, chunk_size=1000)
+        self.assertCountEqual(list(parser.parse(self.input)), expected)
+
+    def test_codes_to_keep(self) -> None:
+        parser = ParallelParser(Parser, processes=2, chunk_size=1000)
+        parser.codes_to_keep = {5003, 5011}
+        issues = [
+            entry["callable"]
+            for entry in parser.parse(self.input)
+            if entry["type"] == ParseType.ISSUE
+        ]
+        self.assertCountEqual(issues, ["module.f3", "module.f11"])
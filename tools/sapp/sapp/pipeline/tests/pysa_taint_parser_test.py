@@ -0,0 +1,176 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import io
+import os
+import tempfile
+from typing import Any, Dict, List
+from unittest import TestCase
+from unittest.mock import patch
+
+import ujson as json
+
+from ...analysis_output import AnalysisOutput
+from ..base_parser import ParseType
+from ..offset_index import LazyConditions
+from ..pysa_taint_parser import Parser
+
+
+def make_issue(callable: str, code: int) -> Dict[str, Any]:
+    return {
+        "kind": "issue",
+        "data": {
+            "callable": callable,
+            "callable_line": 1,
+            "code": code,
+            "line": 2,
+            "start": 3,
+            "end": 4,
+            "filename": "module.py",
+            "message": "[UserControlled] to [RCE]",
+            "traces": [
+                {
+                    "name": "forward",
+                    "roots": [
+                        {
+                            "root": {
+                                "filename": "module.py",
+                                "line": 2,
+                                "start": 3,
+                                "end": 4,
+                            },
+                            "leaves": [{"kind": "UserControlled", "name": "source"}],
+                        }
+                    ],
+                },
+                {
+                    "name": "backward",
+                    "roots": [
+                        {
+                            "call": {
+                                "position": {
+                                    "filename": "module.py",
+                                    "line": 2,
+                                    "start": 3,
+                                    "end": 4,
+                                },
+                                "resolves_to": ["module.sink"],
+                                "port": "formal(x)",
+                                "length": 1,
+                            },
+                            "leaves": [{"kind": "RCE", "name": "eval"}],
+                        }
+                    ],
+                },
+            ],
+            "features": [],
+        },
+    }
+
+
+def make_model(callable: str) -> Dict[str, Any]:
+    return {
+        "kind": "model",
+        "data": {
+            "callable": callable,
+            "sources": [],
+            "sinks": [
+                {
+                    "port": "formal(x)",
+                    "taint": [
+                        {
+                            "root": {
+                                "filename": "module.py",
+                                "line": 7,
+                                "start": 1,
+                                "end": 2,
+                            },
+                            "leaves": [{"kind": "RCE", "name": "eval"}],
+                        }
+                    ],
+                }
+            ],
+        },
+    }
+
+
+def make_output(entries: List[Dict[str, Any]]) -> str:
+    lines = [json.dumps({"file_version": 2, "config": {}})]
+    lines.extend(json.dumps(entry) for entry in entries)
+    return "\n".join(lines) + "\n"
+
+
+class PysaTaintParserTest(TestCase):
+    def setUp(self) -> None:
+        self.output = make_output(
+            [
+                make_issue("module.first", 5001),
+                make_model("module.sink"),
+                make_issue("module.second", 5002),
+            ]
+        )
+
+    def _analysis_output(self) -> AnalysisOutput:
+        return AnalysisOutput.from_handle(io.StringIO(self.output))
+
+    def test_parse_by_types(self) -> None:
+        entries = list(
+            Parser().parse_by_types(self._analysis_output(), {ParseType.ISSUE})
+        )
+        self.assertEqual(
+            [entry["callable"] for entry in entries], ["module.first", "module.second"]
+        )
+
+        entries = list(
+            Parser().parse_by_types(self._analysis_output(), {ParseType.PRECONDITION})
+        )
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]["caller"], "module.sink")
+        self.assertEqual(entries[0]["caller_port"], "formal(x)")
+
+    def test_streaming_matches_eager(self) -> None:
+        eager = Parser().analysis_output_to_dict_entries(
+            self._analysis_output(), None, None, None
+        )
+
+        # Streaming reads the input twice, so it needs to come from a file. The
+        # offset index is written next to it.
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "taint-output.json")
+            with open(path, "w") as output_file:
+                output_file.write(self.output)
+            streamed = Parser().analysis_output_to_dict_entries(
+                AnalysisOutput.from_file(path),
+                None,
+                None,
+                None,
+                streaming=True,
+            )
+            # Streaming reads the conditions through the offset index.
+            self.assertIsInstance(streamed["preconditions"], LazyConditions)
+            self.assertEqual(
+                dict(streamed["preconditions"].items()), dict(eager["preconditions"])
+            )
+            self.assertEqual(
+                dict(streamed["postconditions"].items()),
+                dict(eager["postconditions"]),
+            )
+            self.assertEqual(list(streamed["issues"]), eager["issues"])
+
+    def test_codes_to_keep(self) -> None:
+        parser = Parser()
+        with patch.object(
+            Parser, "_parse_issue_traces", wraps=parser._parse_issue_traces
+        ) as parse_issue_traces:
+            entries, _summary = parser.run(
+                (self._analysis_output(), None),
+                {"codes_to_keep": {5002}},
+            )
+            self.assertEqual(
+                [issue["callable"] for issue in entries["issues"]], ["module.second"]
+            )
+            # Only the traces of the kept issue are parsed.
+            self.assertEqual(parse_issue_traces.call_count, 2)
+        self.assertIn(("module.sink", "formal(x)"), entries["preconditions"])
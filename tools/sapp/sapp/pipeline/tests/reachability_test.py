@@ -0,0 +1,114 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from typing import Set, Tuple
+from unittest import TestCase
+
+from ...models import SharedTextKind, TraceFrame
+from ...tests.fake_object_generator import FakeObjectGenerator
+from ...trace_graph import TraceGraph
+from ..add_issue_instance_leaves import AddIssueInstanceLeaves
+from ..propagate_source_kinds_to_sinks import PropagateSourceKindsToSinks
+from ..reachability import KindBits, propagate_kinds
+
+
+class ReachabilityTest(TestCase):
+    def setUp(self) -> None:
+        self.graph = TraceGraph()
+        fakes = FakeObjectGenerator(graph=self.graph)
+        fakes.run()
+        source = fakes.source("source1")
+        sink = fakes.sink("sink1")
+        issue = fakes.issue(code=5000)
+        instance = fakes.instance(issue_id=issue.id, callable="module.call")
+        self.post = fakes.postcondition(
+            caller="module.call",
+            caller_port="root",
+            callee="leaf",
+            callee_port="source",
+            leaves=[(source, 0)],
+        )
+        # module.call -> module.a -> module.b -> sink, and module.call -> module.b
+        self.pre_a = fakes.precondition(
+            caller="module.call",
+            caller_port="root",
+            callee="module.a",
+            callee_port="formal(x)",
+            leaves=[(sink, 2)],
+        )
+        self.pre_b = fakes.precondition(
+            caller="module.a",
+            caller_port="formal(x)",
+            callee="module.b",
+            callee_port="formal(y)",
+            leaves=[(sink, 1)],
+        )
+        self.pre_sink = fakes.precondition(
+            caller="module.b",
+            caller_port="formal(y)",
+            callee="leaf",
+            callee_port="sink",
+            leaves=[(sink, 0)],
+        )
+        self.pre_shortcut = fakes.precondition(
+            caller="module.call",
+            caller_port="root",
+            callee="module.b",
+            callee_port="formal(y)",
+            leaves=[(sink, 1)],
+        )
+        for frame in [self.post, self.pre_a, self.pre_shortcut]:
+            self.graph.add_issue_instance_trace_frame_assoc(instance, frame)
+        self.source = source
+        self.sink = sink
+
+    def _leaves(self, frame: TraceFrame) -> Set[Tuple[str, int]]:
+        return {
+            (self.graph.get_shared_text_by_local_id(leaf_id).contents, depth)
+            for leaf_id, depth in self.graph.get_trace_frame_leaf_ids_with_depths(frame)
+        }
+
+    def test_propagate_source_kinds_to_sinks(self) -> None:
+        PropagateSourceKindsToSinks().run(self.graph, {})
+        self.assertEqual(self._leaves(self.pre_a), {("sink1", 2), ("source1", 0)})
+        self.assertEqual(self._leaves(self.pre_b), {("sink1", 1), ("source1", 1)})
+        self.assertEqual(self._leaves(self.pre_sink), {("sink1", 0), ("source1", 1)})
+        self.assertEqual(self._leaves(self.post), {("source1", 0)})
+
+    def test_add_issue_instance_leaves(self) -> None:
+        AddIssueInstanceLeaves(5000, "issue", SharedTextKind.SOURCE).run(self.graph, {})
+        self.assertEqual(self._leaves(self.post), {("source1", 0), ("issue", 0)})
+        self.assertEqual(self._leaves(self.pre_b), {("sink1", 1), ("issue", 1)})
+        self.assertEqual(self._leaves(self.pre_sink), {("sink1", 0), ("issue", 1)})
+
+    def test_propagate_kinds(self) -> None:
+        bits = KindBits()
+        kinds = bits.encode([10, 20, 30])
+        self.assertEqual(sorted(bits.decode(kinds)), [10, 20, 30])
+        self.assertEqual(list(bits.decode(bits.encode([20]))), [20])
+
+        sink_id = self.sink.id.local_id
+        reached = propagate_kinds(
+            self.graph,
+            {
+                self.pre_a.id.local_id: {sink_id: bits.encode([10])},
+                self.pre_shortcut.id.local_id: {sink_id: bits.encode([20])},
+            },
+        )
+        self.assertEqual(
+            {
+                frame_id: [
+                    (sorted(bits.decode(kinds)), depth)
+                    for kinds, depth in reached[frame_id][sink_id]
+                ]
+                for frame_id in reached
+            },
+            {
+                self.pre_a.id.local_id: [([10], 0)],
+                self.pre_shortcut.id.local_id: [([20], 0)],
+                self.pre_b.id.local_id: [([10], 1)],
+                self.pre_sink.id.local_id: [([20], 1), ([10], 2)],
+            },
+        )
@@ -20,3 +20,15 @@ class TestWarningCodeFilter(TestCase):
 
         self.assertEqual(len(output["issues"]), 1)
         self.assertEqual(output["issues"][0], {"code": 6000})
+
+    # pyre-fixme[3]: Return type must be annotated.
+    def test_filter_codes_streaming(self):
+        dict_entries = {
+            "issues": iter([{"code": 6000}, {"code": 6001}, {"code": 6002}])
+        }
+        output, _ = Pipeline([self.warning_code_filter]).run(
+            dict_entries, {"streaming": True}
+        )
+
+        self.assertNotIsInstance(output["issues"], list)
+        self.assertEqual(list(output["issues"]), [{"code": 6000}])
@@ -17,6 +17,13 @@ class WarningCodeFilter(PipelineStep[DictEntries, DictEntries]):
         return issue["code"] not in self.codes_to_keep
 
     def run(self, input: DictEntries, summary: Summary) -> Tuple[DictEntries, Summary]:
+        if summary.get("streaming"):
+            # Keep the issues lazy so they are filtered as they are parsed.
+            input["issues"] = (
+                issue for issue in input["issues"] if not self._should_skip_issue(issue)
+            )
+            return input, summary
+
         filtered_issues = []
         for issue in input["issues"]:
             if self._should_skip_issue(issue):
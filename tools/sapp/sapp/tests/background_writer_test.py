@@ -0,0 +1,153 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import tempfile
+from typing import Any, Dict, Tuple
+from unittest import TestCase
+
+from ..analysis_output import AnalysisOutput
+from ..background_writer import BackgroundWriter
+from ..compact_trace_graph import CompactTraceGraph
+from ..db import DB, DBType
+from ..models import (
+    IssueInstance,
+    IssueInstanceTraceFrameAssoc,
+    PrimaryKeyGenerator,
+    Run,
+    SharedText,
+    TraceFrame,
+    TraceFrameLeafAssoc,
+)
+from ..pipeline import Pipeline
+from ..pipeline.create_database import CreateDatabase
+from ..pipeline.database_saver import DatabaseSaver
+from ..pipeline.model_generator import ModelGenerator
+from ..pipeline.pysa_taint_parser import Parser
+from ..pipeline.tests.pysa_taint_parser_test import (
+    make_issue,
+    make_model,
+    make_output,
+)
+from ..pipeline.trim_trace_graph import TrimTraceGraph
+from ..trace_graph import TraceGraph
+from .fake_object_generator import FakeObjectGenerator
+
+
+class BackgroundWriterTest(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.directory.name, "taint-output.json")
+        entries = [make_issue(f"module.f{i % 7}", 5000 + i % 3) for i in range(30)]
+        entries.append(make_model("module.sink"))
+        with open(self.input_path, "w") as f:
+            f.write(make_output(entries))
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _analyze(
+        self, name: str, dbtype: str, pipelined: bool, **options: Any
+    ) -> Tuple[int, ...]:
+        db = DB(dbtype, os.path.join(self.directory.name, name), assertions=True)
+        summary: Dict[str, Any] = {
+            "run_kind": "master",
+            "repository": "/repo",
+            "branch": "master",
+            "commit_hash": "abc",
+            "old_linemap_file": None,
+            "store_unused_models": False,
+            "job_id": None,
+            **options,
+        }
+        if pipelined:
+            summary["background_writer"] = BackgroundWriter(db, PrimaryKeyGenerator())
+        Pipeline(
+            [
+                Parser(),
+                CreateDatabase(db),
+                ModelGenerator(),
+                TrimTraceGraph(),
+                DatabaseSaver(db, primary_key_generator=PrimaryKeyGenerator()),
+            ]
+        ).run((AnalysisOutput.from_file(self.input_path), None), summary)
+
+        with db.make_session() as session:
+            (run_id,) = [int(run.id) for run in session.query(Run)]
+            self.assertLessEqual(
+                {int(frame.run_id) for frame in session.query(TraceFrame)}, {run_id}
+            )
+            return tuple(
+                session.query(cls).count()
+                for cls in [
+                    IssueInstance,
+                    TraceFrame,
+                    SharedText,
+                    TraceFrameLeafAssoc,
+                    IssueInstanceTraceFrameAssoc,
+                ]
+            )
+
+    def test_matches_unpipelined_save(self) -> None:
+        expected = self._analyze("expected.db", DBType.SQLITE, pipelined=False)
+        self.assertEqual(
+            self._analyze("sqlite.db", DBType.SQLITE, pipelined=True), expected
+        )
+        self.assertEqual(
+            self._analyze("memory.db", DBType.MEMORY, pipelined=True), expected
+        )
+        self.assertEqual(
+            self._analyze(
+                "streaming.db", DBType.SQLITE, pipelined=True, streaming=True
+            ),
+            expected,
+        )
+        self.assertEqual(
+            self._analyze(
+                "trimmed.db",
+                DBType.SQLITE,
+                pipelined=True,
+                affected_files=["module.py"],
+            ),
+            expected,
+        )
+        # The shared texts of trace frames dropped by trimming aren't saved.
+        self.assertEqual(
+            self._analyze(
+                "trimmed_other.db",
+                DBType.SQLITE,
+                pipelined=True,
+                affected_files=["other.py"],
+            ),
+            self._analyze(
+                "trimmed_other_expected.db",
+                DBType.SQLITE,
+                pipelined=False,
+                affected_files=["other.py"],
+            ),
+        )
+
+    def test_new_items(self) -> None:
+        for graph in [TraceGraph(), CompactTraceGraph()]:
+            fakes = FakeObjectGenerator(graph=graph)
+            fakes.run()
+            source = fakes.source("source1")
+            # Nothing is recorded until tracking starts, and the items that are
+            # in the graph by then are new.
+            self.assertEqual(graph.take_new_shared_texts(), [])
+            graph.track_new_items()
+            self.assertEqual(graph.take_new_shared_texts(), [source])
+            self.assertEqual(graph.take_new_shared_texts(), [])
+
+            frame = fakes.postcondition(caller="module.f", callee="module.g")
+            self.assertEqual(
+                [frame.id.local_id for frame in graph.take_new_trace_frames()],
+                [frame.id.local_id],
+            )
+            self.assertEqual(
+                sorted(text.contents for text in graph.take_new_shared_texts()),
+                sorted(["lib/server/posts/response.py", "module.f", "module.g"]),
+            )
+            self.assertEqual(graph.take_new_trace_frames(), [])
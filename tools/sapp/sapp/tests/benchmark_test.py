@@ -0,0 +1,70 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import sys
+import tempfile
+from unittest import TestCase
+
+from ..benchmark import BenchmarkConfig, generate_output, run_benchmark
+from ..db import DB, DBType
+from ..models import Issue, TraceFrame
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def testGenerateShardedOutput(self) -> None:
+        config = BenchmarkConfig(issues=5, models=6, trace_depth=3, shards=2)
+        output = generate_output(config, self.directory.name)
+        self.assertEqual(len(list(output.file_names())), 2)
+        self.assertTrue(output.is_sharded())
+        # The header, then every other one of the 5 issues and 6 models.
+        line_counts = []
+        for file_name in sorted(output.file_names()):
+            with open(file_name) as f:
+                line_counts.append(len(f.readlines()))
+        self.assertEqual(line_counts, [7, 6])
+
+    def testRunBenchmark(self) -> None:
+        config = BenchmarkConfig(
+            issues=10,
+            models=12,
+            trace_depth=3,
+            fan_out=2,
+            shards=2,
+            codes=4,
+            files=3,
+            codes_to_keep={5000, 5001},
+        )
+        report = run_benchmark(config, self.directory.name)
+        self.assertEqual(
+            [step["name"] for step in report["steps"]],
+            [
+                "Parser",
+                "WarningCodeFilter",
+                "CreateDatabase",
+                "ModelGenerator",
+                "TrimTraceGraph",
+                "DatabaseSaver",
+            ],
+        )
+        self.assertEqual(report["config"]["codes_to_keep"], [5000, 5001])
+        if sys.platform == "linux":
+            self.assertTrue(report["per_step_peak_rss"])
+        for step in report["steps"]:
+            self.assertGreaterEqual(step["wall_time"], 0.0)
+            self.assertGreater(step["peak_rss_kb"], 0)
+            self.assertGreater(step["rows"], 0)
+
+        database = DB(DBType.SQLITE, os.path.join(self.directory.name, "sapp.db"))
+        with database.make_session() as session:
+            # Issues 0, 1, 4, 5, 8 and 9 have the kept codes.
+            self.assertEqual(session.query(Issue).count(), 6)
+            self.assertGreater(session.query(TraceFrame).count(), 0)
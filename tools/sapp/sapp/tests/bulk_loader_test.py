@@ -0,0 +1,82 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import tempfile
+from unittest import TestCase
+
+from ..bulk_loader import BulkLoader, SQLiteBulkLoader, loader_for
+from ..bulk_saver import BulkSaver
+from ..db import DB, DBType
+from ..models import (
+    IssueInstance,
+    IssueInstanceSharedTextAssoc,
+    SharedText,
+    create as create_models,
+)
+from .fake_object_generator import FakeObjectGenerator
+
+
+class BulkLoaderTest(TestCase):
+    def _save(self, db: DB, loader: BulkLoader) -> None:
+        fakes = FakeObjectGenerator()
+        fakes.saver = BulkSaver(loader=loader)
+        fakes.run()
+        for i in range(3):
+            issue = fakes.issue(code=6000 + i)
+            instance = fakes.instance(issue_id=issue.id, callable=f"module.f{i}")
+            fakes.saver.add_issue_instance_shared_text_assoc(
+                instance, fakes.source(f"source{i}")
+            )
+        fakes.save_all(db)
+
+    def _assert_saved(self, db: DB) -> None:
+        with db.make_session() as session:
+            self.assertEqual(session.query(IssueInstance).count(), 3)
+            self.assertEqual(session.query(IssueInstanceSharedTextAssoc).count(), 3)
+            sources = {
+                text.contents
+                for text in session.query(SharedText).join(
+                    IssueInstanceSharedTextAssoc,
+                    IssueInstanceSharedTextAssoc.shared_text_id == SharedText.id,
+                )
+            }
+        self.assertEqual(sources, {"source0", "source1", "source2"})
+
+    def test_loaders(self) -> None:
+        for loader in [BulkLoader(), SQLiteBulkLoader()]:
+            db = DB(DBType.MEMORY)
+            create_models(db)
+            self._save(db, loader)
+            self._assert_saved(db)
+
+    def test_sqlite_uses_wal(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            db = DB(DBType.SQLITE, os.path.join(directory, "sapp.db"))
+            create_models(db)
+            loader = loader_for(db)
+            self.assertIsInstance(loader, SQLiteBulkLoader)
+
+            self._save(db, loader)
+            self._assert_saved(db)
+            with db.make_session() as session:
+                self.assertEqual(session.execute("PRAGMA journal_mode").scalar(), "wal")
+
+    def test_batch_size(self) -> None:
+        loader = BulkLoader()
+        self.assertEqual(loader.batch_size(3), BulkLoader.MAX_BATCH_SIZE)
+        self.assertEqual(loader.batch_size(100), BulkLoader.BATCH_VALUES // 100)
+        self.assertGreater(loader.batch_size(3), loader.batch_size(20))
+
+    def test_group_by_keys(self) -> None:
+        rows = [{"a": 1}, {"a": 2, "b": 1}, {"a": 3}, {"a": 4, "b": 2}]
+        self.assertEqual(
+            list(BulkLoader._group_by_keys(rows)),
+            [
+                (("a",), [{"a": 1}, {"a": 3}]),
+                (("a", "b"), [{"a": 2, "b": 1}, {"a": 4, "b": 2}]),
+            ],
+        )
+        self.assertEqual(rows, [])
@@ -0,0 +1,148 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from typing import Set, Tuple
+from unittest import TestCase
+
+from ..bulk_saver import BulkSaver
+from ..compact_trace_graph import CompactTraceGraph, IntSetMap, LeafAssoc
+from ..models import SharedTextKind, TraceFrame, TraceFrameLeafAssoc, TraceKind
+from ..trace_graph import TraceGraph
+from ..trimmed_trace_graph import TrimmedTraceGraph
+from .fake_object_generator import FakeObjectGenerator
+
+
+class CompactTraceGraphTest(TestCase):
+    def _populate(self, graph: TraceGraph) -> None:
+        fakes = FakeObjectGenerator(graph=graph)
+        fakes.run()
+        source = fakes.source("source1")
+        sink = fakes.sink("sink1")
+        issue = fakes.issue()
+        instance = fakes.instance(
+            issue_id=issue.id, filename="module.py", callable="module.call"
+        )
+        post = fakes.postcondition(
+            caller="module.call",
+            caller_port="root",
+            callee="module.source",
+            callee_port="result",
+            filename="module.py",
+            leaves=[(source, 1)],
+        )
+        leaf_post = fakes.postcondition(
+            caller="module.source",
+            caller_port="result",
+            callee="leaf",
+            callee_port="source",
+            filename="other.py",
+            leaves=[(source, 0)],
+        )
+        pre = fakes.precondition(
+            caller="module.call",
+            caller_port="root",
+            callee="module.sink",
+            callee_port="formal(x)",
+            filename="module.py",
+            leaves=[(sink, 1)],
+        )
+        graph.add_issue_instance_trace_frame_assoc(instance, post)
+        graph.add_issue_instance_trace_frame_assoc(instance, pre)
+        graph.add_issue_instance_shared_text_assoc(instance, source)
+        graph.add_issue_instance_shared_text_assoc(instance, sink)
+        self.frames = (post, leaf_post, pre)
+        self.instance = instance
+
+    def _leaves(self, graph: TraceGraph, frame: TraceFrame) -> Set[Tuple[str, int]]:
+        return {
+            (graph.get_shared_text_by_local_id(leaf_id).contents, depth)
+            for leaf_id, depth in graph.get_trace_frame_leaf_ids_with_depths(frame)
+        }
+
+    def test_matches_trace_graph(self) -> None:
+        graph = TraceGraph()
+        self._populate(graph)
+        graph_leaf_post = self.frames[1]
+        compact = CompactTraceGraph()
+        self._populate(compact)
+        post, leaf_post, pre = self.frames
+
+        self.assertEqual(
+            [frame.id.local_id for frame in compact.get_next_trace_frames(post)],
+            [leaf_post.id.local_id],
+        )
+        self.assertTrue(
+            compact.has_postconditions_with_caller(post.caller_id, post.caller_port)
+        )
+        self.assertFalse(
+            compact.has_preconditions_with_caller(post.caller_id, "unknown port")
+        )
+        self.assertEqual(
+            self._leaves(compact, leaf_post), self._leaves(graph, graph_leaf_post)
+        )
+        self.assertEqual(
+            [
+                text.contents
+                for text in compact.get_issue_instance_shared_texts(
+                    self.instance.id.local_id, SharedTextKind.SINK
+                )
+            ],
+            ["sink1"],
+        )
+        self.assertEqual(
+            {
+                frame.id
+                for frame in compact.get_issue_instance_trace_frames(self.instance)
+            },
+            {post.id, pre.id},
+        )
+
+        saver, compact_saver = BulkSaver(), BulkSaver()
+        graph.update_bulk_saver(saver)
+        compact.update_bulk_saver(compact_saver)
+        self.assertEqual(
+            len(compact_saver.get_items_to_add(TraceFrameLeafAssoc)),
+            len(saver.get_items_to_add(TraceFrameLeafAssoc)),
+        )
+
+    def test_trim_compact_graph(self) -> None:
+        compact = CompactTraceGraph()
+        self._populate(compact)
+
+        trimmed = TrimmedTraceGraph(["other.py"])
+        trimmed.populate_from_trace_graph(compact)
+        self.assertEqual(len(trimmed._issue_instances), 1)
+        self.assertEqual(
+            {frame.kind for frame in trimmed._trace_frames.values()},
+            {TraceKind.POSTCONDITION, TraceKind.PRECONDITION},
+        )
+
+    def test_int_set_map(self) -> None:
+        ids = IntSetMap()
+        ids.add(1, 10)
+        ids.add(1, 10)
+        self.assertEqual(ids[1], {10})
+        ids.add(1, 11)
+        ids.add(1, 10)
+        self.assertEqual(ids[1], {10, 11})
+        self.assertEqual(ids[2], set())
+        self.assertNotIn(2, ids)
+        self.assertEqual(dict(ids.items()), {1: {10, 11}})
+
+    def test_leaf_assoc(self) -> None:
+        leaves = LeafAssoc()
+        leaves.add(1, (5, 0))
+        leaves.add(1, (5, 0))
+        leaves.add(1, (6, 2))
+        self.assertEqual(leaves[1], {(5, 0), (6, 2)})
+        # Leaves added to a trace frame again, after another one.
+        leaves.add(3, (5, 0))
+        leaves.add(1, (6, 2))
+        leaves.add(1, (7, 1))
+        self.assertEqual(leaves[1], {(5, 0), (6, 2), (7, 1)})
+        self.assertEqual(len(leaves._leaves[1]), 6)
+        self.assertEqual(leaves[3], {(5, 0)})
+        self.assertEqual(leaves[2], set())
+        self.assertEqual(list(leaves), [1, 3])
@@ -0,0 +1,104 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import tempfile
+from typing import Dict, List, Optional
+from unittest import TestCase
+
+from sqlalchemy import event
+
+from ..bulk_saver import BulkSaver
+from ..db import DB, DBType
+from ..db_support import BATCH_SIZE, DBID
+from ..merge_cache import MergeCache
+from ..models import SharedText, SharedTextKind, create as create_models
+
+
+class MergeTest(TestCase):
+    def setUp(self) -> None:
+        self.db = DB(DBType.MEMORY)
+        create_models(self.db)
+
+    def _save(
+        self, db: DB, names: List[str], merge_cache: Optional[MergeCache] = None
+    ) -> List[SharedText]:
+        texts = [
+            SharedText.Record(id=DBID(), contents=name, kind=SharedTextKind.SOURCE)
+            for name in names
+        ]
+        saver = BulkSaver(merge_cache=merge_cache)
+        saver.add_all(texts)
+        saver.save_all(db)
+        return texts
+
+    def _saved_ids(self, db: DB) -> Dict[str, int]:
+        with db.make_session() as session:
+            return {text.contents: int(text.id) for text in session.query(SharedText)}
+
+    def test_merge_with_temporary_table(self) -> None:
+        names = [f"source{i}" for i in range(BATCH_SIZE * 2)]
+        self._save(self.db, names)
+        saved_ids = self._saved_ids(self.db)
+
+        texts = self._save(self.db, names + ["new", "new"])
+        self.assertEqual(len(self._saved_ids(self.db)), len(names) + 1)
+        for text in texts[: len(names)]:
+            self.assertFalse(text.id.is_new)
+            self.assertEqual(text.id.resolved(), saved_ids[text.contents])
+        self.assertEqual(texts[-1].id.resolved(), texts[-2].id.resolved())
+
+    def test_temporary_table_is_not_dropped(self) -> None:
+        names = [f"source{i}" for i in range(BATCH_SIZE * 2)]
+        statements: List[str] = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(self.db.engine, "before_cursor_execute", record)
+        try:
+            self._save(self.db, names)
+            self._save(self.db, names)
+        finally:
+            event.remove(self.db.engine, "before_cursor_execute", record)
+        self.assertTrue(
+            any("merge_keys_messages" in statement for statement in statements)
+        )
+        # Dropping a table commits the transaction of the saver on MySQL.
+        self.assertFalse(
+            any(statement.lstrip().startswith("DROP") for statement in statements)
+        )
+
+    def test_merge_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "merge-cache.db")
+            self._save(self.db, ["a", "b"], MergeCache(path))
+            saved_ids = self._saved_ids(self.db)
+
+            # A new cache over the same file, as in a later run.
+            merge_cache = MergeCache(path)
+            with self.db.make_session() as session:
+                self.assertEqual(
+                    merge_cache.lookup(
+                        session,
+                        SharedText,
+                        lambda item: "%s:%s" % (item.contents, item.kind),
+                        [SharedText.contents, SharedText.kind],
+                        ["a:SharedTextKind.source", "c:SharedTextKind.source"],
+                    ),
+                    {"a:SharedTextKind.source": saved_ids["a"]},
+                )
+            texts = self._save(self.db, ["a", "c"], merge_cache)
+            self.assertEqual(texts[0].id.resolved(), saved_ids["a"])
+            self.assertEqual(set(self._saved_ids(self.db)), {"a", "b", "c"})
+
+            # The cache doesn't match a different database.
+            other_db = DB(DBType.SQLITE, os.path.join(directory, "other.db"))
+            create_models(other_db)
+            self._save(other_db, ["x"])
+            texts = self._save(other_db, ["a", "x"], MergeCache(path))
+            other_ids = self._saved_ids(other_db)
+            self.assertEqual(set(other_ids), {"a", "x"})
+            self.assertEqual(texts[0].id.resolved(), other_ids["a"])
@@ -0,0 +1,25 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from unittest import TestCase
+
+from ..trimmed_trace_graph import PrefixMatcher
+
+
+class PrefixMatcherTest(TestCase):
+    def test_matches(self) -> None:
+        matcher = PrefixMatcher(["lib/", "lib/a.py", "src/b", "src/b.py", "z.py"])
+        self.assertTrue(matcher.matches("lib/a.py"))
+        self.assertTrue(matcher.matches("lib/c/d.py"))
+        self.assertTrue(matcher.matches("src/b.py"))
+        self.assertTrue(matcher.matches("src/bb.py"))
+        self.assertTrue(matcher.matches("z.py"))
+        self.assertFalse(matcher.matches("li"))
+        self.assertFalse(matcher.matches("src/a.py"))
+        self.assertFalse(matcher.matches("src/c.py"))
+        self.assertFalse(matcher.matches("a.py"))
+        self.assertFalse(matcher.matches("zz.py"))
+        self.assertFalse(PrefixMatcher([]).matches("a.py"))
+        self.assertTrue(PrefixMatcher([""]).matches("a.py"))
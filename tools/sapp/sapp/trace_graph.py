@@ -93,6 +93,11 @@ class TraceGraph(object):
 
         self._issue_instance_fix_info: Dict[int, IssueInstanceFixInfo] = {}
 
+        # Ids of the trace frames and shared texts added since they were last
+        # taken, only recorded after `track_new_items`.
+        self._new_trace_frame_ids: Optional[List[int]] = None
+        self._new_shared_text_ids: Optional[List[int]] = None
+
         # !!!!! IMPORTANT !!!!!
         # IF YOU ARE ADDING MORE FIELDS/EDGES TO THIS GRAPH, CHECK IF
         # TrimmedTraceGraph NEEDS TO BE UPDATED AS WELL.
@@ -126,6 +131,9 @@ class TraceGraph(object):
         ), "Instance fix info already exists"
         self._issue_instance_fix_info[instance.id.local_id] = fix_info
 
+    def get_shared_texts(self) -> Iterable[SharedText]:
+        return self._shared_texts.values()
+
     def get_text(self, shared_text_id: DBID) -> str:
         return self._shared_texts[shared_text_id.local_id].contents
 
@@ -189,6 +197,8 @@ class TraceGraph(object):
             trace_frame.id.local_id
         )
         self._trace_frames[trace_frame.id.local_id] = trace_frame
+        if self._new_trace_frame_ids is not None:
+            self._new_trace_frame_ids.append(trace_frame.id.local_id)
 
     def get_trace_frames_from_caller(
         self, kind: TraceKind, caller_id: DBID, caller_port: str
@@ -199,6 +209,9 @@ class TraceGraph(object):
             for trace_frame_id in self._trace_frames_map[kind][key]
         ]
 
+    def get_trace_frames(self) -> Iterable[TraceFrame]:
+        return self._trace_frames.values()
+
     def get_trace_frame_from_id(self, id: int) -> TraceFrame:
         return self._trace_frames[id]
 
@@ -212,6 +225,8 @@ class TraceGraph(object):
         ), "Shared text with same kind, contents exists"
 
         self._shared_texts[shared_text.id.local_id] = shared_text
+        if self._new_shared_text_ids is not None:
+            self._new_shared_text_ids.append(shared_text.id.local_id)
 
         # Allow look up of SharedTexts by name and kind (to optimize
         # get_shared_text which is called when parsing each issue instance)
@@ -227,6 +242,29 @@ class TraceGraph(object):
             self.add_shared_text(shared_text)
         return shared_text
 
+    def track_new_items(self) -> None:
+        """Starts recording the trace frames and shared texts that are added, for
+        `take_new_trace_frames` and `take_new_shared_texts`. The items already in
+        the graph count as new."""
+        self._new_trace_frame_ids = list(self._trace_frames)
+        self._new_shared_text_ids = list(self._shared_texts)
+
+    def take_new_trace_frames(self) -> List[TraceFrame]:
+        """Returns the trace frames added since the last call."""
+        ids = self._new_trace_frame_ids
+        if ids is None:
+            return []
+        self._new_trace_frame_ids = []
+        return [self._trace_frames[id] for id in ids]
+
+    def take_new_shared_texts(self) -> List[SharedText]:
+        """Returns the shared texts added since the last call."""
+        ids = self._new_shared_text_ids
+        if ids is None:
+            return []
+        self._new_shared_text_ids = []
+        return [self._shared_texts[id] for id in ids]
+
     def add_trace_frame_leaf_assoc(
         self, trace_frame: TraceFrame, leaf: SharedText, depth: int
     ) -> None:
@@ -403,7 +441,8 @@ class TraceGraph(object):
             if is_leaf_frame or (leaf_map.callee_leaf in callee_leaf_ids)
         }
 
-    def is_leaf_port(self, port: str) -> bool:
+    @staticmethod
+    def is_leaf_port(port: str) -> bool:
         return (
             port == "leaf"
             or port == "source"
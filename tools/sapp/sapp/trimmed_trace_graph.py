@@ -3,13 +3,40 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+from bisect import bisect_right
 from collections import Counter
 from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from .models import SharedTextKind, TraceFrame, TraceFrameAnnotation, TraceKind
+from .models import (
+    DBID,
+    SharedTextKind,
+    TraceFrame,
+    TraceFrameAnnotation,
+    TraceKind,
+)
 from .trace_graph import TraceGraph
 
 
+class PrefixMatcher:
+    """Matches strings against a set of prefixes in logarithmic time.
+
+    Prefixes that start with another prefix are redundant and dropped, so no
+    remaining prefix starts with another one. Any prefix of a string then
+    sorts right before it, among the remaining prefixes that sort before or
+    equal to the string, so a single bisect finds the only candidate.
+    """
+
+    def __init__(self, prefixes: Iterable[str]) -> None:
+        self._prefixes: List[str] = []
+        for prefix in sorted(set(prefixes)):
+            if not self._prefixes or not prefix.startswith(self._prefixes[-1]):
+                self._prefixes.append(prefix)
+
+    def matches(self, string: str) -> bool:
+        index = bisect_right(self._prefixes, string)
+        return index > 0 and string.startswith(self._prefixes[index - 1])
+
+
 class TrimmedTraceGraph(TraceGraph):
     """Represents a trimmed graph that is constructed from a bigger TraceGraph
     based on issues that have traces involving a set of affected files or
@@ -22,6 +49,8 @@ class TrimmedTraceGraph(TraceGraph):
         """Creates an empty TrimmedTraceGraph."""
         super().__init__()
         self._affected_files = affected_files
+        self._affected_file_matcher = PrefixMatcher(affected_files)
+        self._affected_filename_ids: Dict[int, bool] = {}
         self._affected_issues_only = affected_issues_only
         self._visited_trace_frame_ids: Set[int] = set()
 
@@ -30,6 +59,8 @@ class TrimmedTraceGraph(TraceGraph):
         # Track which trace frames have been visited as we populate the full
         # traces of the graph.
         self._visited_trace_frame_ids: Set[int] = set()
+        # Filename ids are local to the given graph.
+        self._affected_filename_ids = {}
 
         self._populate_affected_issues(graph)
 
@@ -155,9 +186,7 @@ class TrimmedTraceGraph(TraceGraph):
         affected_instance_ids = [
             instance.id.local_id
             for instance in graph._issue_instances.values()
-            if self._is_filename_prefixed_with(
-                graph.get_text(instance.filename_id), self._affected_files
-            )
+            if self._is_affected_filename(graph, instance.filename_id)
         ]
 
         for instance_id in affected_instance_ids:
@@ -189,9 +218,7 @@ class TrimmedTraceGraph(TraceGraph):
         initial_trace_frames = [
             trace_frame
             for trace_frame in graph._trace_frames.values()
-            if self._is_filename_prefixed_with(
-                graph.get_text(trace_frame.filename_id), self._affected_files
-            )
+            if self._is_affected_filename(graph, trace_frame.filename_id)
         ]
 
         self._populate_issues_from_affected_conditions(
@@ -409,9 +436,15 @@ class TrimmedTraceGraph(TraceGraph):
                 self.add_shared_text(leaf)
             self.add_trace_frame_leaf_assoc(trace_frame, leaf, depth)
 
-    @staticmethod
-    def _is_filename_prefixed_with(filename: str, prefixes: Iterable[str]) -> bool:
-        return any(filename.startswith(p) for p in prefixes)
+    def _is_affected_filename(self, graph: TraceGraph, filename_id: DBID) -> bool:
+        """Returns whether the filename is in one of the affected files or
+        directories. Results are cached per filename, as many issues and trace
+        frames share the same file."""
+        affected = self._affected_filename_ids.get(filename_id.local_id)
+        if affected is None:
+            affected = self._affected_file_matcher.matches(graph.get_text(filename_id))
+            self._affected_filename_ids[filename_id.local_id] = affected
+        return affected
 
     # pyre-fixme[2]: Parameter must be annotated.
     # pyre-fixme[2]: Parameter must be annotated.
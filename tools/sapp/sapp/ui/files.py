@@ -0,0 +1,67 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+
+# Default number of lines served before and after the line of a location.
+CONTEXT_LINES = 20
+
+
+class _CachedFile(NamedTuple):
+    mtime_ns: int
+    size: int
+    lines: List[str]
+
+
+class FileCache:
+    """Keeps the lines of the most recently read source files, up to a total size
+    in bytes. A file is read again when its modification time or size changed."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._files: "OrderedDict[str, _CachedFile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lines(self, path: Path) -> List[str]:
+        stat = path.stat()
+        key = str(path)
+        with self._lock:
+            cached = self._files.get(key)
+            if (
+                cached is not None
+                and cached.mtime_ns == stat.st_mtime_ns
+                and cached.size == stat.st_size
+            ):
+                self._files.move_to_end(key)
+                return cached.lines
+
+        lines = path.read_text().splitlines(keepends=True)
+        with self._lock:
+            stale = self._files.pop(key, None)
+            if stale is not None:
+                self._bytes -= stale.size
+            if stat.st_size <= self._max_bytes:
+                self._files[key] = _CachedFile(stat.st_mtime_ns, stat.st_size, lines)
+                self._bytes += stat.st_size
+                while self._bytes > self._max_bytes:
+                    _, evicted = self._files.popitem(last=False)
+                    self._bytes -= evicted.size
+        return lines
+
+    def window(
+        self, path: Path, line: Optional[int], context_lines: int = CONTEXT_LINES
+    ) -> Tuple[int, str]:
+        """Returns the number of the first line and the contents of the lines
+        around the given 1-based line, or of the whole file if line is None."""
+        lines = self.lines(path)
+        if line is None:
+            return 1, "".join(lines)
+        start = max(line - context_lines, 1)
+        return start, "".join(lines[start - 1 : line + context_lines])
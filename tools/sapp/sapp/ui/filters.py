@@ -7,20 +7,23 @@ from __future__ import annotations
 
 import logging
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Generic, List, Optional, Sequence, Set, TypeVar, Union
+from typing import Generic, List, Optional, Sequence, Set, TypeVar, Union
 
 import graphene
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, and_, exists, false, func, select
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.query import Query
-from sqlalchemy.sql.expression import or_
+from sqlalchemy.sql.expression import ColumnElement, or_
 from typing_extensions import Final
 
-from ..models import DBID, Base
-
-
-if TYPE_CHECKING:
-    from .issues import IssueQueryResult  # noqa
+from ..models import (
+    DBID,
+    Base,
+    IssueInstance,
+    IssueInstanceSharedTextAssoc,
+    SharedText,
+    SharedTextKind,
+)
 
 
 LOG: logging.Logger = logging.getLogger(__name__)
@@ -87,38 +90,54 @@ class Like(Generic[_T], QueryPredicate):
         return query.filter(or_(*[self._column.like(item) for item in self._items]))
 
 
-class IssuePredicate(Predicate):
-    @abstractmethod
-    def apply(self, issues: List[IssueQueryResult]) -> List[IssueQueryResult]:
-        ...
+def _has_feature(features: Set[str]) -> ColumnElement:
+    """Matches the associations of issue instances with any of the features."""
+    return and_(
+        IssueInstanceSharedTextAssoc.issue_instance_id == IssueInstance.id,
+        IssueInstanceSharedTextAssoc.shared_text_id == SharedText.id,
+        SharedText.kind == SharedTextKind.FEATURE,
+        SharedText.contents.in_(sorted(features)),
+    )
 
 
-class HasAll(IssuePredicate):
+class HasAll(QueryPredicate):
     def __init__(self, features: Set[str]) -> None:
         self._features = features
 
-    def apply(self, issues: List[IssueQueryResult]) -> List[IssueQueryResult]:
-        return [
-            issue
-            for issue in issues
-            if issue.features & self._features == self._features
-        ]
+    def apply(self, query: Query[_Q]) -> Query[_Q]:
+        if not self._features:
+            return query
+        matching = (
+            select([func.count(SharedText.contents.distinct())])
+            .where(_has_feature(self._features))
+            .correlate(IssueInstance)
+            .as_scalar()
+        )
+        return query.filter(matching == len(self._features))
 
 
-class HasAny(IssuePredicate):
+class HasAny(QueryPredicate):
     def __init__(self, features: Set[str]) -> None:
         self._features = features
 
-    def apply(self, issues: List[IssueQueryResult]) -> List[IssueQueryResult]:
-        return [issue for issue in issues if len(issue.features & self._features) > 0]
+    def apply(self, query: Query[_Q]) -> Query[_Q]:
+        if not self._features:
+            return query.filter(false())
+        return query.filter(
+            exists().where(_has_feature(self._features)).correlate(IssueInstance)
+        )
 
 
-class HasNone(IssuePredicate):
+class HasNone(QueryPredicate):
     def __init__(self, features: Set[str]) -> None:
         self._features = features
 
-    def apply(self, issues: List[IssueQueryResult]) -> List[IssueQueryResult]:
-        return [issue for issue in issues if len(issue.features & self._features) == 0]
+    def apply(self, query: Query[_Q]) -> Query[_Q]:
+        if not self._features:
+            return query
+        return query.filter(
+            ~exists().where(_has_feature(self._features)).correlate(IssueInstance)
+        )
 
 
 class Filter(graphene.ObjectType):
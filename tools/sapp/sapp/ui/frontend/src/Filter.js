@@ -86,8 +86,8 @@ const FilterForm = (props: {
   const {data: codes} = useQuery(codesQuery);
 
   const pathsQuery = gql`
-    query Paths {
-      paths {
+    query Paths($prefix: String) {
+      paths(prefix: $prefix, first: 100) {
         edges {
           node {
             path
@@ -96,11 +96,11 @@ const FilterForm = (props: {
       }
     }
   `;
-  const {data: paths} = useQuery(pathsQuery);
+  const {data: paths, refetch: refetchPaths} = useQuery(pathsQuery);
 
   const callablesQuery = gql`
-    query Callables {
-      callables {
+    query Callables($prefix: String) {
+      callables(prefix: $prefix, first: 100) {
         edges {
           node {
             callable
@@ -109,11 +109,11 @@ const FilterForm = (props: {
       }
     }
   `;
-  const {data: callables} = useQuery(callablesQuery);
+  const {data: callables, refetch: refetchCallables} = useQuery(callablesQuery);
 
   const featuresQuery = gql`
-    query Features {
-      features {
+    query Features($prefix: String) {
+      features(prefix: $prefix, first: 100) {
         edges {
           node {
             feature
@@ -122,7 +122,7 @@ const FilterForm = (props: {
       }
     }
   `;
-  const {data: features} = useQuery(featuresQuery);
+  const {data: features, refetch: refetchFeatures} = useQuery(featuresQuery);
 
   const onFinish = (filter: FilterDescription) => {
     setAppliedFilter(filter);
@@ -151,6 +151,7 @@ const FilterForm = (props: {
       <Form.Item label="Paths" name="paths">
         <Select
           mode="multiple"
+          onSearch={prefix => refetchPaths({prefix})}
           options={(paths?.paths?.edges || []).map(edge => {
             return {
               value: edge.node.path,
@@ -161,6 +162,7 @@ const FilterForm = (props: {
       <Form.Item label="Callables" name="callables">
         <Select
           mode="multiple"
+          onSearch={prefix => refetchCallables({prefix})}
           options={(callables?.callables?.edges || []).map(edge => {
             return {
               value: edge.node.callable,
@@ -186,6 +188,7 @@ const FilterForm = (props: {
             <Form.Item name="features">
               <Select
                 mode="multiple"
+                onSearch={prefix => refetchFeatures({prefix})}
                 options={(features?.features?.edges || []).map(edge => {
                   return {
                     value: edge.node.feature,
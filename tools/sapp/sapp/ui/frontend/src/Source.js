@@ -21,18 +21,20 @@ function Source(
   props: $ReadOnly<{|path: string, location: string|}>,
 ): React$Node {
   const SourceQuery = gql`
-    query Issue($path: String) {
-      file(path: $path) {
+    query Issue($path: String, $line: Int) {
+      file(path: $path, line: $line) {
         edges {
           node {
             contents
+            start_line
           }
         }
       }
     }
   `;
+  const split_location = props.location.split('|').map(i => parseInt(i));
   const {loading, error, data} = useQuery(SourceQuery, {
-    variables: {path: props.path},
+    variables: {path: props.path, line: split_location[0]},
   });
 
   var content = <div />;
@@ -51,14 +53,15 @@ function Source(
     );
   } else {
     const value = data.file.edges[0].node.contents;
+    const start_line = data.file.edges[0].node.start_line;
 
     var range = null;
     var selection = null;
-    const split_location = props.location.split('|').map(i => parseInt(i));
     if (split_location.length === 3) {
+      const line = split_location[0] - start_line;
       range = {
-        from: {line: split_location[0] - 1, ch: split_location[1]},
-        to: {line: split_location[0] - 1, ch: split_location[2]},
+        from: {line: line, ch: split_location[1]},
+        to: {line: line, ch: split_location[2]},
       };
       selection = range.from;
     }
@@ -66,7 +69,11 @@ function Source(
     content = (
       <CodeMirror
         value={value}
-        options={{lineNumbers: true, readOnly: 'nocursor'}}
+        options={{
+          lineNumbers: true,
+          firstLineNumber: start_line,
+          readOnly: 'nocursor',
+        }}
         editorDidMount={editor => {
           if (range === null) {
             return;
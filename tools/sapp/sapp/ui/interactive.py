@@ -14,6 +14,7 @@ from typing import (
     DefaultDict,
     Dict,
     Iterable,
+    Iterator,
     List,
     Optional,
     Set,
@@ -43,12 +44,15 @@ from sqlalchemy.sql.expression import or_
 from ..analysis_output import AnalysisOutput, AnalysisOutputError
 from ..db import DB
 from ..decorators import UserError, catch_keyboard_interrupt, catch_user_error
+from ..iterutil import split_every
 from ..models import (
     DBID,
     Issue,
     IssueInstance,
     IssueInstanceSharedTextAssoc,
     Run,
+    RunStatisticKind,
+    RunStatistics,
     RunStatus,
     SharedText,
     SharedTextKind,
@@ -59,11 +63,14 @@ from ..models import (
 from ..pipeline.base_parser import BaseParser
 from . import trace
 from .issues import IssueQueryResult, Query
-from .trace import TraceFrameQueryResult, TraceTuple
+from .trace import TraceFrameQueryResult, TraceIndexCache, TraceTuple
 
 
 T = TypeVar("T")
 
+# Issues are loaded and shown in batches of this size.
+ISSUE_BATCH_SIZE = 100
+
 # pyre-fixme[5]: Global expression must be annotated.
 FilenameText = aliased(SharedText)
 # pyre-fixme[5]: Global expression must be annotated.
@@ -185,6 +192,8 @@ details              show additional information about the current trace frame
         # pyre-fixme[4]: Attribute must be annotated.
         self.leaf_dicts = {}
 
+        self.trace_indexes = TraceIndexCache()
+
         # Tuples representing the trace of the current issue
         self.trace_tuples: List[TraceTuple] = []
         # Active trace frame of the current trace
@@ -255,12 +264,18 @@ details              show additional information about the current trace frame
         pager = self._resolve_pager(use_pager)
 
         with self.db.make_session() as session:
-            runs = session.query(Run).filter(Run.status == RunStatus.FINISHED)
-
-            run_strings = [
-                "\n".join([f"Run {run.id}", f"Date: {run.date}", "-" * 80])
-                for run in runs
-            ]
+            runs = session.query(Run).filter(Run.status == RunStatus.FINISHED).all()
+            statistics = RunStatistics.get(session, [int(run.id) for run in runs])
+
+            run_strings = []
+            for run in runs:
+                lines = [f"Run {run.id}", f"Date: {run.date}"]
+                run_statistics = statistics.get(int(run.id))
+                if run_statistics is not None:
+                    total = run_statistics.get((RunStatisticKind.total_issues, ""), 0)
+                    new = run_statistics.get((RunStatisticKind.new_issues, ""), 0)
+                    lines.append(f"Issues: {total} ({new} new)")
+                run_strings.append("\n".join(lines + ["-" * 80]))
         run_output = "\n".join(run_strings)
 
         pager(run_output)
@@ -590,22 +605,20 @@ details              show additional information about the current trace frame
                     exclude_features = [exclude_features]
                 builder = builder.where_exclude_features(exclude_features)
 
-            issues = builder.get()
-            sources_list = [builder.sources(issue.id) for issue in issues]
-            sinks_list = [builder.sinks(issue.id) for issue in issues]
-            features_list = [builder.features(issue.id) for issue in issues]
-
-        issue_strings = []
-        for issue, sources, sinks, features in zip(
-            issues, sources_list, sinks_list, features_list
-        ):
-            issue_strings.append(
-                self._create_issue_output_string(issue, sources, sinks, features)
-            )
+            issue_count = 0
+            issue_strings = self._issue_output_strings(session, builder)
+            if pager is page.page:
+                issue_strings = list(issue_strings)
+                issue_count = len(issue_strings)
+                pager(f"\n{'-' * 80}\n".join(issue_strings))
+            else:
+                # Without a pager, issues are shown as they are loaded.
+                for batch in split_every(ISSUE_BATCH_SIZE, issue_strings):
+                    separator = f"{'-' * 80}\n" if issue_count > 0 else ""
+                    pager(separator + f"\n{'-' * 80}\n".join(batch))
+                    issue_count += len(batch)
 
-        issue_output = f"\n{'-' * 80}\n".join(issue_strings)
-        pager(issue_output)
-        print(f"Found {len(issue_strings)} issues with run_id {self.current_run_id}.")
+        print(f"Found {issue_count} issues with run_id {self.current_run_id}.")
 
     @catch_user_error()
     # pyre-fixme[3]: Return type must be annotated.
@@ -726,12 +739,12 @@ details              show additional information about the current trace frame
 
             if selected_frame.kind == TraceKind.POSTCONDITION:
                 self.sinks = set()
-                self.sources = trace.Query(session).get_leaves_trace_frame(
+                self.sources = self._trace_query(session).get_leaves_trace_frame(
                     self.leaf_dicts, int(selected_frame.id), SharedTextKind.SOURCE
                 )
 
             else:
-                self.sinks = trace.Query(session).get_leaves_trace_frame(
+                self.sinks = self._trace_query(session).get_leaves_trace_frame(
                     self.leaf_dicts, int(selected_frame.id), SharedTextKind.SINK
                 )
 
@@ -854,7 +867,7 @@ details              show additional information about the current trace frame
                     or current_trace_tuple.trace_frame.kind == TraceKind.PRECONDITION
                 )
 
-            parent_trace_frames = trace.Query(session).next_trace_frames(
+            parent_trace_frames = self._trace_query(session).next_trace_frames(
                 self.leaf_dicts,
                 self.current_run_id,
                 leaf_kind,
@@ -877,25 +890,29 @@ details              show additional information about the current trace frame
     def _generate_trace_from_issue(self) -> None:
         with self.db.make_session() as session:
             issue = self._get_current_issue(session)
-            postcondition_initial_frames = trace.Query(session).initial_trace_frames(
+            postcondition_initial_frames = self._trace_query(
+                session
+            ).initial_trace_frames(
                 # pyre-fixme[6]: Expected `int` for 1st param but got `DBID`.
                 issue.id,
                 TraceKind.POSTCONDITION,
             )
-            precondition_initial_frames = trace.Query(session).initial_trace_frames(
+            precondition_initial_frames = self._trace_query(
+                session
+            ).initial_trace_frames(
                 # pyre-fixme[6]: Expected `int` for 1st param but got `DBID`.
                 issue.id,
                 TraceKind.PRECONDITION,
             )
 
-            postcondition_navigation = trace.Query(session).navigate_trace_frames(
+            postcondition_navigation = self._trace_query(session).navigate_trace_frames(
                 self.leaf_dicts,
                 self.current_run_id,
                 self.sources,
                 self.sinks,
                 postcondition_initial_frames,
             )
-            precondition_navigation = trace.Query(session).navigate_trace_frames(
+            precondition_navigation = self._trace_query(session).navigate_trace_frames(
                 self.leaf_dicts,
                 self.current_run_id,
                 self.sources,
@@ -945,7 +962,7 @@ details              show additional information about the current trace frame
                 .join(FilenameText, FilenameText.id == TraceFrame.filename_id)
                 .one()
             )
-            navigation = trace.Query(session).navigate_trace_frames(
+            navigation = self._trace_query(session).navigate_trace_frames(
                 self.leaf_dicts,
                 self.current_run_id,
                 self.sources,
@@ -1021,7 +1038,7 @@ details              show additional information about the current trace frame
                 ", ".join(
                     [
                         leaf
-                        for leaf in trace.Query(session).get_leaves_trace_frame(
+                        for leaf in self._trace_query(session).get_leaves_trace_frame(
                             self.leaf_dicts,
                             int(frame.id),
                             trace.trace_kind_to_shared_text_kind(frame.kind),
@@ -1081,7 +1098,7 @@ details              show additional information about the current trace frame
                     "Branch number invalid "
                     f"(expected 1-{len(branches)} but got {selected_number})."
                 )
-            new_navigation = trace.Query(session).navigate_trace_frames(
+            new_navigation = self._trace_query(session).navigate_trace_frames(
                 self.leaf_dicts,
                 self.current_run_id,
                 self.sources,
@@ -1191,7 +1208,7 @@ details              show additional information about the current trace frame
                 if self._is_before_root()
                 else TraceKind.PRECONDITION
             )
-            return trace.Query(session).initial_trace_frames(
+            return self._trace_query(session).initial_trace_frames(
                 self.current_issue_instance_id, kind
             )
 
@@ -1207,7 +1224,7 @@ details              show additional information about the current trace frame
                 or parent_trace_frame.kind == TraceKind.PRECONDITION
             )
 
-        return trace.Query(session).next_trace_frames(
+        return self._trace_query(session).next_trace_frames(
             self.leaf_dicts, self.current_run_id, leaf_kind, parent_trace_frame, set()
         )
 
@@ -1466,6 +1483,21 @@ details              show additional information about the current trace frame
             for trace_frame, branches in navigation
         ]
 
+    def _issue_output_strings(self, session: Session, builder: Query) -> Iterator[str]:
+        kinds = [SharedTextKind.SOURCE, SharedTextKind.SINK, SharedTextKind.FEATURE]
+        for batch in split_every(ISSUE_BATCH_SIZE, builder.iterate()):
+            leaves = Query.get_leaves_issue_instances(
+                session, [int(issue.id) for issue in batch], kinds
+            )
+            for issue in batch:
+                issue_leaves = leaves[int(issue.id)]
+                yield self._create_issue_output_string(
+                    issue,
+                    issue_leaves[SharedTextKind.SOURCE],
+                    issue_leaves[SharedTextKind.SINK],
+                    issue_leaves[SharedTextKind.FEATURE],
+                )
+
     def _create_issue_output_string(
         self,
         issue: IssueQueryResult,
@@ -1511,7 +1543,7 @@ details              show additional information about the current trace frame
 
         with self.db.make_session() as session:
             leaves_output = f"\n{' ' * 13}".join(
-                trace.Query(session).get_leaves_trace_frame(
+                self._trace_query(session).get_leaves_trace_frame(
                     self.leaf_dicts, trace_frame.id, leaf_kind
                 )
             )
@@ -1610,6 +1642,11 @@ details              show additional information about the current trace frame
             .first()
         )
 
+    def _trace_query(self, session: Session) -> "trace.Query":
+        return trace.Query(
+            session, self.trace_indexes.get(session, self.current_run_id)
+        )
+
     def _get_leaves_issue_instance(
         self, session: Session, issue_instance_id: int, kind: SharedTextKind
     ) -> Set[str]:
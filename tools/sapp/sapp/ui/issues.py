@@ -5,13 +5,28 @@
 
 from __future__ import annotations
 
-from typing import Any, List, NamedTuple, Optional, Set, Union
+from collections import defaultdict
+from typing import (
+    Any,
+    DefaultDict,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Union,
+)
 
 import graphene
 from graphql.execution.base import ResolveInfo
+from promise import Promise
+from promise.dataloader import DataLoader
 from sqlalchemy import func
 from sqlalchemy.orm import Session, aliased
 
+from ..iterutil import split_every
 from ..models import (
     DBID,
     Issue,
@@ -24,6 +39,9 @@ from ..models import (
 from . import filters
 
 
+BATCH_SIZE = 500
+
+
 # pyre-fixme[5]: Global expression must be annotated.
 FilenameText = aliased(SharedText)
 # pyre-fixme[5]: Global expression must be annotated.
@@ -38,9 +56,37 @@ MessageText = aliased(SharedText)
 FeatureText = aliased(SharedText)
 
 
-def _query(info: ResolveInfo) -> "Query":
-    # TODO(T71492980): queries here are run-independent and should be factored out.
-    return Query(info.context["session"], 1)
+# Leaves of issue instances that are loaded together for GraphQL requests.
+LEAF_KINDS: List[SharedTextKind] = [
+    SharedTextKind.SOURCE,
+    SharedTextKind.SOURCE_DETAIL,
+    SharedTextKind.SINK,
+    SharedTextKind.SINK_DETAIL,
+]
+
+LEAVES_LOADER = "issue_leaves_loader"
+
+
+class LeavesLoader(DataLoader):
+    """Loads the leaves of all the issue instances resolved by a GraphQL request
+    in one batch, instead of running queries for every field of every issue."""
+
+    def __init__(self, session: Session) -> None:
+        super().__init__()
+        self._session = session
+
+    def batch_load_fn(  # pyre-ignore[14]: promise is untyped.
+        self, issue_ids: List[int]
+    ) -> Promise:
+        leaves = Query.get_leaves_issue_instances(self._session, issue_ids, LEAF_KINDS)
+        return Promise.resolve([leaves[issue_id] for issue_id in issue_ids])
+
+
+def _leaves(info: ResolveInfo, issue_id: DBID, kind: SharedTextKind) -> Promise:
+    loader = info.context.get(LEAVES_LOADER)
+    if loader is None:
+        loader = info.context[LEAVES_LOADER] = LeavesLoader(info.context["session"])
+    return loader.load(int(issue_id)).then(lambda leaves: list(leaves[kind]))
 
 
 # pyre-ignore[13]: unitialized class attribute
@@ -73,17 +119,17 @@ class IssueQueryResultType(graphene.ObjectType):
     def resolve_issue_id(self, info: ResolveInfo) -> DBID:
         return self.id
 
-    def resolve_sources(self, info: ResolveInfo) -> List[str]:
-        return list(_query(info).sources(self.id))
+    def resolve_sources(self, info: ResolveInfo) -> Promise:
+        return _leaves(info, self.id, SharedTextKind.SOURCE)
 
-    def resolve_source_names(self, info: ResolveInfo) -> List[str]:
-        return list(_query(info).source_names(self.id))
+    def resolve_source_names(self, info: ResolveInfo) -> Promise:
+        return _leaves(info, self.id, SharedTextKind.SOURCE_DETAIL)
 
-    def resolve_sinks(self, info: ResolveInfo) -> List[str]:
-        return list(_query(info).sinks(self.id))
+    def resolve_sinks(self, info: ResolveInfo) -> Promise:
+        return _leaves(info, self.id, SharedTextKind.SINK)
 
-    def resolve_sink_names(self, info: ResolveInfo) -> List[str]:
-        return list(_query(info).sink_names(self.id))
+    def resolve_sink_names(self, info: ResolveInfo) -> Promise:
+        return _leaves(info, self.id, SharedTextKind.SINK_DETAIL)
 
     def resolve_features(self, info: ResolveInfo) -> List[str]:
         # pyre-ignore[6]: graphene too dynamic.
@@ -132,27 +178,42 @@ class Query:
         self._run_id = run_id
 
     def get(self) -> List[IssueQueryResult]:
+        return [IssueQueryResult.from_record(record) for record in self._query()]
+
+    def iterate(
+        self, batch_size: int = BATCH_SIZE, after: Optional[int] = None
+    ) -> Iterator[IssueQueryResult]:
+        """Yields the issues in order of issue instance id, starting after the
+        given id. Issues are loaded in batches, keyed on the last issue instance
+        id of the previous batch, so that the cost of a batch doesn't depend on
+        its position in the run."""
+        query = self._query().order_by(IssueInstance.id)
+        while True:
+            batch_query = query
+            if after is not None:
+                batch_query = batch_query.filter(IssueInstance.id > after)
+            records = batch_query.limit(batch_size).all()
+            if len(records) == 0:
+                return
+            after = int(records[-1].id)
+            yield from (IssueQueryResult.from_record(record) for record in records)
+            if len(records) < batch_size:
+                return
+
+    # pyre-fixme[3]: Return type must be annotated.
+    def _query(self):
         features = (
             self._session.query(
-                # pyre-ignore: SQAlchemy sadness.
-                IssueInstance.id.label("id"),
-                func.group_concat(FeatureText.contents.distinct()).label(
-                    "concatenated_features"
-                ),
+                func.group_concat(FeatureText.contents.distinct()),
             )
             .join(
                 IssueInstanceSharedTextAssoc,
-                IssueInstanceSharedTextAssoc.issue_instance_id == IssueInstance.id,
-                isouter=True,
-            )
-            .join(
-                FeatureText,
-                FeatureText.id == IssueInstanceSharedTextAssoc.shared_text_id,
-                isouter=True,
+                IssueInstanceSharedTextAssoc.shared_text_id == FeatureText.id,
             )
+            .filter(IssueInstanceSharedTextAssoc.issue_instance_id == IssueInstance.id)
             .filter(FeatureText.kind == SharedTextKind.FEATURE)
-            .group_by(IssueInstance)
-            .subquery()
+            .correlate(IssueInstance)
+            .as_scalar()
         )
         query = (
             self._session.query(
@@ -164,35 +225,20 @@ class Query:
                 MessageText.contents.label("message"),
                 IssueInstance.min_trace_length_to_sources,
                 IssueInstance.min_trace_length_to_sinks,
-                features.c.concatenated_features,
+                features.label("concatenated_features"),
             )
             .filter(IssueInstance.run_id == self._run_id)
             .join(FilenameText, FilenameText.id == IssueInstance.filename_id)
             .join(CallableText, CallableText.id == IssueInstance.callable_id)
-            .join(features, IssueInstance.id == features.c.id, isouter=True)
         )
 
         for predicate in self._predicates:
             if isinstance(predicate, filters.QueryPredicate):
                 query = predicate.apply(query)
 
-        issues = [
-            IssueQueryResult.from_record(record)
-            for record in query.join(Issue, IssueInstance.issue_id == Issue.id).join(
-                MessageText, MessageText.id == IssueInstance.message_id
-            )
-        ]
-
-        issue_predicates = [
-            predicate
-            for predicate in self._predicates
-            if isinstance(predicate, filters.IssuePredicate)
-        ]
-        if len(issue_predicates) > 0:
-            for issue_predicate in issue_predicates:
-                issues = issue_predicate.apply(issues)
-
-        return issues
+        return query.join(Issue, IssueInstance.issue_id == Issue.id).join(
+            MessageText, MessageText.id == IssueInstance.message_id
+        )
 
     def where(self, *predicates: filters.Predicate) -> "Query":
         self._predicates.extend(predicates)
@@ -267,26 +313,34 @@ class Query:
     def get_leaves_issue_instance(
         self, session: Session, issue_instance_id: int, kind: SharedTextKind
     ) -> Set[str]:
-        message_ids = [
-            int(id)
-            for id, in session.query(SharedText.id)
-            .distinct(SharedText.id)
-            .join(
-                IssueInstanceSharedTextAssoc,
-                SharedText.id == IssueInstanceSharedTextAssoc.shared_text_id,
-            )
-            .filter(IssueInstanceSharedTextAssoc.issue_instance_id == issue_instance_id)
-            .filter(SharedText.kind == kind)
-        ]
-        return self._leaf_dict_lookups(message_ids, kind, session)
+        return self.get_leaves_issue_instances(session, [issue_instance_id], [kind])[
+            issue_instance_id
+        ][kind]
 
-    def _leaf_dict_lookups(
-        self, message_ids: List[int], kind: SharedTextKind, session: Session
-    ) -> Set[str]:
-        leaf_dict = {
-            int(id): contents
-            for id, contents in session.query(
-                SharedText.id, SharedText.contents
-            ).filter(SharedText.kind == kind)
-        }
-        return {leaf_dict[id] for id in message_ids if id in leaf_dict}
+    @staticmethod
+    def get_leaves_issue_instances(
+        session: Session,
+        issue_instance_ids: Iterable[int],
+        kinds: Iterable[SharedTextKind],
+    ) -> Dict[int, DefaultDict[SharedTextKind, Set[str]]]:
+        """Returns the leaves of the given kinds of each of the issue instances."""
+        leaves: Dict[int, DefaultDict[SharedTextKind, Set[str]]] = {}
+        kinds = list(kinds)
+        for batch in split_every(BATCH_SIZE, issue_instance_ids):
+            for issue_instance_id in batch:
+                leaves[issue_instance_id] = defaultdict(set)
+            for issue_instance_id, kind, contents in (
+                session.query(
+                    IssueInstanceSharedTextAssoc.issue_instance_id,
+                    SharedText.kind,
+                    SharedText.contents,
+                )
+                .join(
+                    SharedText,
+                    SharedText.id == IssueInstanceSharedTextAssoc.shared_text_id,
+                )
+                .filter(IssueInstanceSharedTextAssoc.issue_instance_id.in_(batch))
+                .filter(SharedText.kind.in_(kinds))
+            ):
+                leaves[int(issue_instance_id)][kind].add(contents)
+        return leaves
@@ -0,0 +1,77 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from ..models import DBID, Run, RunStatus
+
+
+def latest_run_id(session: Session) -> DBID:
+    return DBID(
+        (
+            session.query(func.max(Run.id))
+            .filter(Run.status == RunStatus.FINISHED)
+            .scalar()
+        )
+    )
+
+
+class LatestRunCache:
+    """Keeps the id of the latest finished run for a few seconds, so that the
+    resolvers of a request, and concurrent requests, don't all look it up."""
+
+    def __init__(
+        self, ttl: float = 10.0, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._ttl = ttl
+        self._clock = clock
+        self._run_id: Optional[DBID] = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def latest_run_id(self, session: Session) -> DBID:
+        with self._lock:
+            now = self._clock()
+            if self._run_id is None or now >= self._expires:
+                self._run_id = latest_run_id(session)
+                self._expires = now + self._ttl
+            return self._run_id
+
+
+ResponseKey = Tuple[int, Hashable]
+
+
+class ResponseCache:
+    """Keeps the most recently used responses to GraphQL queries. Responses are
+    keyed on the run they were computed for, so a new run doesn't serve them."""
+
+    def __init__(self, max_responses: int = 256) -> None:
+        self._max_responses = max_responses
+        self._responses: "OrderedDict[ResponseKey, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: ResponseKey) -> Optional[bytes]:
+        with self._lock:
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+            return response
+
+    def put(self, key: ResponseKey, response: bytes) -> None:
+        with self._lock:
+            self._responses[key] = response
+            self._responses.move_to_end(key)
+            while len(self._responses) > self._max_responses:
+                self._responses.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._responses.clear()
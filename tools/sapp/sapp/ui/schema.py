@@ -3,29 +3,29 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import itertools
 import os
 from pathlib import Path
-from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
 
 import graphene
 from graphene import relay
 from graphene_sqlalchemy import get_session
 from graphql.execution.base import ResolveInfo
+from graphql_relay.connection.arrayconnection import cursor_to_offset
+from graphql_relay.utils import base64, unbase64
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import func
-
-from ..models import (
-    DBID,
-    Run,
-    RunStatus,
-    SharedText,
-    SharedTextKind,
-    TraceFrame,
-    TraceKind,
-)
-from . import filters as filters_module, issues, trace, typeahead
+
+from ..models import DBID, SharedTextKind, TraceFrame, TraceKind
+from . import filters as filters_module, issues, run_cache, trace, typeahead
+from .files import CONTEXT_LINES, FileCache
 from .issues import IssueQueryResult, IssueQueryResultType
-from .trace import TraceFrameQueryResult, TraceFrameQueryResultType
+from .trace import (
+    LeafDicts,
+    Query as TraceQuery,
+    TraceFrameQueryResult,
+    TraceFrameQueryResultType,
+)
 
 
 class IssueConnection(relay.Connection):
@@ -33,6 +33,33 @@ class IssueConnection(relay.Connection):
         node = IssueQueryResultType
 
 
+ISSUE_CURSOR_PREFIX = "issue:"
+
+
+def issue_cursor(issue_id: DBID) -> str:
+    return base64(f"{ISSUE_CURSOR_PREFIX}{int(issue_id)}")
+
+
+def issue_id_from_cursor(cursor: str) -> int:
+    decoded = unbase64(cursor)
+    if not decoded.startswith(ISSUE_CURSOR_PREFIX):
+        raise ValueError(f"`{cursor}` is not a valid issue cursor")
+    return int(decoded[len(ISSUE_CURSOR_PREFIX) :])
+
+
+def typeahead_limit(first: Optional[int], after: Optional[str]) -> Optional[int]:
+    """Relay pages the typeahead results after the offset of the cursor, so the
+    results up to that offset have to be fetched as well."""
+    if first is None:
+        return None
+    if after is None:
+        return first
+    offset = cursor_to_offset(after)
+    if offset is None:
+        return first
+    return offset + 1 + first
+
+
 class TraceFrameConnection(relay.Connection):
     class Meta:
         node = TraceFrameQueryResultType
@@ -44,11 +71,13 @@ class FileType(graphene.ObjectType):
 
     path = graphene.String()
     contents = graphene.String()
+    start_line = graphene.Int()
 
 
 class File(NamedTuple):
     path: str
     contents: str
+    start_line: int = 1
 
 
 class FileConnection(relay.Connection):
@@ -110,12 +139,17 @@ class Query(graphene.ObjectType):
     )
 
     # Typeahead data.
-    codes = relay.ConnectionField(CodeConnection)
-    paths = relay.ConnectionField(PathConnection)
-    callables = relay.ConnectionField(CallableConnection)
-    features = relay.ConnectionField(FeatureConnection)
-
-    file = relay.ConnectionField(FileConnection, path=graphene.String())
+    codes = relay.ConnectionField(CodeConnection, prefix=graphene.String())
+    paths = relay.ConnectionField(PathConnection, prefix=graphene.String())
+    callables = relay.ConnectionField(CallableConnection, prefix=graphene.String())
+    features = relay.ConnectionField(FeatureConnection, prefix=graphene.String())
+
+    file = relay.ConnectionField(
+        FileConnection,
+        path=graphene.String(),
+        line=graphene.Int(),
+        context_lines=graphene.Int(),
+    )
 
     filters = relay.ConnectionField(FilterConnection)
 
@@ -132,10 +166,12 @@ class Query(graphene.ObjectType):
         min_trace_length_to_sources: Optional[int] = None,
         max_trace_length_to_sources: Optional[int] = None,
         issue_id: Optional[int] = None,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
         **kwargs: Any,
-    ) -> List[IssueQueryResult]:
+    ) -> Union[List[IssueQueryResult], IssueConnection]:
         session = get_session(info.context)
-        run_id = Query.latest_run_id(session)
+        run_id = Query.current_run_id(info)
 
         builder = (
             issues.Query(session, run_id)
@@ -159,18 +195,45 @@ class Query(graphene.ObjectType):
             if features_mode == "none of":
                 builder = builder.where_exclude_features(features)
 
-        return builder.get()
+        if first is None or "last" in kwargs or "before" in kwargs:
+            # The connection is sliced from the list of all matching issues.
+            return builder.get()
+
+        # Only fetch the page, with one more issue to know whether there are
+        # more pages.
+        page = list(
+            itertools.islice(
+                builder.iterate(
+                    batch_size=first + 1,
+                    after=issue_id_from_cursor(after) if after else None,
+                ),
+                first + 1,
+            )
+        )
+        edges = [
+            IssueConnection.Edge(node=issue, cursor=issue_cursor(issue.id))
+            for issue in page[:first]
+        ]
+        return IssueConnection(
+            edges=edges,
+            page_info=relay.PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=after is not None,
+                has_next_page=len(page) > first,
+            ),
+        )
 
     def resolve_trace(
         self, info: ResolveInfo, issue_id: DBID, **args: Any
     ) -> List[TraceFrameQueryResult]:
         session = info.context.get("session")
 
-        run_id = DBID(Query.latest_run_id(session))
+        run_id = Query.current_run_id(info)
 
         issue = issues.Query(session, run_id).where_issue_id_is(int(issue_id)).get()[0]
 
-        leaf_kinds = Query.all_leaf_kinds(session)
+        trace_query, leaf_kinds = Query.trace_query(info, session, run_id)
 
         builder = issues.Query(session, run_id)
         sources = builder.get_leaves_issue_instance(
@@ -180,23 +243,19 @@ class Query(graphene.ObjectType):
             session, int(issue.id), SharedTextKind.SINK
         )
 
-        postcondition_navigation = trace.Query(session).navigate_trace_frames(
+        postcondition_navigation = trace_query.navigate_trace_frames(
             leaf_kinds,
             run_id,
             sources,
             sinks,
-            trace.Query(session).initial_trace_frames(
-                int(issue.id), TraceKind.POSTCONDITION
-            ),
+            trace_query.initial_trace_frames(int(issue.id), TraceKind.POSTCONDITION),
         )
-        precondition_navigation = trace.Query(session).navigate_trace_frames(
+        precondition_navigation = trace_query.navigate_trace_frames(
             leaf_kinds,
             run_id,
             sources,
             sinks,
-            trace.Query(session).initial_trace_frames(
-                int(issue.id), TraceKind.PRECONDITION
-            ),
+            trace_query.initial_trace_frames(int(issue.id), TraceKind.PRECONDITION),
         )
 
         trace_frames = (
@@ -215,11 +274,23 @@ class Query(graphene.ObjectType):
             + [frame_tuple[0] for frame_tuple in precondition_navigation]
         )
 
-        return [
-            frame._replace(file_content=Query().resolve_file(info, path=frame.filename))
-            for frame in trace_frames
-            if frame.filename
-        ]
+        results = []
+        for frame in trace_frames:
+            if not frame.filename:
+                continue
+            file = Query().resolve_file(
+                info,
+                path=frame.filename,
+                line=frame.callee_location.line_no
+                if frame.callee_location is not None
+                else None,
+            )[0]
+            results.append(
+                frame._replace(
+                    file_content=file.contents, file_start_line=file.start_line
+                )
+            )
+        return results
 
     def resolve_initial_trace_frames(
         self, info: ResolveInfo, issue_id: int, kind: str
@@ -234,8 +305,8 @@ class Query(graphene.ObjectType):
     ) -> List[TraceFrameQueryResult]:
         session = info.context.get("session")
 
-        leaf_kinds = Query.all_leaf_kinds(session)
-        run_id = DBID(Query.latest_run_id(session))
+        run_id = Query.current_run_id(info)
+        trace_query, leaf_kinds = Query.trace_query(info, session, run_id)
 
         trace_kind = TraceKind.create_from_string(kind)
         if trace_kind == TraceKind.POSTCONDITION:
@@ -251,33 +322,95 @@ class Query(graphene.ObjectType):
         if trace_frame is None:
             raise ValueError(f"`{frame_id}` is not a valid trace frame id")
 
-        return trace.Query(session).next_trace_frames(
+        return trace_query.next_trace_frames(
             leaf_kinds, run_id, leaf_kind, trace_frame, visited_ids=set()
         )
 
-    def resolve_codes(self, info: ResolveInfo) -> List[typeahead.Code]:
+    def resolve_codes(
+        self,
+        info: ResolveInfo,
+        prefix: Optional[str] = None,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        **kwargs: Any,
+    ) -> List[typeahead.Code]:
         session = info.context["session"]
-        return typeahead.all_codes(session)
+        return typeahead.all_codes(
+            session,
+            Query.current_run_id(info),
+            prefix=prefix,
+            limit=typeahead_limit(first, after),
+        )
 
-    def resolve_paths(self, info: ResolveInfo) -> List[typeahead.Path]:
+    def resolve_paths(
+        self,
+        info: ResolveInfo,
+        prefix: Optional[str] = None,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        **kwargs: Any,
+    ) -> List[typeahead.Path]:
         session = info.context["session"]
-        return typeahead.all_paths(session)
+        return typeahead.all_paths(
+            session,
+            Query.current_run_id(info),
+            prefix=prefix,
+            limit=typeahead_limit(first, after),
+        )
 
-    def resolve_callables(self, info: ResolveInfo) -> List[typeahead.Callable]:
+    def resolve_callables(
+        self,
+        info: ResolveInfo,
+        prefix: Optional[str] = None,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        **kwargs: Any,
+    ) -> List[typeahead.Callable]:
         session = info.context["session"]
-        return typeahead.all_callables(session)
+        return typeahead.all_callables(
+            session,
+            Query.current_run_id(info),
+            prefix=prefix,
+            limit=typeahead_limit(first, after),
+        )
 
-    def resolve_features(self, info: ResolveInfo) -> List[typeahead.Feature]:
+    def resolve_features(
+        self,
+        info: ResolveInfo,
+        prefix: Optional[str] = None,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        **kwargs: Any,
+    ) -> List[typeahead.Feature]:
         session = info.context["session"]
-        return typeahead.all_features(session)
+        return typeahead.all_features(
+            session,
+            Query.current_run_id(info),
+            prefix=prefix,
+            limit=typeahead_limit(first, after),
+        )
 
-    def resolve_file(self, info: ResolveInfo, path: str, **kwargs: Any) -> List[File]:
+    def resolve_file(
+        self,
+        info: ResolveInfo,
+        path: str,
+        line: Optional[int] = None,
+        context_lines: int = CONTEXT_LINES,
+        **kwargs: Any,
+    ) -> List[File]:
         if ".." in path:
             raise FileNotFoundError("Attempted directory traversal")
 
         source_directory = Path(info.context.get("source_directory") or os.getcwd())
-        contents = (source_directory / path).read_text()
-        return [File(path=path, contents=contents)]
+        # Without a cache kept across requests, files are still only read once
+        # per request.
+        file_cache = info.context.get("file_cache")
+        if file_cache is None:
+            file_cache = info.context["file_cache"] = FileCache()
+        start_line, contents = file_cache.window(
+            source_directory / path, line, context_lines
+        )
+        return [File(path=path, contents=contents, start_line=start_line)]
 
     def resolve_filters(self, info: ResolveInfo) -> List[filters_module.Filter]:
         session = info.context["session"]
@@ -287,36 +420,32 @@ class Query(graphene.ObjectType):
     def all_leaf_kinds(
         session: Session,
     ) -> Tuple[Dict[int, str], Dict[int, str], Dict[int, str]]:
-        return (
-            {
-                int(id): contents
-                for id, contents in session.query(
-                    SharedText.id, SharedText.contents
-                ).filter(SharedText.kind == SharedTextKind.SOURCE)
-            },
-            {
-                int(id): contents
-                for id, contents in session.query(
-                    SharedText.id, SharedText.contents
-                ).filter(SharedText.kind == SharedTextKind.SINK)
-            },
-            {
-                int(id): contents
-                for id, contents in session.query(
-                    SharedText.id, SharedText.contents
-                ).filter(SharedText.kind == SharedTextKind.FEATURE)
-            },
-        )
+        return trace.all_leaf_dicts(session)
+
+    @staticmethod
+    def trace_query(
+        info: ResolveInfo, session: Session, run_id: DBID
+    ) -> Tuple[TraceQuery, LeafDicts]:
+        """Returns a trace query for the run, using the run's trace index when
+        the server keeps them, and the names of all leaves by id."""
+        trace_indexes = info.context.get("trace_indexes")
+        if trace_indexes is None:
+            return trace.Query(session), Query.all_leaf_kinds(session)
+        index = trace_indexes.get(session, run_id)
+        return trace.Query(session, index), index.leaf_dicts
 
     @staticmethod
     def latest_run_id(session: Session) -> DBID:
-        return DBID(
-            (
-                session.query(func.max(Run.id))
-                .filter(Run.status == RunStatus.FINISHED)
-                .scalar()
-            )
-        )
+        return run_cache.latest_run_id(session)
+
+    @staticmethod
+    def current_run_id(info: ResolveInfo) -> DBID:
+        """Returns the latest run, as cached by the server when it caches it."""
+        session = info.context["session"]
+        latest_run_cache = info.context.get("latest_run_cache")
+        if latest_run_cache is None:
+            return Query.latest_run_id(session)
+        return latest_run_cache.latest_run_id(session)
 
 
 class SaveFilterMutation(relay.ClientIDMutation):
@@ -338,7 +467,7 @@ class SaveFilterMutation(relay.ClientIDMutation):
     def mutate_and_get_payload(
         self, info: ResolveInfo, **kwargs: Any
     ) -> "SaveFilterMutation":
-        session = info.context.get("session")
+        session = info.context.get("write_session") or info.context.get("session")
         filter = filters_module.Filter(**kwargs)
         filters_module.save_filter(session, filter)
         return SaveFilterMutation(node=filter)
@@ -351,7 +480,7 @@ class DeleteFilterMutation(relay.ClientIDMutation):
     def mutate_and_get_payload(
         self, info: ResolveInfo, **kwargs: Any
     ) -> "DeleteFilterMutation":
-        session = info.context.get("session")
+        session = info.context.get("write_session") or info.context.get("session")
         filters_module.delete_filter(session, kwargs["name"])
         return DeleteFilterMutation()
 
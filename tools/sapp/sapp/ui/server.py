@@ -5,20 +5,28 @@
 
 # pyre-strict
 
+import json
 import logging
 import os
-from typing import Optional
+import sqlite3
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
 
+import graphql
 import sqlalchemy
-from flask import Flask, send_from_directory
+from flask import Flask, request, send_from_directory
 from flask.wrappers import Response
 from flask_graphql import GraphQLView
 from pyre_extensions import none_throws
 from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from .. import models
 from ..db import DB
+from .files import FileCache
+from .run_cache import LatestRunCache, ResponseCache
 from .schema import schema
+from .trace import TraceIndexCache
 
 
 logging.basicConfig(
@@ -31,15 +39,95 @@ application = Flask(
     __name__, static_folder=os.path.join(os.path.dirname(__file__), "frontend", "build")
 )
 
-session: Optional[Session] = None
+sessions: List[Session] = []
 
 
 @application.teardown_appcontext
 def shutdown_session(exception: Optional[Exception] = None) -> None:
-    local_session = session
-    if local_session is not None:
+    for session in sessions:
         # pyre-fixme[16]: `Session` has no attribute `remove`.
-        local_session.remove()
+        session.remove()
+
+
+# Fields that are not derived from the run, e.g. read from source files, whose
+# responses are never cached.
+UNCACHED_FIELDS: Set[str] = {"file", "trace", "file_content"}
+
+
+class CachedGraphQLView(GraphQLView):
+    """Serves identical GraphQL queries of the latest run from a response cache.
+    Mutations clear the cache."""
+
+    # pyre-fixme[4]: Attribute must be annotated.
+    response_cache = None
+
+    def dispatch_request(self) -> Response:
+        response_cache: ResponseCache = self.response_cache
+        data = self._json_body()
+        document = self._document(data)
+        if document is None or not self._cacheable(document):
+            response = super().dispatch_request()
+            if request.method != "GET":
+                # The request may have changed what queries return.
+                response_cache.clear()
+            return response
+
+        context = self.get_context()
+        run_id = context["latest_run_cache"].latest_run_id(context["session"])
+        key: Hashable = (
+            data["query"],
+            json.dumps(data.get("variables"), sort_keys=True),
+            data.get("operationName"),
+        )
+        cached = response_cache.get((int(run_id), key))
+        if cached is not None:
+            return Response(cached, status=200, content_type="application/json")
+
+        response = super().dispatch_request()
+        if response.status_code == 200:
+            body = response.get_data()
+            if b'"errors"' not in body:
+                response_cache.put((int(run_id), key), body)
+        return response
+
+    # pyre-fixme[2]: Parameter annotation cannot be `Any`.
+    def _json_body(self) -> Any:
+        if request.method != "POST" or request.mimetype != "application/json":
+            return None
+        try:
+            return json.loads(request.data.decode("utf8"))
+        except ValueError:
+            return None
+
+    # pyre-fixme[2]: Parameter annotation cannot be `Any`.
+    def _document(self, data: Any) -> Optional[graphql.language.ast.Document]:
+        if not isinstance(data, dict) or not isinstance(data.get("query"), str):
+            return None
+        try:
+            return graphql.parse(data["query"])
+        except graphql.GraphQLError:
+            return None
+
+    def _cacheable(self, document: graphql.language.ast.Document) -> bool:
+        """Only queries of fields that are derived from the run are cached."""
+        selection_sets = []
+        for definition in document.definitions:
+            if isinstance(definition, graphql.language.ast.OperationDefinition):
+                if definition.operation != "query":
+                    return False
+            selection_sets.append(definition.selection_set)
+        while selection_sets:
+            selection_set = selection_sets.pop()
+            if selection_set is None:
+                continue
+            for selection in selection_set.selections:
+                if (
+                    isinstance(selection, graphql.language.ast.Field)
+                    and selection.name.value in UNCACHED_FIELDS
+                ):
+                    return False
+                selection_sets.append(getattr(selection, "selection_set", None))
+        return True
 
 
 @application.route("/", defaults={"path": ""})
@@ -55,32 +143,72 @@ def serve(path: str) -> Response:
         return send_from_directory(static_folder, "index.html")
 
 
+def read_only_engine(database: DB, workers: int) -> sqlalchemy.engine.Engine:
+    """Returns an engine with a pool of one read-only connection per worker."""
+    uri = f"{Path(database.dbname).resolve().as_uri()}?mode=ro"
+    return sqlalchemy.create_engine(
+        "sqlite://",
+        creator=lambda: sqlite3.connect(uri, uri=True, check_same_thread=False),
+        poolclass=QueuePool,
+        pool_size=workers,
+        max_overflow=0,
+    )
+
+
+def graphql_view(
+    context: Dict[str, Any], graphiql: bool = False
+) -> Callable[..., Response]:
+    """Returns the GraphQL view. Each request gets its own context holding the
+    entries of the given one, so that what resolvers store in it, like
+    loaders, doesn't outlive the request."""
+    return CachedGraphQLView.as_view(
+        "graphql",
+        schema=schema,
+        graphiql=graphiql,
+        get_context=lambda: dict(context),
+        response_cache=ResponseCache(),
+    )
+
+
 def start_server(
-    database: DB, debug: bool, static_resources: Optional[str], source_directory: str
+    database: DB,
+    debug: bool,
+    static_resources: Optional[str],
+    source_directory: str,
+    workers: int = 1,
 ) -> None:
-    engine = sqlalchemy.create_engine(
-        sqlalchemy.engine.url.URL("sqlite", database=database.dbname),
-        echo=False,
-        poolclass=None,
-    )
-    session = scoped_session(sessionmaker(bind=engine))
-    # pyre-fixme[16]: `Type` has no attribute `query`.
-    models.Base.query = session.query_property()
     # We have additional tables for the UI that need to be created.
     models.create(database)
-
-    application.add_url_rule(
-        "/graphql",
-        view_func=GraphQLView.as_view(
-            "graphql",
-            schema=schema,
-            graphiql=True,
-            get_context=lambda: {
-                "session": session,
-                "source_directory": source_directory,
-            },
-        ),
-    )
+    # In WAL mode, readers don't block each other or the writer. The mode is
+    # persistent, so it only has to be set from a writable connection.
+    with database.engine.connect() as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+
+    session = scoped_session(sessionmaker(bind=read_only_engine(database, workers)))
+    write_session = scoped_session(sessionmaker(bind=database.engine))
+    sessions[:] = [session, write_session]
+    # pyre-fixme[16]: `Type` has no attribute `query`.
+    models.Base.query = session.query_property()
+    # The caches are kept across requests. Trace indexes are kept for the most
+    # recently used runs.
+    context: Dict[str, Any] = {
+        "session": session,
+        "write_session": write_session,
+        "source_directory": source_directory,
+        "trace_indexes": TraceIndexCache(),
+        "file_cache": FileCache(),
+        "latest_run_cache": LatestRunCache(),
+    }
+
+    application.add_url_rule("/graphql", view_func=graphql_view(context, graphiql=True))
     if static_resources:
         application.static_folder = static_resources
-    application.run(debug=debug)
+    if debug:
+        application.run(debug=True, threaded=True)
+        return
+
+    from waitress import serve
+
+    # Each worker thread serves one request at a time, on one of the pooled
+    # connections.
+    serve(application, threads=workers)
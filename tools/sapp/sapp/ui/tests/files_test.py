@@ -0,0 +1,79 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from ..files import FileCache
+from ..schema import schema
+
+
+class FileCacheTest(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.path = self.root / "module.py"
+        self.path.write_text("".join(f"line{i}\n" for i in range(1, 101)))
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def testWindow(self) -> None:
+        cache = FileCache()
+        self.assertEqual(
+            cache.window(self.path, 50, 2),
+            (48, "line48\nline49\nline50\nline51\nline52\n"),
+        )
+        self.assertEqual(cache.window(self.path, 1, 1), (1, "line1\nline2\n"))
+        self.assertEqual(cache.window(self.path, 100, 1), (99, "line99\nline100\n"))
+        start_line, contents = cache.window(self.path, None)
+        self.assertEqual(start_line, 1)
+        self.assertEqual(len(contents.splitlines()), 100)
+
+    def testCache(self) -> None:
+        cache = FileCache()
+        with patch.object(Path, "read_text", autospec=True) as read_text:
+            read_text.return_value = "a\n"
+            cache.lines(self.path)
+            cache.lines(self.path)
+            self.assertEqual(read_text.call_count, 1)
+
+        # A changed file is read again.
+        self.path.write_text("changed\n")
+        self.assertEqual(cache.lines(self.path), ["changed\n"])
+
+    def testEviction(self) -> None:
+        other = self.root / "other.py"
+        other.write_text("other\n")
+        cache = FileCache(max_bytes=os.path.getsize(self.path))
+        cache.lines(self.path)
+        cache.lines(other)
+        with patch.object(Path, "read_text", autospec=True) as read_text:
+            read_text.return_value = "other\n"
+            cache.lines(other)
+            self.assertEqual(read_text.call_count, 0)
+            cache.lines(self.path)
+            self.assertEqual(read_text.call_count, 1)
+
+    def testFileQuery(self) -> None:
+        result = schema.execute(
+            """
+            query File($path: String) {
+              file(path: $path, line: 10, context_lines: 1) {
+                edges { node { contents start_line } }
+              }
+            }
+            """,
+            context_value={"source_directory": self.directory.name},
+            variable_values={"path": "module.py"},
+        )
+        self.assertIsNone(result.errors)
+        self.assertEqual(
+            result.data["file"]["edges"],
+            [{"node": {"contents": "line9\nline10\nline11\n", "start_line": 9}}],
+        )
@@ -25,6 +25,8 @@ from ...models import (
     IssueInstanceSharedTextAssoc,
     IssueInstanceTraceFrameAssoc,
     Run,
+    RunStatisticKind,
+    RunStatistics,
     RunStatus,
     SharedText,
     SharedTextKind,
@@ -548,6 +550,14 @@ class InteractiveTest(TestCase):
 
         with self.db.make_session() as session:
             self._add_to_session(session, runs)
+            RunStatistics.save(
+                session,
+                1,
+                {
+                    (RunStatisticKind.total_issues, ""): 2,
+                    (RunStatisticKind.new_issues, ""): 1,
+                },
+            )
             session.commit()
 
         self.interactive.setup()
@@ -555,6 +565,7 @@ class InteractiveTest(TestCase):
         output = self.stdout.getvalue().strip()
 
         self.assertIn("Run 1", output)
+        self.assertIn("Issues: 2 (1 new)", output)
         self.assertNotIn("Run 2", output)
         self.assertIn("Run 3", output)
 
@@ -3,8 +3,10 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+from typing import Any, List, Set
 from unittest import TestCase
 
+from sqlalchemy import event
 from sqlalchemy.sql import func
 
 from ...db import DB, DBType
@@ -17,6 +19,7 @@ from ...models import (
 )
 from ...tests.fake_object_generator import FakeObjectGenerator
 from ..issues import Query
+from ..schema import schema
 
 
 class QueryTest(TestCase):
@@ -514,3 +517,182 @@ class QueryTest(TestCase):
             }
             self.assertNotIn(1, issue_ids)
             self.assertNotIn(2, issue_ids)
+
+    def testFeaturesInOtherRuns(self) -> None:
+        feature1 = self.fakes.feature("via:feature1")
+        feature2 = self.fakes.feature("via:feature2")
+        feature3 = self.fakes.feature("via:feature3")
+        self.fakes.save_all(self.db)
+        run = self.fakes.run()
+        instance = self.fakes.instance(issue_id=DBID(1))
+        self.fakes.save_all(self.db)
+
+        with self.db.make_session() as session:
+            session.add(run)
+            for shared_text_id, issue_instance_id in [
+                (feature1.id, 1),
+                (feature2.id, 1),
+                (feature3.id, 1),
+                (feature1.id, 2),
+                (feature1.id, instance.id),
+                (feature2.id, instance.id),
+            ]:
+                session.add(
+                    IssueInstanceSharedTextAssoc(
+                        shared_text_id=shared_text_id,
+                        issue_instance_id=issue_instance_id,
+                    )
+                )
+            session.commit()
+
+            def issue_ids(run_id: int, mode: str, features: List[str]) -> Set[int]:
+                builder = Query(session, run_id)
+                if mode == "all":
+                    builder = builder.where_all_features(features)
+                elif mode == "any":
+                    builder = builder.where_any_features(features)
+                else:
+                    builder = builder.where_exclude_features(features)
+                return {int(issue.id) for issue in builder.get()}
+
+            # Only the requested features are counted, so other features of an
+            # issue don't make up for missing ones.
+            self.assertEqual(issue_ids(1, "all", ["via:feature1", "via:feature2"]), {1})
+            self.assertEqual(
+                issue_ids(1, "all", ["via:feature1", "via:feature1"]), {1, 2}
+            )
+            self.assertEqual(issue_ids(1, "any", ["via:feature2"]), {1})
+            self.assertEqual(issue_ids(1, "none", ["via:feature2"]), {2, 3, 4})
+
+            # Empty feature sets.
+            self.assertEqual(issue_ids(1, "all", []), {1, 2, 3, 4})
+            self.assertEqual(issue_ids(1, "any", []), set())
+            self.assertEqual(issue_ids(1, "none", []), {1, 2, 3, 4})
+
+            # Features of the issues of other runs don't match.
+            run_id = int(instance.run_id)
+            self.assertEqual(
+                issue_ids(run_id, "all", ["via:feature1", "via:feature2"]),
+                {int(instance.id)},
+            )
+            self.assertEqual(issue_ids(run_id, "any", ["via:feature3"]), set())
+            self.assertEqual(
+                issue_ids(run_id, "none", ["via:feature3"]), {int(instance.id)}
+            )
+
+    def testLeavesAreLoadedInOneQuery(self) -> None:
+        source = self.fakes.source("source1")
+        sink = self.fakes.sink("sink1")
+        self.fakes.save_all(self.db)
+
+        with self.db.make_session() as session:
+            for issue_instance_id in [1, 2, 3]:
+                session.add(
+                    IssueInstanceSharedTextAssoc(
+                        shared_text_id=source.id, issue_instance_id=issue_instance_id
+                    )
+                )
+            session.add(
+                IssueInstanceSharedTextAssoc(
+                    shared_text_id=sink.id, issue_instance_id=1
+                )
+            )
+            session.commit()
+
+            statements: List[str] = []
+
+            def count(*args: Any) -> None:
+                statements.append(args[2])
+
+            event.listen(self.db.engine, "before_cursor_execute", count)
+            try:
+                result = schema.execute(
+                    """
+                    query {
+                      issues {
+                        edges { node { issue_id sources sinks source_names } }
+                      }
+                    }
+                    """,
+                    context_value={"session": session},
+                )
+            finally:
+                event.remove(self.db.engine, "before_cursor_execute", count)
+
+            self.assertIsNone(result.errors)
+            leaves = {
+                edge["node"]["issue_id"]: (
+                    edge["node"]["sources"],
+                    edge["node"]["sinks"],
+                    edge["node"]["source_names"],
+                )
+                for edge in result.data["issues"]["edges"]
+            }
+            self.assertEqual(
+                leaves,
+                {
+                    "1": (["source1"], ["sink1"], []),
+                    "2": (["source1"], [], []),
+                    "3": (["source1"], [], []),
+                    "4": ([], [], []),
+                },
+            )
+            # One query for the issues and their features, and one for the
+            # leaves of all issues.
+            self.assertEqual(
+                len(
+                    [
+                        statement
+                        for statement in statements
+                        if "issue_instance_feature_assoc" in statement
+                    ]
+                ),
+                2,
+            )
+
+    def testIterate(self) -> None:
+        with self.db.make_session() as session:
+            builder = Query(session, 1)
+            self.assertEqual(
+                [int(issue.id) for issue in builder.iterate(batch_size=3)],
+                [1, 2, 3, 4],
+            )
+            self.assertEqual(
+                [int(issue.id) for issue in builder.iterate(batch_size=2, after=1)],
+                [2, 3, 4],
+            )
+            builder = Query(session, 1).where_codes_is_any_of([6016, 6018])
+            self.assertEqual(
+                [int(issue.id) for issue in builder.iterate(batch_size=1)], [1, 3]
+            )
+
+    def testKeysetPagination(self) -> None:
+        query = """
+            query Issues($after: String) {
+              issues(first: 3, after: $after) {
+                edges { node { issue_id } }
+                pageInfo { hasNextPage endCursor }
+              }
+            }
+        """
+        with self.db.make_session() as session:
+            result = schema.execute(query, context_value={"session": session})
+            self.assertIsNone(result.errors)
+            issues = result.data["issues"]
+            self.assertEqual(
+                [edge["node"]["issue_id"] for edge in issues["edges"]],
+                ["1", "2", "3"],
+            )
+            self.assertTrue(issues["pageInfo"]["hasNextPage"])
+
+            result = schema.execute(
+                query,
+                context_value={"session": session},
+                variable_values={"after": issues["pageInfo"]["endCursor"]},
+            )
+            self.assertIsNone(result.errors)
+            issues = result.data["issues"]
+            self.assertEqual(
+                [edge["node"]["issue_id"] for edge in issues["edges"]], ["4"]
+            )
+            self.assertFalse(issues["pageInfo"]["hasNextPage"])
@@ -0,0 +1,118 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+from unittest import TestCase
+from unittest.mock import patch
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from ...db import DB, DBType
+from ...models import create as create_models
+from ...tests.fake_object_generator import FakeObjectGenerator
+from .. import filters, run_cache
+from ..files import FileCache
+from ..issues import LEAVES_LOADER
+from ..run_cache import LatestRunCache
+from ..server import graphql_view, read_only_engine
+
+
+class ServerTest(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = DB(DBType.SQLITE, os.path.join(self.directory.name, "sapp.db"))
+        create_models(self.db)
+        fakes = FakeObjectGenerator()
+        run = fakes.run()
+        issue = fakes.issue(code=6016)
+        fakes.instance(issue_id=issue.id)
+        fakes.save_all(self.db)
+        with self.db.make_session() as session:
+            session.add(run)
+            session.commit()
+
+        self.session = scoped_session(sessionmaker(bind=read_only_engine(self.db, 2)))
+        self.write_session = scoped_session(sessionmaker(bind=self.db.engine))
+        self.clock = 0.0
+        self.latest_run_cache = LatestRunCache(ttl=10.0, clock=lambda: self.clock)
+        self.context: Dict[str, Any] = {
+            "session": self.session,
+            "write_session": self.write_session,
+            "source_directory": self.directory.name,
+            "file_cache": FileCache(),
+            "latest_run_cache": self.latest_run_cache,
+        }
+        application = Flask(__name__)
+        application.add_url_rule("/graphql", view_func=graphql_view(self.context))
+        self.client = application.test_client()
+
+    def tearDown(self) -> None:
+        self.session.remove()
+        self.write_session.remove()
+        self.directory.cleanup()
+
+    def _post(self, query: str) -> Dict[str, Any]:
+        response = self.client.post(
+            "/graphql",
+            data=json.dumps({"query": query}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.get_data())
+
+    def testReadOnlyEngine(self) -> None:
+        with self.assertRaises(OperationalError):
+            self.session.execute("DELETE FROM issues")
+        self.session.rollback()
+
+    def testLatestRunCache(self) -> None:
+        with patch.object(run_cache, "latest_run_id", return_value=1) as lookup:
+            self.latest_run_cache.latest_run_id(self.session)
+            self.latest_run_cache.latest_run_id(self.session)
+            self.assertEqual(lookup.call_count, 1)
+            self.clock = 10.0
+            self.latest_run_cache.latest_run_id(self.session)
+            self.assertEqual(lookup.call_count, 2)
+
+    def testResponseCache(self) -> None:
+        query = "{ filters { edges { node { name } } } }"
+        self.assertEqual(self._post(query)["data"]["filters"]["edges"], [])
+        with patch.object(filters, "all_filters") as all_filters:
+            self.assertEqual(self._post(query)["data"]["filters"]["edges"], [])
+            self.assertEqual(all_filters.call_count, 0)
+
+        # Mutations are written through the writable session and clear the
+        # cached responses.
+        self._post(
+            'mutation { save_filter(input: {name: "filter", codes: [6016]}) '
+            "{ clientMutationId } }"
+        )
+        edges: List[Dict[str, Any]] = self._post(query)["data"]["filters"]["edges"]
+        self.assertEqual(edges, [{"node": {"name": "filter"}}])
+
+    def testFilesAreNotCached(self) -> None:
+        path = Path(self.directory.name) / "module.py"
+        path.write_text("before\n")
+        query = '{ file(path: "module.py") { edges { node { contents } } } }'
+        self.assertEqual(
+            self._post(query)["data"]["file"]["edges"],
+            [{"node": {"contents": "before\n"}}],
+        )
+        path.write_text("after\n")
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(
+            self._post(query)["data"]["file"]["edges"],
+            [{"node": {"contents": "after\n"}}],
+        )
+
+    def testContextPerRequest(self) -> None:
+        self._post("{ issues { edges { node { sources sinks } } } }")
+        self.assertNotIn(LEAVES_LOADER, self.context)
@@ -3,9 +3,11 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
+import threading
 import unittest
 from typing import Any, Dict, List
 from unittest import TestCase
+from unittest.mock import MagicMock, patch
 
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
@@ -20,7 +22,8 @@ from ...models import (
     create as create_models,
 )
 from ...tests.fake_object_generator import FakeObjectGenerator
-from ..trace import Query, TraceFrameQueryResult
+from .. import trace
+from ..trace import Query, TraceFrameQueryResult, TraceIndexCache
 
 
 class QueryTest(TestCase):
@@ -189,6 +192,85 @@ class QueryTest(TestCase):
             self.assertEqual(len(next_frames), 1)
             self.assertEqual(int(next_frames[0].id), int(frames[3].id))
 
+    def testTraceIndex(self) -> None:
+        run1 = self.fakes.run()
+        frames = self._basic_trace_frames()
+        self.fakes.save_all(self.db)
+
+        run2 = self.fakes.run()
+        frames.extend(self._basic_trace_frames())
+
+        sink = self.fakes.sink("sink1")
+        self.fakes.saver.add_all(
+            [
+                TraceFrameLeafAssoc.Record(
+                    trace_frame_id=frame.id, leaf_id=sink.id, trace_length=0
+                )
+                for frame in frames
+            ]
+        )
+        self.fakes.save_all(self.db)
+
+        with self.db.make_session() as session:
+            session.add(run1)
+            session.add(run2)
+            session.commit()
+
+            indexes = TraceIndexCache(max_runs=1)
+            index = indexes.get(session, run2.id)
+            self.assertIs(indexes.get(session, run2.id), index)
+            self.assertEqual(
+                index.leaves(int(frames[3].id), SharedTextKind.SINK), {"sink1"}
+            )
+            self.assertNotIn(int(frames[1].id), index)
+
+            for frame, backwards in [(frames[2], False), (frames[3], True)]:
+                expected = Query(session).next_trace_frames(
+                    index.leaf_dicts, run2.id, {"sink1"}, frame, set(), backwards
+                )
+                next_frames = Query(session, index).next_trace_frames(
+                    index.leaf_dicts, run2.id, {"sink1"}, frame, set(), backwards
+                )
+                self.assertEqual(
+                    [int(frame.id) for frame in next_frames],
+                    [int(frame.id) for frame in expected],
+                )
+                self.assertEqual(len(next_frames), 1)
+
+            # Only the most recently used run is kept.
+            indexes.get(session, run1.id)
+            self.assertIsNot(indexes.get(session, run2.id), index)
+
+    def testTraceIndexBuiltOutsideOfLock(self) -> None:
+        building = threading.Event()
+        built = threading.Event()
+
+        def build(session: Session, run_id: int) -> MagicMock:
+            if run_id == 1:
+                building.set()
+                built.wait(timeout=5)
+            return MagicMock(run_id=run_id)
+
+        indexes = TraceIndexCache()
+        session = MagicMock()
+        with patch.object(trace, "TraceIndex", side_effect=build) as trace_index:
+            index = indexes.get(session, 2)
+            build_thread = threading.Thread(target=indexes.get, args=(session, 1))
+            build_thread.start()
+            building.wait(timeout=5)
+
+            # The cached index is returned while the other one is being built.
+            get_thread = threading.Thread(target=indexes.get, args=(session, 2))
+            get_thread.start()
+            get_thread.join(timeout=5)
+            self.assertFalse(get_thread.is_alive())
+            self.assertIs(indexes.get(session, 2), index)
+
+            built.set()
+            build_thread.join()
+            self.assertEqual(indexes.get(session, 1).run_id, 1)
+            self.assertEqual(trace_index.call_count, 2)
+
     @unittest.skip("T71492980")
     def testNavigateTraceFrames(self) -> None:
         run = self.fakes.run()
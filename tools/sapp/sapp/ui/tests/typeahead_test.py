@@ -0,0 +1,138 @@
+# Copyright (c) Facebook, Inc. and its affiliates.
+#
+# This source code is licensed under the MIT license found in the
+# LICENSE file in the root directory of this source tree.
+
+from unittest import TestCase
+
+from ...db import DB, DBType
+from ...models import (
+    IssueInstanceSharedTextAssoc,
+    RunTypeahead,
+    TypeaheadKind,
+    create as create_models,
+)
+from ...tests.fake_object_generator import FakeObjectGenerator
+from ..schema import schema
+from ..typeahead import all_callables, all_codes, all_features, all_paths
+
+
+class TypeaheadTest(TestCase):
+    def setUp(self) -> None:
+        self.db = DB(DBType.MEMORY)
+        create_models(self.db)
+        self.fakes = FakeObjectGenerator()
+        run = self.fakes.run()
+        feature = self.fakes.feature("via:feature1")
+        for code, callable, filename in [
+            (6016, "module.sub.function1", "module/sub.py"),
+            (6016, "module.sub.function2", "module/sub.py"),
+            (6017, "module.function3", "module/__init__.py"),
+            (6018, "other.function4", "other.py"),
+        ]:
+            issue = self.fakes.issue(code=code)
+            self.fakes.instance(issue_id=issue.id, callable=callable, filename=filename)
+            self.fakes.save_all(self.db)
+
+        with self.db.make_session() as session:
+            session.add(run)
+            session.add(
+                IssueInstanceSharedTextAssoc(
+                    shared_text_id=feature.id, issue_instance_id=1
+                )
+            )
+            session.commit()
+            RunTypeahead.populate(session, 1)
+            session.commit()
+
+    def testPopulate(self) -> None:
+        with self.db.make_session() as session:
+            self.assertEqual(
+                {
+                    (row.kind, row.value, row.issue_count)
+                    for row in session.query(RunTypeahead)
+                },
+                {
+                    (TypeaheadKind.code, "6016", 2),
+                    (TypeaheadKind.code, "6017", 1),
+                    (TypeaheadKind.code, "6018", 1),
+                    (TypeaheadKind.path, "module/sub.py", 2),
+                    (TypeaheadKind.path, "module/__init__.py", 1),
+                    (TypeaheadKind.path, "other.py", 1),
+                    (TypeaheadKind.callable, "module.sub.function1", 1),
+                    (TypeaheadKind.callable, "module.sub.function2", 1),
+                    (TypeaheadKind.callable, "module.function3", 1),
+                    (TypeaheadKind.callable, "other.function4", 1),
+                    (TypeaheadKind.feature, "via:feature1", 1),
+                },
+            )
+
+    def testPrefixSearch(self) -> None:
+        with self.db.make_session() as session:
+            self.assertEqual(
+                [code.code for code in all_codes(session, 1)], [6016, 6017, 6018]
+            )
+            self.assertEqual(
+                [path.path for path in all_paths(session, 1, prefix="module/")],
+                ["module/sub.py", "module/__init__.py"],
+            )
+            self.assertEqual(
+                [
+                    callable.callable
+                    for callable in all_callables(
+                        session, 1, prefix="module.sub.", limit=1
+                    )
+                ],
+                ["module.sub.function1"],
+            )
+            self.assertEqual(
+                [feature.feature for feature in all_features(session, 1, prefix="x")],
+                [],
+            )
+
+    def testSchema(self) -> None:
+        query = """
+            query Paths($prefix: String) {
+              paths(prefix: $prefix, first: 1) { edges { node { path } } }
+            }
+        """
+        with self.db.make_session() as session:
+            result = schema.execute(
+                query,
+                context_value={"session": session},
+                variable_values={"prefix": "module"},
+            )
+            self.assertIsNone(result.errors)
+            self.assertEqual(
+                result.data["paths"]["edges"], [{"node": {"path": "module/sub.py"}}]
+            )
+
+    def testSchemaPages(self) -> None:
+        query = """
+            query Callables($after: String) {
+              callables(prefix: "module", first: 2, after: $after) {
+                edges { node { callable } }
+                pageInfo { endCursor }
+              }
+            }
+        """
+        with self.db.make_session() as session:
+            pages = []
+            after = None
+            for _ in range(2):
+                result = schema.execute(
+                    query,
+                    context_value={"session": session},
+                    variable_values={"after": after},
+                )
+                self.assertIsNone(result.errors)
+                callables = result.data["callables"]
+                pages.append([edge["node"]["callable"] for edge in callables["edges"]])
+                after = callables["pageInfo"]["endCursor"]
+            self.assertEqual(
+                pages,
+                [
+                    ["module.function3", "module.sub.function1"],
+                    ["module.sub.function2"],
+                ],
+            )
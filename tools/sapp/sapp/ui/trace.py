@@ -3,9 +3,24 @@
 # This source code is licensed under the MIT license found in the
 # LICENSE file in the root directory of this source tree.
 
-from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from typing import (
+    Any,
+    DefaultDict,
+    Dict,
+    FrozenSet,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import graphene
+from sqlalchemy import func
 from sqlalchemy.orm import Session, aliased
 
 from ..models import (
@@ -20,6 +35,8 @@ from ..models import (
 )
 
 
+LOG: logging.Logger = logging.getLogger(__name__)
+
 # pyre-fixme[5]: Global expression must be annotated.
 FilenameText = aliased(SharedText)
 # pyre-fixme[5]: Global expression must be annotated.
@@ -48,6 +65,8 @@ class TraceFrameQueryResultType(graphene.ObjectType):
     filename = graphene.String()
     trace_length = graphene.Int()
     file_content = graphene.String()
+    # The line number of the first line of file_content.
+    file_start_line = graphene.Int()
 
     # pyre-fixme[3]: Return type must be annotated.
     # pyre-fixme[2]: Parameter must be annotated.
@@ -72,6 +91,7 @@ class TraceFrameQueryResult(NamedTuple):
     filename: Optional[str] = None
     trace_length: Optional[int] = None
     file_content: Optional[str] = None
+    file_start_line: Optional[int] = None
 
     @staticmethod
     # pyre-fixme[2]: Parameter annotation cannot be `Any`.
@@ -89,6 +109,7 @@ class TraceFrameQueryResult(NamedTuple):
             filename=record.filename,
             trace_length=getattr(record, "trace_length", None),
             file_content=getattr(record, "file_content", None),
+            file_start_line=getattr(record, "file_start_line", None),
         )
 
     def is_leaf(self) -> bool:
@@ -109,9 +130,191 @@ class TraceTuple(NamedTuple):
     placeholder: bool = False
 
 
+LeafDicts = Tuple[Dict[int, str], Dict[int, str], Dict[int, str]]
+FrameKey = Tuple[TraceKind, int, str]
+
+
+def all_leaf_dicts(session: Session) -> LeafDicts:
+    """Returns the names of all sources, sinks and features by id."""
+    leaf_dicts: Dict[SharedTextKind, Dict[int, str]] = {
+        SharedTextKind.SOURCE: {},
+        SharedTextKind.SINK: {},
+        SharedTextKind.FEATURE: {},
+    }
+    for id, kind, contents in session.query(
+        SharedText.id, SharedText.kind, SharedText.contents
+    ).filter(SharedText.kind.in_(list(leaf_dicts))):
+        leaf_dicts[kind][int(id)] = contents
+    return (
+        leaf_dicts[SharedTextKind.SOURCE],
+        leaf_dicts[SharedTextKind.SINK],
+        leaf_dicts[SharedTextKind.FEATURE],
+    )
+
+
+class TraceIndex:
+    """The trace frames of a run, indexed by caller and callee, with their
+    leaves, so that traces can be navigated without querying the database for
+    every hop."""
+
+    def __init__(self, session: Session, run_id: Union[int, DBID]) -> None:
+        self.run_id: int = int(run_id)
+        self.leaf_dicts: LeafDicts = all_leaf_dicts(session)
+        self._frames: Dict[int, TraceFrameQueryResult] = {}
+        self._leaves: Dict[int, FrozenSet[int]] = {}
+        self._by_caller: DefaultDict[FrameKey, List[int]] = defaultdict(list)
+        self._by_callee: DefaultDict[FrameKey, List[int]] = defaultdict(list)
+
+        order: Dict[int, Tuple[int, str]] = {}
+        for record in (
+            session.query(
+                TraceFrame.id,
+                TraceFrame.caller_id,
+                CallerText.contents.label("caller"),
+                TraceFrame.caller_port,
+                TraceFrame.callee_id,
+                CalleeText.contents.label("callee"),
+                TraceFrame.callee_port,
+                TraceFrame.callee_location,
+                TraceFrame.kind,
+                FilenameText.contents.label("filename"),
+                func.min(TraceFrameLeafAssoc.trace_length).label("trace_length"),
+            )
+            .filter(TraceFrame.run_id == run_id)
+            .join(CallerText, CallerText.id == TraceFrame.caller_id)
+            .join(CalleeText, CalleeText.id == TraceFrame.callee_id)
+            .join(FilenameText, FilenameText.id == TraceFrame.filename_id)
+            .join(
+                TraceFrameLeafAssoc, TraceFrameLeafAssoc.trace_frame_id == TraceFrame.id
+            )
+            .group_by(TraceFrame.id)
+        ):
+            frame = TraceFrameQueryResult.from_record(record)
+            frame_id = int(frame.id)
+            self._frames[frame_id] = frame
+            order[frame_id] = (
+                record.trace_length,
+                SourceLocation.to_string(record.callee_location)
+                if record.callee_location is not None
+                else "",
+            )
+            kind = record.kind
+            self._by_caller[(kind, int(frame.caller_id), frame.caller_port)].append(
+                frame_id
+            )
+            self._by_callee[(kind, int(frame.callee_id), frame.callee_port)].append(
+                frame_id
+            )
+        for frame_ids in [*self._by_caller.values(), *self._by_callee.values()]:
+            frame_ids.sort(key=order.__getitem__)
+
+        leaves: DefaultDict[int, Set[int]] = defaultdict(set)
+        for trace_frame_id, leaf_id in (
+            session.query(
+                TraceFrameLeafAssoc.trace_frame_id, TraceFrameLeafAssoc.leaf_id
+            )
+            .join(TraceFrame, TraceFrame.id == TraceFrameLeafAssoc.trace_frame_id)
+            .filter(TraceFrame.run_id == run_id)
+        ):
+            leaves[int(trace_frame_id)].add(int(leaf_id))
+        self._leaves = {
+            trace_frame_id: frozenset(leaf_ids)
+            for trace_frame_id, leaf_ids in leaves.items()
+        }
+        LOG.info(f"Indexed {len(self._frames)} trace frames of run {self.run_id}")
+
+    def __contains__(self, trace_frame_id: int) -> bool:
+        return trace_frame_id in self._frames
+
+    def next_trace_frames(
+        self,
+        leaf_kind: Set[str],
+        # pyre-fixme[2]: Parameter annotation cannot be `Any`.
+        trace_frame: Any,
+        visited_ids: Set[int],
+        backwards: bool = False,
+    ) -> List[TraceFrameQueryResult]:
+        """See `Query.next_trace_frames`."""
+        if backwards:
+            frame_ids = self._by_callee.get(
+                (trace_frame.kind, int(trace_frame.caller_id), trace_frame.caller_port),
+                [],
+            )
+        else:
+            frame_ids = self._by_caller.get(
+                (trace_frame.kind, int(trace_frame.callee_id), trace_frame.callee_port),
+                [],
+            )
+        next_frames = []
+        for frame_id in frame_ids:
+            frame = self._frames[frame_id]
+            # Skip recursive calls for now.
+            if frame_id in visited_ids or int(frame.caller_id) == int(frame.callee_id):
+                continue
+            if leaf_kind.intersection(
+                self.leaves(frame_id, trace_kind_to_shared_text_kind(frame.kind))
+            ):
+                next_frames.append(frame)
+        return next_frames
+
+    def leaves(self, trace_frame_id: int, kind: SharedTextKind) -> Set[str]:
+        """See `Query.get_leaves_trace_frame`."""
+        leaf_sources, leaf_sinks, features_dict = self.leaf_dicts
+        return leaf_dict_lookups(
+            leaf_sources,
+            leaf_sinks,
+            features_dict,
+            list(self._leaves.get(trace_frame_id, ())),
+            kind,
+        )
+
+
+class TraceIndexCache:
+    """Keeps the trace indexes of the most recently used runs. An index is
+    built outside of the lock of the cache, so that only the requests for the
+    same run wait for it to be built."""
+
+    def __init__(self, max_runs: int = 4) -> None:
+        self._max_runs = max_runs
+        self._indexes: "OrderedDict[int, TraceIndex]" = OrderedDict()
+        # Locks of the runs whose index is being built.
+        self._run_locks: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, run_id: int) -> Optional[TraceIndex]:
+        with self._lock:
+            index = self._indexes.get(run_id)
+            if index is not None:
+                self._indexes.move_to_end(run_id)
+            return index
+
+    def get(self, session: Session, run_id: Union[int, DBID]) -> TraceIndex:
+        run_id = int(run_id)
+        with self._lock:
+            index = self._indexes.get(run_id)
+            if index is not None:
+                self._indexes.move_to_end(run_id)
+                return index
+            run_lock = self._run_locks.setdefault(run_id, threading.Lock())
+
+        with run_lock:
+            # Another request may have built the index while this one waited.
+            index = self._cached(run_id)
+            if index is not None:
+                return index
+            index = TraceIndex(session, run_id)
+            with self._lock:
+                self._indexes[run_id] = index
+                while len(self._indexes) > self._max_runs:
+                    self._indexes.popitem(last=False)
+                self._run_locks.pop(run_id, None)
+            return index
+
+
 class Query:
-    def __init__(self, session: Session) -> None:
+    def __init__(self, session: Session, index: Optional[TraceIndex] = None) -> None:
         self._session: Session = session
+        self._index = index
 
     def initial_trace_frames(
         self, issue_id: int, kind: TraceKind
@@ -210,6 +413,12 @@ class Query:
         When backwards=True, the result will include the parameter trace_frame,
         since we are filtering on the parameter's callee.
         """
+        index = self._index
+        if index is not None and index.run_id == int(current_run_id):
+            return index.next_trace_frames(
+                leaf_kind, trace_frame, visited_ids, backwards
+            )
+
         query = (
             self._session.query(
                 TraceFrame.id,
@@ -271,6 +480,10 @@ class Query:
         trace_frame_id: Union[int, DBID],
         kind: SharedTextKind,
     ) -> Set[str]:
+        index = self._index
+        if index is not None and int(trace_frame_id) in index:
+            return index.leaves(int(trace_frame_id), kind)
+
         message_ids = [
             int(id)
             for id, in self._session.query(SharedText.id)
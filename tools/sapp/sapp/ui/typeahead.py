@@ -5,12 +5,55 @@
 
 from __future__ import annotations
 
-from typing import List, NamedTuple
+from typing import List, NamedTuple, Optional
 
 import graphene
 from sqlalchemy.orm import Session
 
-from ..models import Issue, IssueInstance, SharedText, SharedTextKind
+from ..models import (
+    DBID,
+    Issue,
+    IssueInstance,
+    RunTypeahead,
+    SharedText,
+    SharedTextKind,
+    TypeaheadKind,
+)
+
+
+def _search(
+    session: Session,
+    run_id: Optional[DBID],
+    kind: TypeaheadKind,
+    prefix: Optional[str],
+    limit: Optional[int],
+) -> Optional[List[str]]:
+    """Returns the typeahead values of the run that start with the prefix, with
+    the ones of the most issue instances first, or None if the typeahead values
+    were not computed for the run."""
+    if run_id is None:
+        return None
+    has_values = (
+        session.query(RunTypeahead.run_id)
+        .filter(RunTypeahead.run_id == run_id)
+        .limit(1)
+        .scalar()
+    )
+    if has_values is None:
+        return None
+
+    query = session.query(RunTypeahead.value).filter(
+        RunTypeahead.run_id == run_id, RunTypeahead.kind == kind
+    )
+    if prefix:
+        # A range rather than LIKE, so that the primary key index is used.
+        query = query.filter(
+            RunTypeahead.value >= prefix, RunTypeahead.value < prefix + "\uffff"
+        )
+    query = query.order_by(RunTypeahead.issue_count.desc(), RunTypeahead.value)
+    if limit is not None:
+        query = query.limit(limit)
+    return [value for value, in query]
 
 
 class CodeType(graphene.ObjectType):
@@ -21,8 +64,19 @@ class Code(NamedTuple):
     code: int
 
 
-def all_codes(session: Session) -> List[Code]:
-    return session.query(Issue.code.distinct().label("code")).all()
+def all_codes(
+    session: Session,
+    run_id: Optional[DBID] = None,
+    prefix: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Code]:
+    values = _search(session, run_id, TypeaheadKind.code, prefix, limit)
+    if values is not None:
+        return [Code(code=int(value)) for value in values]
+    codes = session.query(Issue.code.distinct().label("code")).all()
+    if prefix:
+        codes = [code for code in codes if str(code.code).startswith(prefix)]
+    return codes[:limit]
 
 
 class PathType(graphene.ObjectType):
@@ -33,14 +87,24 @@ class Path(NamedTuple):
     path: str
 
 
-def all_paths(session: Session) -> List[Path]:
-    return (
+def all_paths(
+    session: Session,
+    run_id: Optional[DBID] = None,
+    prefix: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Path]:
+    values = _search(session, run_id, TypeaheadKind.path, prefix, limit)
+    if values is not None:
+        return [Path(path=value) for value in values]
+    query = (
         # pyre-fixme[16]: `str` has no attribute `label`.
         session.query(IssueInstance, SharedText.contents.label("path"))
         .join(SharedText, SharedText.id == IssueInstance.filename_id)
         .group_by(SharedText)
-        .all()
     )
+    if prefix:
+        query = query.filter(SharedText.contents.startswith(prefix))
+    return query.limit(limit).all()
 
 
 class CallableType(graphene.ObjectType):
@@ -51,24 +115,45 @@ class Callable(NamedTuple):
     callable: str
 
 
-def all_callables(session: Session) -> List[Callable]:
-    return (
+def all_callables(
+    session: Session,
+    run_id: Optional[DBID] = None,
+    prefix: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Callable]:
+    values = _search(session, run_id, TypeaheadKind.callable, prefix, limit)
+    if values is not None:
+        return [Callable(callable=value) for value in values]
+    query = (
         # pyre-fixme[16]: `str` has no attribute `label`.
         session.query(IssueInstance, SharedText.contents.label("callable"))
         .join(SharedText, SharedText.id == IssueInstance.callable_id)
         .group_by(SharedText)
-        .all()
     )
+    if prefix:
+        query = query.filter(SharedText.contents.startswith(prefix))
+    return query.limit(limit).all()
 
 
 class Feature(graphene.ObjectType):
     feature = graphene.String()
 
 
-def all_features(session: Session) -> List[Feature]:
-    return (
+def all_features(
+    session: Session,
+    run_id: Optional[DBID] = None,
+    prefix: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Feature]:
+    values = _search(session, run_id, TypeaheadKind.feature, prefix, limit)
+    if values is not None:
+        return [Feature(feature=value) for value in values]
+    query = (
         # pyre-fixme[16]: `str` has no attribute `label`.
-        session.query(SharedText, SharedText.contents.label("feature"))
-        .filter(SharedText.kind == SharedTextKind.FEATURE)
-        .all()
+        session.query(SharedText, SharedText.contents.label("feature")).filter(
+            SharedText.kind == SharedTextKind.FEATURE
+        )
     )
+    if prefix:
+        query = query.filter(SharedText.contents.startswith(prefix))
+    return query.limit(limit).all()